@@ -0,0 +1,183 @@
+import hashlib
+import json
+import os
+import pickle
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+# Версия формата кеша, записи другой версии удаляются без десериализации
+CACHE_SCHEMA_VERSION = 2
+
+
+def atomic_write_bytes(path: Path, data: bytes) -> None:
+    """ Атомарная запись: временный файл в той же директории и rename поверх целевого """
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_name = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_name, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_name)
+        except OSError:
+            pass
+        raise
+
+
+class CacheStore:
+    """
+    Контентно-адресуемое хранилище кеша пайплайна
+    Метаданные записи (версия схемы, отпечатки входных данных, ссылка на payload) хранятся
+    отдельно в JSON, поэтому проверка актуальности не требует десериализации данных
+    Payload хранится в objects/ под именем хеша содержимого
+    Вытеснение - LRU по времени последнего обращения с ограничением по размеру и числу записей
+    """
+
+    def __init__(self, directory: Path, max_size_bytes: int = 0, max_entries: int = 0):
+        self.directory = directory
+        # 0 - без ограничения
+        self.max_size_bytes = max_size_bytes
+        self.max_entries = max_entries
+
+    @property
+    def meta_dir(self) -> Path:
+        return self.directory / 'meta'
+
+    @property
+    def objects_dir(self) -> Path:
+        return self.directory / 'objects'
+
+    def _meta_path(self, key: str) -> Path:
+        return self.meta_dir / f"{key}.json"
+
+    def _object_path(self, digest: str) -> Path:
+        return self.objects_dir / f"{digest}.pkl"
+
+    def _remove_meta(self, key: str) -> None:
+        try:
+            self._meta_path(key).unlink()
+        except OSError:
+            pass
+
+    def read_meta(self, key: str) -> Optional[Dict[str, Any]]:
+        """ Метаданные записи или None, если записи нет или ее формат устарел """
+        meta_path = self._meta_path(key)
+        try:
+            meta = json.loads(meta_path.read_text(encoding='utf-8'))
+        except (OSError, ValueError):
+            return None
+
+        if not isinstance(meta, dict) or meta.get('schema_version') != CACHE_SCHEMA_VERSION:
+            # Устаревший формат: удаляем только метаданные, payload уйдет при вытеснении
+            self._remove_meta(key)
+            return None
+
+        return meta
+
+    def is_valid(self, key: str, fingerprint: Dict[str, str]) -> bool:
+        """ Проверка актуальности записи по отпечатку входных данных """
+        meta = self.read_meta(key)
+        if meta is None or meta.get('fingerprint') != fingerprint:
+            return False
+        return self._object_path(meta['digest']).exists()
+
+    def get(self, key: str) -> Optional[Any]:
+        """ Загрузка данных записи (без проверки актуальности) """
+        meta = self.read_meta(key)
+        if meta is None:
+            return None
+
+        try:
+            with open(self._object_path(meta['digest']), 'rb') as f:
+                data = pickle.load(f)
+        except (OSError, pickle.PickleError, EOFError, AttributeError):
+            self._remove_meta(key)
+            return None
+
+        # Отмечаем обращение для LRU
+        try:
+            os.utime(self._meta_path(key))
+        except OSError:
+            pass
+
+        return data
+
+    def put(self, key: str, data: Any, fingerprint: Dict[str, str]) -> None:
+        """ Сохранение записи с атомарной записью payload и метаданных """
+        try:
+            payload = pickle.dumps(data, protocol=pickle.HIGHEST_PROTOCOL)
+            digest = hashlib.sha256(payload).hexdigest()
+
+            object_path = self._object_path(digest)
+            if not object_path.exists():
+                atomic_write_bytes(object_path, payload)
+
+            meta = {
+                'schema_version': CACHE_SCHEMA_VERSION,
+                'digest': digest,
+                'size': len(payload),
+                'fingerprint': fingerprint,
+                'created': time.time(),
+            }
+            atomic_write_bytes(self._meta_path(key), json.dumps(meta, sort_keys=True).encode('utf-8'))
+        except (pickle.PickleError, OSError):
+            return  # Тихо игнорируем ошибки кеширования
+
+        self.evict()
+
+    def evict(self) -> int:
+        """ Вытеснение давно не использованных записей и удаление неиспользуемых объектов """
+        entries = []
+        for meta_path in self.meta_dir.glob('*.json'):
+            meta = self.read_meta(meta_path.stem)
+            if meta is None:
+                continue
+            try:
+                last_access = meta_path.stat().st_mtime
+            except OSError:
+                continue
+            entries.append((last_access, meta_path.stem, meta))
+
+        # Самые свежие записи - первыми
+        entries.sort(key=lambda item: item[0], reverse=True)
+
+        removed = 0
+        kept = 0
+        kept_digests = set()
+        total_size = 0
+        for _, key, meta in entries:
+            size = meta.get('size', 0) if meta['digest'] not in kept_digests else 0
+            over_entries = self.max_entries and kept >= self.max_entries
+            over_size = self.max_size_bytes and total_size + size > self.max_size_bytes
+            if over_entries or over_size:
+                self._remove_meta(key)
+                removed += 1
+                continue
+            kept += 1
+            kept_digests.add(meta['digest'])
+            total_size += size
+
+        # Объекты, на которые не ссылается ни одна запись
+        for object_path in self.objects_dir.glob('*.pkl'):
+            if object_path.stem not in kept_digests:
+                try:
+                    object_path.unlink()
+                except OSError:
+                    pass
+
+        return removed
+
+    def clear(self) -> int:
+        """ Удаление всех записей, возвращает количество удаленных файлов """
+        count = 0
+        for directory in (self.meta_dir, self.objects_dir):
+            if not directory.exists():
+                continue
+            for path in directory.iterdir():
+                if path.is_file():
+                    path.unlink()
+                    count += 1
+        return count
@@ -1,8 +1,46 @@
+import json
 from dataclasses import dataclass
 from pathlib import Path
-from typing import List
+from typing import List, Optional
 
-import yaml
+from .cache_store import atomic_write_bytes
+
+
+def _yaml_load(stream) -> dict:
+    # PyYAML импортируется только при чтении конфигурации, LibYAML-парсер - если он доступен
+    import yaml
+    loader = getattr(yaml, 'CSafeLoader', yaml.SafeLoader)
+    return yaml.load(stream, Loader=loader)
+
+
+def _parsed_config_path(config_path: Path) -> Path:
+    # Разобранный config.yaml в JSON (импорт PyYAML - заметная часть времени запуска)
+    return config_path.parent / '.juthesis_cache' / f'{config_path.name}.json'
+
+
+def _read_config_data(config_path: Path) -> dict:
+    # Данные config.yaml; повторные запуски читают их из JSON, пока размер и mtime
+    # файла конфигурации не изменились
+    stat = config_path.stat()
+    state = [str(config_path.resolve()), stat.st_size, stat.st_mtime_ns]
+    parsed_path = _parsed_config_path(config_path)
+    try:
+        cached = json.loads(parsed_path.read_text(encoding='utf-8'))
+        if cached['state'] == state:
+            return cached['data']
+    except (OSError, ValueError, KeyError, TypeError):
+        pass
+
+    with open(config_path, 'r', encoding='utf-8') as f:
+        data = _yaml_load(f) or {}
+
+    try:
+        payload = json.dumps({'state': state, 'data': data})
+        atomic_write_bytes(parsed_path, payload.encode('utf-8'))
+    except (OSError, TypeError, ValueError):
+        # Значения, не представимые в JSON (например, даты), и недоступная для записи директория
+        pass
+    return data
 
 
 @dataclass
@@ -18,6 +56,13 @@ class PluginConfig:
     test_patterns: List[str]
     exclude_patterns: List[str]
 
+    # Параметры сканирования
+    scan_workers: int
+    scan_chunk_size: int
+
+    # Число потоков для независимых этапов пайплайна (1 - последовательно)
+    pipeline_workers: int
+
     # Git параметры
     base_ref: str
     target_ref: str
@@ -25,29 +70,71 @@ class PluginConfig:
     # Пути к файлам данных
     coverage_file: Path
     durations_file: Path
+    coverage_shards: int
+    coverage_refresh: str
+    # Сбор покрытия: 'coverage' - coverage.py с контекстами тестов (покрытие строк),
+    # 'functions' - входы в функции через sys.monitoring / sys.setprofile (pytest плагин)
+    coverage_collector: str
+    functions_file: Path
+
+    # История времени выполнения тестов
+    durations_history_enabled: bool
+    durations_history_file: Path
+    durations_estimate: str
+    durations_ewma_alpha: float
+    durations_window: int
 
     # Параметры JuThesis
     time_budget: float
     max_initial_coverage_size: int
+    reduce_tests: bool
+    greedy_selection: bool
+    split_components: bool
 
     # Выходные файлы
     output_dir: Path
     input_json_name: str
+    reduction_json_name: str
+    selection_json_name: str
+    manifest_json_name: str
+    output_format: str
+    output_compress: bool
     
+    # Watch-режим: период опроса файлов и полного обхода паттернов
+    watch_interval: float
+    watch_rescan_interval: float
+
+    # Метрики этапов пайплайна
+    metrics_enabled: bool
+    metrics_file: Path
+    metrics_prometheus_file: Optional[Path]
+
     # Параметры кэширования
     cache_enabled: bool
     cache_directory: Path
+    cache_max_size_mb: float
+    cache_max_entries: int
+
+    @property
+    def coverage_data_file(self) -> Path:
+        """ Файл данных покрытия выбранного способа сбора (относительно проекта) """
+        return self.functions_file if self.coverage_collector == 'functions' else self.coverage_file
 
     @property
     def coverage_file_path(self) -> Path:
-        """ Полный путь к файлу coverage """
-        return self.sample_project_root / self.coverage_file
+        """ Полный путь к файлу данных покрытия (база coverage.py или покрытие функций) """
+        return self.sample_project_root / self.coverage_data_file
 
     @property
     def durations_file_path(self) -> Path:
         """ Полный путь к файлу durations """
         return self.sample_project_root / self.durations_file
 
+    @property
+    def durations_history_path(self) -> Path:
+        """ Полный путь к базе истории времени выполнения """
+        return self.sample_project_root / self.durations_history_file
+
     @property
     def output_path(self) -> Path:
         """ Полный путь к директории вывода """
@@ -57,7 +144,55 @@ class PluginConfig:
     def input_json_path(self) -> Path:
         """ Полный путь к input.json """
         return self.output_path / self.input_json_name
+
+    @property
+    def reduction_json_path(self) -> Path:
+        """ Полный путь к отображению сокращенных тестов """
+        return self.output_path / self.reduction_json_name
+
+    @property
+    def selection_json_path(self) -> Path:
+        """ Полный путь к результату встроенного выбора тестов """
+        return self.output_path / self.selection_json_name
+
+    @property
+    def manifest_json_path(self) -> Path:
+        """ Полный путь к манифесту компонент ProtocolInput """
+        return self.output_path / self.manifest_json_name
+
+    def protocol_output_path(self, json_path: Path) -> Path:
+        """ Путь к файлу ProtocolInput с учетом формата вывода (.jsonl и .gz для compact) """
+        if self.output_format != 'compact':
+            return json_path
+        suffix = '.jsonl.gz' if self.output_compress else '.jsonl'
+        return json_path.with_name(json_path.stem + suffix)
+
+    @staticmethod
+    def protocol_output_variants(json_path: Path) -> List[Path]:
+        """ Пути файла ProtocolInput во всех форматах вывода (json, compact, compact + gzip) """
+        return [
+            json_path,
+            json_path.with_name(json_path.stem + '.jsonl'),
+            json_path.with_name(json_path.stem + '.jsonl.gz'),
+        ]
+
+    def component_json_path(self, index: int) -> Path:
+        """ Путь к ProtocolInput компоненты с номером index """
+        input_path = self.input_json_path
+        return input_path.with_name(f"{input_path.stem}.part{index}{input_path.suffix}")
     
+    @property
+    def metrics_path(self) -> Path:
+        """ Полный путь к JSON с метриками этапов """
+        return self.output_path / self.metrics_file
+
+    @property
+    def metrics_prometheus_path(self) -> Optional[Path]:
+        """ Полный путь к textfile Prometheus (None - не записывать) """
+        if self.metrics_prometheus_file is None:
+            return None
+        return self.project_root / self.metrics_prometheus_file
+
     @property
     def cache_dir(self) -> Path:
         """ Полный путь к директории кэша """
@@ -75,19 +210,22 @@ class ConfigLoader:
         if not config_path.exists():
             raise FileNotFoundError(f"Configuration file not found: {config_path}")
 
-        with open(config_path, 'r', encoding='utf-8') as f:
-            data = yaml.safe_load(f)
+        data = _read_config_data(config_path)
 
         # Получаем корень проекта из конфига или используем директорию конфига
         project_root = Path(data.get('project', {}).get('root', config_path.parent))
 
         # Парсим секции конфигурации
         project_config = data.get('project', {})
+        scanner_config = data.get('scanner', {})
+        pipeline_config = data.get('pipeline', {})
         git_config = data.get('git', {})
         coverage_config = data.get('coverage', {})
         durations_config = data.get('durations', {})
         juthesis_config = data.get('juthesis', {})
         output_config = data.get('output', {})
+        watch_config = data.get('watch', {})
+        metrics_config = data.get('metrics', {})
         cache_config = data.get('cache', {})
 
         return PluginConfig(
@@ -99,23 +237,60 @@ class ConfigLoader:
             exclude_patterns=project_config.get('exclude_patterns', [
                 '**/test_*.py',
                 '**/__pycache__/**',
-                '**/migrations/**'
+                '**/migrations/**',
+                '**/node_modules/**',
+                '**/.venv/**',
+                '**/venv/**'
             ]),
 
+            scan_workers=scanner_config.get('workers', 0),
+            scan_chunk_size=scanner_config.get('chunk_size', 0),
+
+            pipeline_workers=pipeline_config.get('workers', 4),
+
             base_ref=git_config.get('base_ref', 'HEAD~1'),
             target_ref=git_config.get('target_ref', 'HEAD'),
 
             coverage_file=Path(coverage_config.get('file', '.coverage')),
-            durations_file=Path(durations_config.get('file', '.test_durations.json')),
+            coverage_shards=coverage_config.get('shards', 1),
+            coverage_refresh=coverage_config.get('refresh', 'incremental'),
+            coverage_collector=coverage_config.get('collector', 'coverage'),
+            functions_file=Path(coverage_config.get('functions_file', '.juthesis_functions.json')),
+            durations_file=Path(durations_config.get('file', '.test_durations.tsv')),
+
+            durations_history_enabled=durations_config.get('history', True),
+            durations_history_file=Path(durations_config.get('history_file', '.test_durations_history.sqlite')),
+            durations_estimate=durations_config.get('estimate', 'p95'),
+            durations_ewma_alpha=durations_config.get('ewma_alpha', 0.3),
+            durations_window=durations_config.get('window', 50),
 
             time_budget=juthesis_config.get('time_budget', 300.0),
             max_initial_coverage_size=juthesis_config.get('max_initial_coverage_size', 2),
+            reduce_tests=juthesis_config.get('reduce_tests', True),
+            greedy_selection=juthesis_config.get('greedy_selection', False),
+            split_components=juthesis_config.get('split_components', False),
 
             output_dir=Path(output_config.get('directory', '.')),
             input_json_name=output_config.get('input_file', 'juthesis_input.json'),
+            reduction_json_name=output_config.get('reduction_file', 'juthesis_reduction.json'),
+            selection_json_name=output_config.get('selection_file', 'juthesis_selection.json'),
+            manifest_json_name=output_config.get('manifest_file', 'juthesis_manifest.json'),
+            output_format=output_config.get('format', 'json'),
+            output_compress=output_config.get('compress', False),
+
+            watch_interval=watch_config.get('interval', 0.05),
+            watch_rescan_interval=watch_config.get('rescan_interval', 2.0),
+
+            metrics_enabled=metrics_config.get('enabled', True),
+            metrics_file=Path(metrics_config.get('file', 'juthesis_metrics.json')),
+            metrics_prometheus_file=(
+                Path(metrics_config['prometheus_file']) if metrics_config.get('prometheus_file') else None
+            ),
             
             cache_enabled=cache_config.get('enabled', True),
-            cache_directory=Path(cache_config.get('directory', '.juthesis_cache'))
+            cache_directory=Path(cache_config.get('directory', '.juthesis_cache')),
+            cache_max_size_mb=cache_config.get('max_size_mb', 512),
+            cache_max_entries=cache_config.get('max_entries', 64)
         )
 
     @staticmethod
@@ -130,32 +305,73 @@ class ConfigLoader:
                 'exclude_patterns': [
                     '**/test_*.py',
                     '**/__pycache__/**',
-                    '**/migrations/**'
+                    '**/migrations/**',
+                    '**/node_modules/**',
+                    '**/.venv/**',
+                    '**/venv/**'
                 ]
             },
+            'scanner': {
+                'workers': 0,
+                'chunk_size': 0
+            },
+            'pipeline': {
+                'workers': 4
+            },
             'git': {
                 'base_ref': 'HEAD~1',
                 'target_ref': 'HEAD'
             },
             'coverage': {
-                'file': '.coverage'
+                'file': '.coverage',
+                'shards': 1,
+                'refresh': 'incremental',
+                'collector': 'coverage',
+                'functions_file': '.juthesis_functions.json'
             },
             'durations': {
-                'file': '.test_durations.json'
+                'file': '.test_durations.tsv',
+                'history': True,
+                'history_file': '.test_durations_history.sqlite',
+                'estimate': 'p95',
+                'ewma_alpha': 0.3,
+                'window': 50
             },
             'juthesis': {
                 'time_budget': 300.0,
-                'max_initial_coverage_size': 2
+                'max_initial_coverage_size': 2,
+                'reduce_tests': True,
+                'greedy_selection': False,
+                'split_components': False
             },
             'output': {
                 'directory': '.',
-                'input_file': 'juthesis_input.json'
+                'input_file': 'juthesis_input.json',
+                'reduction_file': 'juthesis_reduction.json',
+                'selection_file': 'juthesis_selection.json',
+                'manifest_file': 'juthesis_manifest.json',
+                'format': 'json',
+                'compress': False
+            },
+            'watch': {
+                'interval': 0.05,
+                'rescan_interval': 2.0
+            },
+            'metrics': {
+                'enabled': True,
+                'file': 'juthesis_metrics.json',
+                'prometheus_file': None
             },
             'cache': {
                 'enabled': True,
-                'directory': '.juthesis_cache'
+                'directory': '.juthesis_cache',
+                'max_size_mb': 512,
+                'max_entries': 64
             }
         }
 
+        # Импорт до открытия файла: при ошибке импорта существующий файл не обрезается
+        import yaml
+
         with open(output_path, 'w', encoding='utf-8') as f:
             yaml.dump(default_config, f, default_flow_style=False, allow_unicode=True)
@@ -1,27 +1,75 @@
+import bisect
+from dataclasses import dataclass, field
 from pathlib import Path
-from typing import Dict, Set, List, Optional
+from typing import Dict, Iterable, List, Set, Optional, Tuple
 
-from coverage import Coverage
+from .coverage_reader import CoverageDbReader
+from .function_coverage import FunctionCoverageData
+from .function_index import FunctionIndex
+from .scanner import FunctionInfo, FunctionScanner, FunctionLineIndex
 
-from .scanner import FunctionScanner, FunctionInfo
+
+@dataclass
+class FileCoverage:
+    # Результат анализа покрытия одного файла
+    lines_digest: str
+    functions_digest: str
+    test_to_functions: Dict[str, Set[str]]
+
+
+@dataclass
+class CoverageSnapshot:
+    """ Пофайловые результаты анализа покрытия для инкрементального повторного анализа """
+    # Путь, размер и mtime базы coverage на момент анализа
+    db_state: Tuple[str, int, int]
+    files: Dict[str, FileCoverage] = field(default_factory=dict)
+
+    def merge(self) -> Dict[str, Set[str]]:
+        """ Объединение пофайловых результатов в mapping: test_id -> множество функций """
+        test_to_functions: Dict[str, Set[str]] = {}
+        for file_coverage in self.files.values():
+            for test_id, identifiers in file_coverage.test_to_functions.items():
+                test_to_functions.setdefault(test_id, set()).update(identifiers)
+        return test_to_functions
+
+
+@dataclass
+class CoverageUpdateStats:
+    """ Статистика инкрементального анализа покрытия """
+    reused: int = 0
+    analyzed: int = 0
+    removed: int = 0
 
 
 class CoverageAnalyzer:
     """ Анализатор покрытия тестов """
 
-    def __init__(self, coverage_file: Path, function_scanner: FunctionScanner):
+    def __init__(
+            self,
+            coverage_file: Path,
+            function_scanner: FunctionScanner,
+            function_index: Optional[FunctionIndex] = None
+    ):
         self.coverage_file = coverage_file
         self.function_scanner = function_scanner
-        self._function_index: Optional[Dict[Path, List[FunctionInfo]]] = None
+        self._function_index = function_index
         self._coverage_data = None
+        self._functions_files_count = 0
+        self.last_stats = CoverageUpdateStats()
 
     @property
-    def function_index(self) -> Dict[Path, List[FunctionInfo]]:
-        """ Ленивая загрузка индекса функций """
+    def function_index(self) -> FunctionIndex:
+        """ Общий индекс функций, если он не передан - ленивое построение """
         if self._function_index is None:
-            self._function_index = self.function_scanner.build_index()
+            self._function_index = FunctionIndex(self.function_scanner.build_index())
+        else:
+            self._function_index.mark_reused('coverage')
         return self._function_index
 
+    @function_index.setter
+    def function_index(self, function_index: FunctionIndex) -> None:
+        self._function_index = function_index
+
     @property
     def coverage_data(self):
         """ Ленивая загрузка coverage данных """
@@ -32,6 +80,9 @@ class CoverageAnalyzer:
                     f"Run pytest with: pytest --cov=src --cov-context=test"
                 )
 
+            # coverage.py нужен только для баз неизвестного формата, импортируем по требованию
+            from coverage import Coverage
+
             cov = Coverage(data_file=str(self.coverage_file))
             cov.load()
             self._coverage_data = cov.get_data()
@@ -45,6 +96,10 @@ class CoverageAnalyzer:
 
         return self._coverage_data
 
+    def get_line_index(self, file_path: Path) -> Optional[FunctionLineIndex]:
+        """ Таблица поиска функций по строкам для файла (строится один раз) """
+        return self.function_index.line_index(file_path)
+
     def _has_contexts(self) -> bool:
         # Проверка, есть ли контексты в coverage данных
         for filename in self._coverage_data.measured_files():
@@ -58,6 +113,215 @@ class CoverageAnalyzer:
         Проанализировать покрытие
         Возвращает mapping: test_id -> множество функций
         """
+        if not self.coverage_file.exists():
+            raise FileNotFoundError(
+                f"Coverage file not found: {self.coverage_file}\n"
+                f"Run pytest with: pytest --cov=src --cov-context=test"
+            )
+
+        if FunctionCoverageData.is_function_coverage(self.coverage_file):
+            return self._analyze_functions()
+
+        reader = CoverageDbReader(self.coverage_file)
+        try:
+            if reader.is_supported():
+                return self._analyze_db(reader)
+        finally:
+            reader.close()
+
+        # Неизвестный формат базы, используем API coverage.py
+        return self._analyze_coverage_api()
+
+    @staticmethod
+    def _check_contexts(reader: CoverageDbReader) -> None:
+        # Без контекстов нельзя сопоставить строки тестам
+        if not reader.has_contexts():
+            raise ValueError(
+                "Coverage file does not contain contexts.\n"
+                "Make sure pytest was run with --cov-context=test"
+            )
+
+    def _map_rows(self, rows: Iterable[Tuple[str, str, tuple]]) -> Dict[str, Dict[str, Set[str]]]:
+        # Сопоставление потока строк базы функциям
+        # Возвращает mapping: путь к файлу -> test_id -> множество функций
+        result: Dict[str, Dict[str, Set[str]]] = {}
+        current_file = None
+        line_index = None
+        file_map: Dict[str, Set[str]] = {}
+        # Кеш: набор покрытых строк -> идентификаторы функций (в пределах одного файла)
+        functions_by_lines: Dict[tuple, Set[str]] = {}
+
+        for filename, test_id, lines in rows:
+            if filename != current_file:
+                current_file = filename
+                functions_by_lines = {}
+                file_path = Path(filename).resolve()
+                line_index = self.get_line_index(file_path) if file_path.suffix == '.py' else None
+                file_map = result.setdefault(filename, {})
+
+            if line_index is None:
+                continue
+
+            identifiers = functions_by_lines.get(lines)
+            if identifiers is None:
+                identifiers = {func.identifier for func in line_index.find_many(lines).values()}
+                functions_by_lines[lines] = identifiers
+
+            if identifiers:
+                file_map.setdefault(test_id, set()).update(identifiers)
+
+        return result
+
+    def _analyze_db(self, reader: CoverageDbReader) -> Dict[str, Set[str]]:
+        # Анализ покрытия прямым чтением SQLite базы coverage
+        self._check_contexts(reader)
+
+        test_to_functions: Dict[str, Set[str]] = {}
+        for file_map in self._map_rows(reader.iter_rows()).values():
+            for test_id, identifiers in file_map.items():
+                test_to_functions.setdefault(test_id, set()).update(identifiers)
+
+        return test_to_functions
+
+    def _db_state(self) -> Tuple[str, int, int]:
+        # Быстрый отпечаток файла базы по метаданным
+        stat = self.coverage_file.stat()
+        return str(self.coverage_file.resolve()), stat.st_size, stat.st_mtime_ns
+
+    def analyze_incremental(
+            self,
+            previous: Optional[CoverageSnapshot] = None
+    ) -> Tuple[Dict[str, Set[str]], Optional[CoverageSnapshot]]:
+        """
+        Инкрементальный анализ покрытия
+        Заново анализируются только файлы, у которых изменились данные покрытия в базе
+        или границы функций, результаты остальных файлов берутся из previous
+        Возвращает (mapping: test_id -> множество функций, новый снимок для следующего запуска)
+        Для баз неизвестного формата выполняется полный анализ, снимок не возвращается
+        """
+        if not self.coverage_file.exists():
+            raise FileNotFoundError(
+                f"Coverage file not found: {self.coverage_file}\n"
+                f"Run pytest with: pytest --cov=src --cov-context=test"
+            )
+
+        if FunctionCoverageData.is_function_coverage(self.coverage_file):
+            # Входы в функции сопоставляются индексу поиском по словарю, снимок не нужен
+            test_coverage = self._analyze_functions()
+            self.last_stats = CoverageUpdateStats(analyzed=self._functions_files_count)
+            return test_coverage, None
+
+        reader = CoverageDbReader(self.coverage_file)
+        try:
+            if not reader.is_supported():
+                self.last_stats = CoverageUpdateStats(analyzed=len(self.function_index))
+                return self._analyze_coverage_api(), None
+
+            self._check_contexts(reader)
+            snapshot = CoverageSnapshot(db_state=self._db_state())
+            stats = CoverageUpdateStats()
+
+            # Файлы базы, для которых есть функции в индексе
+            tracked: Dict[int, Tuple[str, str]] = {}
+            for file_id, filename in reader.read_files().items():
+                file_path = Path(filename).resolve()
+                if file_path.suffix != '.py':
+                    continue
+                functions_digest = self.function_index.functions_digest(file_path)
+                if functions_digest is not None:
+                    tracked[file_id] = (filename, functions_digest)
+
+            # Если база не менялась, отпечатки строк берем из предыдущего снимка
+            lines_digests: Dict[int, str] = {}
+            same_db = previous is not None and previous.db_state == snapshot.db_state
+            if same_db:
+                for file_id, (filename, _) in tracked.items():
+                    previous_file = previous.files.get(filename)
+                    if previous_file is not None:
+                        lines_digests[file_id] = previous_file.lines_digest
+            unknown = [file_id for file_id in tracked if file_id not in lines_digests]
+            if unknown:
+                fingerprints = reader.file_fingerprints(unknown)
+                for file_id in unknown:
+                    lines_digests[file_id] = fingerprints.get(file_id, '')
+
+            # Переиспользуем неизменившиеся файлы
+            to_analyze: Dict[int, Tuple[str, str]] = {}
+            for file_id, (filename, functions_digest) in tracked.items():
+                previous_file = previous.files.get(filename) if previous is not None else None
+                if (
+                        previous_file is not None
+                        and previous_file.lines_digest == lines_digests[file_id]
+                        and previous_file.functions_digest == functions_digest
+                ):
+                    snapshot.files[filename] = previous_file
+                    stats.reused += 1
+                else:
+                    to_analyze[file_id] = (filename, functions_digest)
+
+            # Анализируем только измененные файлы
+            if to_analyze:
+                mapped = self._map_rows(reader.iter_rows(to_analyze.keys()))
+                for file_id, (filename, functions_digest) in to_analyze.items():
+                    snapshot.files[filename] = FileCoverage(
+                        lines_digest=lines_digests[file_id],
+                        functions_digest=functions_digest,
+                        test_to_functions=mapped.get(filename, {})
+                    )
+                    stats.analyzed += 1
+
+            if previous is not None:
+                stats.removed = len(set(previous.files) - set(snapshot.files))
+
+            self.last_stats = stats
+            return snapshot.merge(), snapshot
+        finally:
+            reader.close()
+
+    def _analyze_functions(self) -> Dict[str, Set[str]]:
+        # Анализ покрытия на уровне функций (входы в функции, записанные pytest плагином)
+        data = FunctionCoverageData.read(self.coverage_file)
+
+        # Файл -> имя функции -> функции с этим именем по возрастанию строки определения
+        by_file: Dict[str, Optional[Dict[str, List[FunctionInfo]]]] = {}
+        test_to_functions: Dict[str, Set[str]] = {}
+        for test_id, entries in data.tests.items():
+            identifiers = set()
+            for filename, first_line, name in entries:
+                if filename not in by_file:
+                    by_file[filename] = self._functions_by_name(Path(filename).resolve())
+                functions = by_file[filename]
+                if functions is None:
+                    continue
+                func = self._find_entered_function(functions.get(name), first_line)
+                if func is not None:
+                    identifiers.add(func.identifier)
+            if identifiers:
+                test_to_functions[test_id] = identifiers
+
+        self._functions_files_count = sum(1 for functions in by_file.values() if functions is not None)
+        return test_to_functions
+
+    def _functions_by_name(self, file_path: Path) -> Optional[Dict[str, List[FunctionInfo]]]:
+        functions = self.function_index.get(file_path)
+        if not functions:
+            return None
+        result: Dict[str, List[FunctionInfo]] = {}
+        for func in sorted(functions, key=lambda f: f.start_line):
+            result.setdefault(func.name, []).append(func)
+        return result
+
+    @staticmethod
+    def _find_entered_function(candidates: Optional[List[FunctionInfo]], first_line: int) -> Optional[FunctionInfo]:
+        # Первая строка объекта кода - строка def или, при наличии декораторов, первого
+        # декоратора, поэтому берем ближайшую функцию с этим именем, начинающуюся не раньше
+        if not candidates:
+            return None
+        position = bisect.bisect_left([func.start_line for func in candidates], first_line)
+        return candidates[position] if position < len(candidates) else None
+
+    def _analyze_coverage_api(self) -> Dict[str, Set[str]]:
+        # Анализ покрытия через contexts_by_lineno из coverage.py
         test_to_functions: Dict[str, Set[str]] = {}
 
         for filename in self.coverage_data.measured_files():
@@ -67,9 +331,9 @@ class CoverageAnalyzer:
             if not file_path.suffix == '.py':
                 continue
 
-            # Получаем функции из индекса
-            functions = self.function_index.get(file_path)
-            if not functions:
+            # Получаем таблицу поиска функций из индекса
+            line_index = self.get_line_index(file_path)
+            if line_index is None:
                 continue
 
             # Получаем контексты для каждой строки файла
@@ -77,12 +341,12 @@ class CoverageAnalyzer:
             if not contexts_by_line:
                 continue
 
+            # Находим самые вложенные функции для всех покрытых строк разом
+            functions_by_line = line_index.find_many(contexts_by_line.keys())
+
             # Обрабатываем каждую строку с покрытием
-            for line, contexts in contexts_by_line.items():
-                # Находим функцию, содержащую эту строку
-                func = self.function_scanner.find_function_at_line(functions, line)
-                if not func:
-                    continue
+            for line, func in functions_by_line.items():
+                contexts = contexts_by_line[line]
 
                 # Обрабатываем контексты (тесты), покрывшие эту строку
                 for context in contexts:
@@ -105,11 +369,7 @@ class CoverageAnalyzer:
 
     def get_all_functions(self) -> Set[str]:
         """ Геттер множества всех функций в проекте """
-        all_functions = set()
-        for functions in self.function_index.values():
-            for func in functions:
-                all_functions.add(func.identifier)
-        return all_functions
+        return self.function_index.identifiers()
 
     @staticmethod
     def get_covered_functions(
@@ -0,0 +1,87 @@
+from typing import Dict, Iterable, List, Optional
+
+
+class CoverageMatrix:
+    """
+    Матрица покрытия тест x функция в виде битовых масок
+    Идентификаторы функций интернируются в номера битов (в лексикографическом порядке,
+    поэтому декодирование маски сразу дает отсортированный список), покрытие каждого
+    теста хранится как упакованный int, пересечения и объединения - побитовые операции
+    """
+
+    def __init__(self, test_coverage: Dict[str, Iterable[str]], functions: Optional[Iterable[str]] = None):
+        """
+        functions - интернировать только эти функции (например, измененные): в матрицу попадают
+        только тесты, покрывающие хотя бы одну из них. Отбор идет пересечением множеств строк
+        на уровне C, биты выставляются только для пересечений, а не для всего покрытия тестов
+        """
+        if functions is None:
+            coverage = test_coverage
+        else:
+            selected = set(functions)
+            coverage = {}
+            for test_id, covered_funcs in test_coverage.items():
+                # Оператор & для множеств быстрее вызова метода intersection
+                if isinstance(covered_funcs, (set, frozenset)):
+                    common = covered_funcs & selected
+                else:
+                    common = selected.intersection(covered_funcs)
+                if common:
+                    coverage[test_id] = common
+        # Покрытие тестов матрицы в виде строк (для functions - только пересечения с ними)
+        self.coverage: Dict[str, Iterable[str]] = coverage
+
+        self.functions: List[str] = sorted(set().union(*coverage.values()))
+        self.function_bits: Dict[str, int] = {func_id: bit for bit, func_id in enumerate(self.functions)}
+        # Матрица содержит только покрытые функции, поэтому объединение - все биты
+        self.union = (1 << len(self.functions)) - 1
+        self._rows: Optional[Dict[str, int]] = None
+
+    @property
+    def rows(self) -> Dict[str, int]:
+        """ Маски покрытия тестов (строятся при первом обращении) """
+        if self._rows is None:
+            # Биты строки выставляются в bytearray и переводятся в int один раз:
+            # row |= 1 << bit создавал бы новый int размером со все множество функций на каждый бит
+            bits = self.function_bits
+            row_bytes = (len(self.functions) + 7) // 8
+            rows = {}
+            for test_id, covered_funcs in self.coverage.items():
+                row = bytearray(row_bytes)
+                for bit in map(bits.__getitem__, covered_funcs):
+                    row[bit >> 3] |= 1 << (bit & 7)
+                rows[test_id] = int.from_bytes(row, 'little')
+            self._rows = rows
+        return self._rows
+
+    def __len__(self) -> int:
+        return len(self.coverage)
+
+    def mask(self, functions: Iterable[str]) -> int:
+        """ Маска функций, неизвестные матрице функции (никем не покрытые) пропускаются """
+        bits = self.function_bits
+        mask = 0
+        for func_id in functions:
+            bit = bits.get(func_id)
+            if bit is not None:
+                mask |= 1 << bit
+        return mask
+
+    def decode(self, mask: int) -> List[str]:
+        """ Отсортированный список функций маски """
+        functions = self.functions
+        result = []
+        while mask:
+            low = mask & -mask
+            result.append(functions[low.bit_length() - 1])
+            mask ^= low
+        return result
+
+    @staticmethod
+    def count(mask: int) -> int:
+        """ Количество функций в маске """
+        return mask.bit_count()
+
+    def covered_count(self) -> int:
+        """ Количество функций, покрытых хотя бы одним тестом """
+        return self.union.bit_count()
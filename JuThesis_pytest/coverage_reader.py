@@ -0,0 +1,226 @@
+import hashlib
+import sqlite3
+from pathlib import Path
+from typing import Collection, Dict, Iterator, List, Optional, Tuple
+
+# Для каждого значения байта - номера установленных в нем битов
+_BYTE_BITS: List[Tuple[int, ...]] = [
+    tuple(bit for bit in range(8) if value & (1 << bit))
+    for value in range(256)
+]
+
+
+def decode_numbits(numbits: bytes) -> List[int]:
+    """
+    Декодирование numbits (формат coverage.numbits) в список номеров строк
+    Бит i байта j соответствует строке j * 8 + i
+    """
+    lines = []
+    for offset, value in enumerate(numbits):
+        if value:
+            base = offset * 8
+            lines.extend(base + bit for bit in _BYTE_BITS[value])
+    return lines
+
+
+class CoverageDbReader:
+    """
+    Прямое чтение SQLite базы coverage.py без построения contexts_by_lineno
+    Данные читаются пакетно из таблиц file, context, line_bits (или arc для branch-покрытия)
+    и отдаются потоком строк (файл, тест, строки)
+    """
+
+    # Размер пакета строк, читаемых из курсора за раз
+    FETCH_SIZE = 4096
+    # Максимальное число file_id в одном условии IN (...)
+    FILE_IDS_CHUNK = 500
+
+    def __init__(self, coverage_file: Path):
+        self.coverage_file = coverage_file
+        self._connection: Optional[sqlite3.Connection] = None
+
+    @property
+    def connection(self) -> sqlite3.Connection:
+        """ Ленивое открытие базы только на чтение """
+        if self._connection is None:
+            if not self.coverage_file.exists():
+                raise FileNotFoundError(
+                    f"Coverage file not found: {self.coverage_file}\n"
+                    f"Run pytest with: pytest --cov=src --cov-context=test"
+                )
+            uri = f"{self.coverage_file.resolve().as_uri()}?mode=ro"
+            self._connection = sqlite3.connect(uri, uri=True)
+        return self._connection
+
+    def close(self) -> None:
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+    def is_supported(self) -> bool:
+        """ Проверка, что файл является SQLite базой coverage.py с ожидаемой схемой """
+        try:
+            tables = {
+                row[0] for row in self.connection.execute(
+                    "SELECT name FROM sqlite_master WHERE type = 'table'"
+                )
+            }
+        except sqlite3.DatabaseError:
+            return False
+        return {'file', 'context', 'line_bits', 'arc'} <= tables
+
+    def has_arcs(self) -> bool:
+        # Записано ли branch-покрытие (тогда строки берутся из таблицы arc)
+        row = self.connection.execute(
+            "SELECT value FROM meta WHERE key = 'has_arcs'"
+        ).fetchone()
+        return bool(row) and row[0] in ('1', 'True', 'true')
+
+    def has_contexts(self) -> bool:
+        """ Есть ли в базе непустые контексты """
+        row = self.connection.execute(
+            "SELECT 1 FROM context WHERE context != '' LIMIT 1"
+        ).fetchone()
+        return row is not None
+
+    def read_files(self) -> Dict[int, str]:
+        """ Mapping: file_id -> путь к файлу """
+        return dict(self.connection.execute("SELECT id, path FROM file"))
+
+    def read_test_contexts(self) -> Dict[int, str]:
+        """
+        Mapping: context_id -> test_id
+        Контексты формата "test_id|phase", setup/teardown фазы и пустые контексты отбрасываются
+        """
+        contexts = {}
+        for context_id, context in self.connection.execute("SELECT id, context FROM context"):
+            test_id, _, phase = context.partition("|")
+            if phase not in ("", "run") or not test_id:
+                continue
+            contexts[context_id] = test_id
+        return contexts
+
+    def _fetch(self, query: str, params: tuple = ()) -> Iterator[tuple]:
+        # Пакетное чтение строк запроса
+        cursor = self.connection.execute(query, params)
+        while True:
+            rows = cursor.fetchmany(self.FETCH_SIZE)
+            if not rows:
+                break
+            yield from rows
+
+    def _fetch_for_files(
+            self,
+            columns: str,
+            table: str,
+            order_by: str,
+            file_ids: Optional[Collection[int]]
+    ) -> Iterator[tuple]:
+        # Чтение строк таблицы для всех файлов или только для выбранных (пачками file_id)
+        if file_ids is None:
+            yield from self._fetch(f"SELECT {columns} FROM {table} ORDER BY {order_by}")
+            return
+
+        ids = sorted(file_ids)
+        for start in range(0, len(ids), self.FILE_IDS_CHUNK):
+            chunk = tuple(ids[start:start + self.FILE_IDS_CHUNK])
+            placeholders = ", ".join("?" * len(chunk))
+            yield from self._fetch(
+                f"SELECT {columns} FROM {table} WHERE file_id IN ({placeholders}) ORDER BY {order_by}",
+                chunk
+            )
+
+    def _iter_line_bits(
+            self,
+            file_ids: Optional[Collection[int]] = None
+    ) -> Iterator[Tuple[int, int, Tuple[int, ...]]]:
+        # Строки из таблицы line_bits, одинаковые numbits декодируются один раз в пределах файла
+        decoded: Dict[bytes, Tuple[int, ...]] = {}
+        current_file = None
+
+        for file_id, context_id, numbits in self._fetch_for_files(
+                "file_id, context_id, numbits", "line_bits", "file_id", file_ids
+        ):
+            if file_id != current_file:
+                current_file = file_id
+                decoded.clear()
+
+            lines = decoded.get(numbits)
+            if lines is None:
+                lines = tuple(decode_numbits(numbits))
+                decoded[numbits] = lines
+
+            yield file_id, context_id, lines
+
+    def _iter_arcs(
+            self,
+            file_ids: Optional[Collection[int]] = None
+    ) -> Iterator[Tuple[int, int, Tuple[int, ...]]]:
+        # Строки из таблицы arc: номера строк - положительные концы переходов
+        current = None
+        lines = set()
+
+        for file_id, context_id, fromno, tono in self._fetch_for_files(
+                "file_id, context_id, fromno, tono", "arc", "file_id, context_id", file_ids
+        ):
+            if (file_id, context_id) != current:
+                if current is not None:
+                    yield current[0], current[1], tuple(sorted(lines))
+                current = (file_id, context_id)
+                lines = set()
+            if fromno > 0:
+                lines.add(fromno)
+            if tono > 0:
+                lines.add(tono)
+
+        if current is not None:
+            yield current[0], current[1], tuple(sorted(lines))
+
+    def iter_rows(
+            self,
+            file_ids: Optional[Collection[int]] = None
+    ) -> Iterator[Tuple[str, str, Tuple[int, ...]]]:
+        """
+        Поток строк (путь к файлу, test_id, покрытые строки)
+        Строки отсортированы по файлу, поэтому потребитель может кешировать данные по файлу,
+        одинаковые наборы строк в пределах файла отдаются одним и тем же кортежем
+        file_ids - ограничить чтение выбранными файлами
+        """
+        files = self.read_files()
+        contexts = self.read_test_contexts()
+        rows = self._iter_arcs(file_ids) if self.has_arcs() else self._iter_line_bits(file_ids)
+
+        for file_id, context_id, lines in rows:
+            test_id = contexts.get(context_id)
+            if test_id is None or not lines:
+                continue
+            yield files[file_id], test_id, lines
+
+    def file_fingerprints(self, file_ids: Optional[Collection[int]] = None) -> Dict[int, str]:
+        """
+        Отпечаток данных покрытия каждого файла: file_id -> hash
+        Учитываются только контексты тестов, hash не зависит от порядка строк и от
+        внутренних id контекстов, поэтому совпадает для одинаковых данных в разных базах
+        """
+        contexts = self.read_test_contexts()
+        sums: Dict[int, int] = {}
+
+        if self.has_arcs():
+            rows = (
+                (file_id, context_id, f"{fromno}:{tono}".encode())
+                for file_id, context_id, fromno, tono in self._fetch_for_files(
+                    "file_id, context_id, fromno, tono", "arc", "file_id", file_ids
+                )
+            )
+        else:
+            rows = self._fetch_for_files("file_id, context_id, numbits", "line_bits", "file_id", file_ids)
+
+        for file_id, context_id, data in rows:
+            test_id = contexts.get(context_id)
+            if test_id is None:
+                continue
+            digest = hashlib.blake2b(test_id.encode() + b"\0" + data, digest_size=16).digest()
+            # Сумма по модулю 2^128 не зависит от порядка строк
+            sums[file_id] = (sums.get(file_id, 0) + int.from_bytes(digest, 'big')) & ((1 << 128) - 1)
+
+        return {file_id: f"{value:032x}" for file_id, value in sums.items()}
@@ -0,0 +1,141 @@
+import os
+import shutil
+import sqlite3
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Set
+
+from .function_coverage import FunctionCoverageData
+from .pytest_runner import PytestRunner
+
+
+class CoverageRefresher:
+    """
+    Точечное обновление устаревшего .coverage
+    Вместо полного прогона перезапускаются только тесты, затронутые измененными
+    исходниками и тестовыми файлами; их старые строки в базе заменяются свежими
+    """
+
+    def __init__(self, coverage_file: Path, project_root: Path, pytest_runner: PytestRunner):
+        self.coverage_file = coverage_file
+        self.project_root = project_root
+        self.pytest_runner = pytest_runner
+
+    def find_stale_files(self, files: Iterable[Path]) -> List[Path]:
+        """ Файлы, измененные после записи базы coverage """
+        coverage_mtime = self.coverage_file.stat().st_mtime_ns
+        stale = []
+        for file_path in files:
+            try:
+                if file_path.stat().st_mtime_ns > coverage_mtime:
+                    stale.append(file_path)
+            except OSError:
+                continue
+        return stale
+
+    def _relative_test_path(self, file_path: Path) -> str:
+        # Путь тестового файла в формате node id (относительно корня проекта)
+        return file_path.resolve().relative_to(self.project_root.resolve()).as_posix()
+
+    @staticmethod
+    def find_affected_tests(
+            test_coverage: Dict[str, Set[str]],
+            changed_sources: Set[str],
+            changed_test_files: Set[str],
+            collected_tests: List[str]
+    ) -> List[str]:
+        """
+        Тесты, которые нужно перезапустить:
+        покрывающие функции измененных исходников (по пути файла из идентификатора
+        file::line::name, т.к. номера строк в старой карте могли сместиться)
+        и все тесты из измененных тестовых файлов (включая новые)
+        """
+        affected = set()
+        for test_id, identifiers in test_coverage.items():
+            if any(identifier.rsplit("::", 2)[0] in changed_sources for identifier in identifiers):
+                affected.add(test_id)
+
+        for test_id in collected_tests:
+            if test_id.split("::", 1)[0] in changed_test_files:
+                affected.add(test_id)
+
+        # Запускаем только существующие тесты, порядок - как при сборе
+        return [test_id for test_id in collected_tests if test_id in affected]
+
+    def remove_test_contexts(self, test_ids: Iterable[str], data_file: Optional[Path] = None) -> int:
+        """
+        Удаление строк покрытия указанных тестов из базы (все фазы теста)
+        data_file - другой файл базы вместо .coverage (например, его временная копия)
+        """
+        test_ids = set(test_ids)
+        data_file = data_file if data_file is not None else self.coverage_file
+        if FunctionCoverageData.is_function_coverage(data_file):
+            # Покрытие на уровне функций хранится по тестам, а не по контекстам
+            data = FunctionCoverageData.read(data_file)
+            removed = data.remove_tests(test_ids)
+            data.write(data_file)
+            return removed
+        
+        connection = sqlite3.connect(str(data_file))
+        try:
+            context_ids = [
+                (context_id,)
+                for context_id, context in connection.execute("SELECT id, context FROM context")
+                if context.partition("|")[0] in test_ids
+            ]
+            with connection:
+                connection.executemany("DELETE FROM line_bits WHERE context_id = ?", context_ids)
+                connection.executemany("DELETE FROM arc WHERE context_id = ?", context_ids)
+        finally:
+            connection.close()
+        return len(context_ids)
+
+    def refresh(
+            self,
+            test_coverage: Dict[str, Set[str]],
+            stale_sources: List[Path],
+            stale_test_files: List[Path],
+            durations: Dict[str, float] | None = None
+    ) -> bool:
+        """ Перезапуск затронутых тестов и замена их контекстов в базе coverage """
+        changed_sources = {str(file_path) for file_path in stale_sources}
+        changed_test_files = {self._relative_test_path(file_path) for file_path in stale_test_files}
+
+        collected = self.pytest_runner.collect_test_ids()
+        if not collected:
+            return False
+
+        affected = self.find_affected_tests(test_coverage, changed_sources, changed_test_files, collected)
+        # Тесты, которых больше нет, удаляем из базы без перезапуска
+        removed = set(test_coverage) - set(collected)
+        print(f"Refreshing coverage for {len(affected)} affected tests ({len(removed)} removed tests)")
+
+        coverage_files: List[Path] = []
+        if affected:
+            coverage_files = self.pytest_runner.run_tests_with_coverage(
+                affected,
+                durations,
+                label="refresh",
+                update_durations=True
+            )
+            if coverage_files is None:
+                return False
+
+        # Старые контексты удаляются и новые добавляются во временной копии базы,
+        # которая заменяет .coverage только после успешного объединения
+        work_file = self.coverage_file.with_name(f"{self.coverage_file.name}.refresh-tmp")
+        try:
+            shutil.copyfile(self.coverage_file, work_file)
+            self.remove_test_contexts(set(affected) | removed, work_file)
+            if coverage_files and not self.pytest_runner.combine_coverage(
+                    coverage_files,
+                    append=True,
+                    data_file=work_file
+            ):
+                return False
+            os.replace(work_file, self.coverage_file)
+            # Обновляем mtime базы, чтобы она больше не считалась устаревшей
+            self.coverage_file.touch()
+            return True
+        finally:
+            work_file.unlink(missing_ok=True)
+            self.pytest_runner.remove_files(coverage_files)
@@ -1,23 +1,120 @@
 import json
 from pathlib import Path
-from typing import Dict
+from typing import Dict, Iterable, Mapping, Optional, Sequence, Tuple
+
+from .cache_store import atomic_write_bytes
+
+# Компактный формат времени выполнения тестов (пишет pytest плагин):
+# строка заголовка и по строке на тест "total\tsetup\tcall\tteardown\tnode id"
+# Для чтения суммарного времени достаточно split и float, без разбора JSON
+DURATIONS_HEADER = "# juthesis-durations 1"
+
+# Время фаз теста: setup, call, teardown
+DurationRecord = Tuple[float, float, float]
+
+# Файл старого JSON формата (имя по умолчанию до перехода на компактный формат)
+LEGACY_DURATIONS_FILE = ".test_durations.json"
+
+
+def existing_durations_file(path: Path) -> Path:
+    """
+    Файл, из которого читается время тестов: path, а пока его нет - файл старого формата
+    из той же директории, чтобы после обновления не перезапускать все тесты
+    """
+    if not path.exists():
+        legacy = path.with_name(LEGACY_DURATIONS_FILE)
+        if legacy != path and legacy.exists():
+            return legacy
+    return path
+
+
+def format_duration_records(records: Mapping[str, Sequence[float]]) -> str:
+    """ Записи фаз тестов в компактном формате """
+    lines = [DURATIONS_HEADER]
+    for test_id, (setup, call, teardown) in records.items():
+        lines.append(f"{setup + call + teardown:.6f}\t{setup:.6f}\t{call:.6f}\t{teardown:.6f}\t{test_id}")
+    lines.append("")
+    return "\n".join(lines)
+
+
+def parse_duration_records(text: str) -> Dict[str, DurationRecord]:
+    """
+    Записи фаз тестов из компактного формата
+    Старый JSON формат (test_id -> время фазы call) тоже поддерживается
+    """
+    if not text.startswith(DURATIONS_HEADER):
+        return {name: (0.0, float(duration), 0.0) for name, duration in json.loads(text).items()}
+
+    records = {}
+    for line in text.splitlines()[1:]:
+        if line:
+            _, setup, call, teardown, test_id = line.split("\t", 4)
+            records[test_id] = (float(setup), float(call), float(teardown))
+    return records
+
+
+def write_duration_records(path: Path, records: Mapping[str, Sequence[float]]) -> None:
+    # Атомарная запись, чтобы пайплайн не прочитал файл наполовину
+    atomic_write_bytes(path, format_duration_records(records).encode("utf-8"))
+
+
+def merge_duration_files(target: Path, files: Iterable[Path], update_existing: bool = False) -> int:
+    """
+    Объединение файлов времени выполнения (шардов или воркеров) в target, исходные файлы удаляются
+    update_existing - дополнить существующий target, а не перезаписать его
+    Возвращает количество тестов в target
+    """
+    merged: Dict[str, DurationRecord] = {}
+    sources = list(files)
+    # Существующий target (или файл старого формата, пока target нет) не удаляется
+    existing = existing_durations_file(target)
+    kept = {target, existing}
+    if update_existing:
+        sources.insert(0, existing)
+
+    for source in sources:
+        try:
+            merged.update(parse_duration_records(source.read_text(encoding="utf-8")))
+        except FileNotFoundError:
+            continue
+        except ValueError:
+            print(f"Warning: failed to read {source}")
+        if source not in kept:
+            source.unlink()
+
+    write_duration_records(target, merged)
+    return len(merged)
 
 
 class DurationCollector:
 
     def __init__(self, durations_file: Path):
         self.durations_file = durations_file
+        # Разобранный файл и его метаданные, чтобы не читать файл повторно
+        self._cached: Optional[Dict[str, float]] = None
+        self._cached_state: Optional[Tuple[str, int, int]] = None
 
     def load(self) -> Dict[str, float]:
-        # Загрузка времени выполнения тестов из JSON файла
-        if not self.durations_file.exists():
+        # Загрузка суммарного времени выполнения тестов (setup + call + teardown)
+        source = existing_durations_file(self.durations_file)
+        try:
+            stat = source.stat()
+        except OSError:
             return {}
 
+        state = (str(source), stat.st_size, stat.st_mtime_ns)
+        if self._cached is not None and self._cached_state == state:
+            return self._cached
+
         try:
-            data = json.loads(self.durations_file.read_text(encoding="utf-8"))
-            return {name: float(duration) for name, duration in data.items()}
-        except (json.JSONDecodeError, ValueError):
+            records = parse_duration_records(source.read_text(encoding="utf-8"))
+        except ValueError:
             return {}
+        durations = {test_id: sum(record) for test_id, record in records.items()}
+
+        self._cached = durations
+        self._cached_state = state
+        return durations
 
     def get_test_time(self, test_id: str, default: float = 0.0) -> float:
         # Получение времени выполнения конкретного теста
@@ -0,0 +1,192 @@
+import hashlib
+import json
+import sqlite3
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Optional
+
+# Статистики, которые можно использовать как оценку времени теста
+ESTIMATES = ('ewma', 'p50', 'p95', 'last')
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    source TEXT,
+    digest TEXT UNIQUE,
+    ingested_at REAL
+);
+CREATE TABLE IF NOT EXISTS samples (
+    id INTEGER PRIMARY KEY,
+    run_id INTEGER REFERENCES runs (id),
+    test_id TEXT,
+    duration REAL
+);
+CREATE INDEX IF NOT EXISTS samples_test ON samples (test_id, id);
+CREATE INDEX IF NOT EXISTS samples_run ON samples (run_id);
+CREATE TABLE IF NOT EXISTS stats (
+    test_id TEXT PRIMARY KEY,
+    sample_count INTEGER,
+    ewma REAL,
+    p50 REAL,
+    p95 REAL,
+    last REAL
+);
+"""
+
+
+@dataclass
+class TestDurationStats:
+    """ Скользящая статистика времени выполнения теста """
+    sample_count: int
+    ewma: float
+    p50: float
+    p95: float
+    last: float
+
+
+def _percentile(sorted_values: List[float], q: float) -> float:
+    # Перцентиль с линейной интерполяцией между соседними значениями
+    if not sorted_values:
+        return 0.0
+    position = (len(sorted_values) - 1) * q
+    lower = int(position)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    fraction = position - lower
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * fraction
+
+
+class DurationHistory:
+    """
+    Локальная история времени выполнения тестов в SQLite
+    Каждый прогон добавляется в таблицу samples (append-only), по каждому тесту поддерживается
+    скользящая статистика (EWMA, p50, p95 по последним window замерам, число замеров)
+    """
+
+    def __init__(self, db_path: Path, ewma_alpha: float = 0.3, window: int = 50):
+        self.db_path = db_path
+        self.ewma_alpha = ewma_alpha
+        self.window = window
+        self._connection: Optional[sqlite3.Connection] = None
+
+    @property
+    def connection(self) -> sqlite3.Connection:
+        """ Ленивое открытие базы с созданием схемы """
+        if self._connection is None:
+            self.db_path.parent.mkdir(parents=True, exist_ok=True)
+            self._connection = sqlite3.connect(str(self.db_path))
+            self._connection.executescript(_SCHEMA)
+        return self._connection
+
+    def close(self) -> None:
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+    @staticmethod
+    def compute_digest(durations: Dict[str, float]) -> str:
+        # Hash снимка времени выполнения, чтобы один и тот же прогон не учитывался дважды
+        serialized = json.dumps(durations, sort_keys=True)
+        return hashlib.sha256(serialized.encode()).hexdigest()
+
+    def ingest(
+            self,
+            durations: Dict[str, float],
+            source: str = "",
+            snapshot: Optional[Dict[str, float]] = None
+    ) -> bool:
+        """
+        Добавить замеры прогона в историю и обновить статистику затронутых тестов
+        snapshot - полный снимок файла времени выполнения, если durations - только его часть
+        (перезапущенные тесты); повторное добавление определяется по снимку
+        Возвращает False, если этот снимок уже был добавлен ранее
+        """
+        if not durations:
+            return False
+
+        digest = self.compute_digest(snapshot if snapshot is not None else durations)
+        connection = self.connection
+
+        with connection:
+            try:
+                cursor = connection.execute(
+                    "INSERT INTO runs (source, digest, ingested_at) VALUES (?, ?, ?)",
+                    (source, digest, time.time())
+                )
+            except sqlite3.IntegrityError:
+                return False
+            run_id = cursor.lastrowid
+
+            connection.executemany(
+                "INSERT INTO samples (run_id, test_id, duration) VALUES (?, ?, ?)",
+                ((run_id, test_id, float(duration)) for test_id, duration in durations.items())
+            )
+            self._update_stats(run_id, durations)
+
+        return True
+
+    def _update_stats(self, run_id: int, durations: Dict[str, float]) -> None:
+        # Пересчет статистики тестов, участвовавших в прогоне
+        connection = self.connection
+
+        previous = {
+            test_id: (sample_count, ewma)
+            for test_id, sample_count, ewma in connection.execute(
+                "SELECT s.test_id, s.sample_count, s.ewma FROM stats s "
+                "JOIN samples r ON r.test_id = s.test_id WHERE r.run_id = ?",
+                (run_id,)
+            )
+        }
+
+        # Последние window замеров каждого теста одним запросом
+        recent: Dict[str, List[float]] = {}
+        for test_id, duration in connection.execute(
+                "SELECT test_id, duration FROM ("
+                "  SELECT test_id, duration, ROW_NUMBER() OVER ("
+                "    PARTITION BY test_id ORDER BY id DESC"
+                "  ) AS rn FROM samples"
+                "  WHERE test_id IN (SELECT test_id FROM samples WHERE run_id = ?)"
+                ") WHERE rn <= ?",
+                (run_id, self.window)
+        ):
+            recent.setdefault(test_id, []).append(duration)
+
+        rows = []
+        for test_id, duration in durations.items():
+            duration = float(duration)
+            sample_count, ewma = previous.get(test_id, (0, None))
+            ewma = duration if ewma is None else self.ewma_alpha * duration + (1 - self.ewma_alpha) * ewma
+            values = sorted(recent.get(test_id, [duration]))
+            rows.append((
+                test_id,
+                sample_count + 1,
+                ewma,
+                _percentile(values, 0.5),
+                _percentile(values, 0.95),
+                duration,
+            ))
+
+        connection.executemany(
+            "INSERT OR REPLACE INTO stats (test_id, sample_count, ewma, p50, p95, last) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            rows
+        )
+
+    def get_statistics(self) -> Dict[str, TestDurationStats]:
+        """ Статистика всех тестов одним запросом """
+        return {
+            test_id: TestDurationStats(sample_count, ewma, p50, p95, last)
+            for test_id, sample_count, ewma, p50, p95, last in self.connection.execute(
+                "SELECT test_id, sample_count, ewma, p50, p95, last FROM stats"
+            )
+        }
+
+    def get_estimates(self, estimate: str = 'p95') -> Dict[str, float]:
+        """ Оценка времени выполнения каждого теста по выбранной статистике одним запросом """
+        if estimate not in ESTIMATES:
+            raise ValueError(f"Unknown duration estimate '{estimate}', expected one of {', '.join(ESTIMATES)}")
+        return dict(self.connection.execute(f"SELECT test_id, {estimate} FROM stats"))
+
+    def run_count(self) -> int:
+        """ Количество добавленных прогонов """
+        return self.connection.execute("SELECT COUNT(*) FROM runs").fetchone()[0]
@@ -0,0 +1,166 @@
+import fnmatch
+import os
+import re
+from dataclasses import dataclass
+from pathlib import Path
+from typing import List, Optional, Pattern, Sequence, Tuple
+
+
+@dataclass
+class DiscoveredFile:
+    # Путь в том же виде, что и у root.glob(pattern): root / относительный путь
+    path: Path
+    # Путь относительно root в формате posix
+    relative: str
+    # Результат stat, полученный при обходе (используется индексом и хешем файлов)
+    stat: os.stat_result
+    # Файл подходит под паттерн исключения: в индекс не попадает, но учитывается в хеше
+    excluded: bool
+
+
+def _translate_segment(segment: str) -> str:
+    # Один сегмент glob паттерна в регулярное выражение, '*' и '?' не выходят за пределы имени
+    result = []
+    i, n = 0, len(segment)
+    while i < n:
+        char = segment[i]
+        i += 1
+        if char == '*':
+            result.append('[^/]*')
+        elif char == '?':
+            result.append('[^/]')
+        elif char == '[':
+            j = i
+            if j < n and segment[j] == '!':
+                j += 1
+            if j < n and segment[j] == ']':
+                j += 1
+            j = segment.find(']', j)
+            if j < 0:
+                result.append(re.escape(char))
+                continue
+            content = segment[i:j].replace('\\', '\\\\')
+            if content.startswith('!'):
+                content = '^' + content[1:]
+            elif content.startswith('^'):
+                content = '\\' + content
+            result.append(f'[{content}]')
+            i = j + 1
+        else:
+            result.append(re.escape(char))
+    return ''.join(result)
+
+
+class _IncludePattern:
+    """
+    Паттерн включения в семантике Path.glob: '**' - любое число директорий
+    Сегменты до первого '**' проверяются для директорий, чтобы не заходить туда,
+    где паттерн заведомо не найдет файлов
+    """
+
+    def __init__(self, pattern: str):
+        segments = [segment for segment in pattern.replace(os.sep, '/').split('/') if segment not in ('', '.')]
+        parts = []
+        for i, segment in enumerate(segments):
+            last = i == len(segments) - 1
+            if segment == '**':
+                parts.append('.*' if last else '(?:[^/]+/)*')
+            else:
+                parts.append(_translate_segment(segment) + ('' if last else '/'))
+        self.regex = ''.join(parts)
+
+        self.prefix: List[Pattern[str]] = []
+        self.recursive = False
+        for segment in segments[:-1]:
+            if segment == '**':
+                self.recursive = True
+                break
+            self.prefix.append(re.compile(_translate_segment(segment)))
+        if segments and segments[-1] == '**':
+            self.recursive = True
+
+    def may_contain(self, dir_parts: Sequence[str]) -> bool:
+        """ Могут ли в директории (или глубже) быть файлы, подходящие под паттерн """
+        for part, regex in zip(dir_parts, self.prefix):
+            if not regex.fullmatch(part):
+                return False
+        return len(dir_parts) <= len(self.prefix) or self.recursive
+
+
+def _combine(regexes: List[str]) -> Optional[Pattern[str]]:
+    # Объединение выражений в одно, None - если выражений нет
+    if not regexes:
+        return None
+    return re.compile('|'.join(f'(?:{regex})' for regex in regexes))
+
+
+class FileDiscovery:
+    """
+    Поиск файлов по паттернам включения и исключения за один обход os.scandir
+    Паттерны включения - glob относительно root (как у Path.glob), паттерны исключения -
+    fnmatch по полному пути (как у fnmatch.fnmatch(str(path), pattern))
+    Все паттерны каждого вида объединяются в одно скомпилированное выражение
+    Директории, все содержимое которых исключено (паттерны вида '**/__pycache__/**'),
+    и директории, в которых паттерны включения не найдут файлов, не обходятся
+    Символические ссылки на директории не обходятся, как у Path.glob('**') до Python 3.13
+    """
+
+    def __init__(self, root: Path, include_patterns: List[str], exclude_patterns: List[str]):
+        self.root = root
+        self._includes = [_IncludePattern(pattern) for pattern in include_patterns]
+        self._include_regex = _combine([pattern.regex for pattern in self._includes])
+        self._exclude_regex = _combine([fnmatch.translate(pattern) for pattern in exclude_patterns])
+        # Паттерн с '*' после '/' в конце исключает директорию целиком
+        self._prune_regex = _combine([
+            fnmatch.translate(pattern.rstrip('*'))
+            for pattern in exclude_patterns
+            if pattern.endswith('*') and pattern.rstrip('*').endswith('/')
+        ])
+
+    def _may_contain(self, dir_parts: Tuple[str, ...]) -> bool:
+        return any(pattern.may_contain(dir_parts) for pattern in self._includes)
+
+    def discover(self) -> List[DiscoveredFile]:
+        """ Файлы, подходящие под паттерны включения, в порядке относительного пути """
+        if self._include_regex is None:
+            return []
+
+        root = str(self.root)
+        # Полный путь строится так же, как str(root / relative) у pathlib
+        prefix = '' if root == '.' else root.rstrip(os.sep) + os.sep
+        include_match = self._include_regex.fullmatch
+        exclude_match = self._exclude_regex.match if self._exclude_regex is not None else None
+        prune_match = self._prune_regex.match if self._prune_regex is not None else None
+
+        found = []
+        stack: List[Tuple[str, Tuple[str, ...]]] = [(root, ())]
+        while stack:
+            directory, dir_parts = stack.pop()
+            try:
+                entries = list(os.scandir(directory))
+            except OSError:
+                continue
+
+            for entry in entries:
+                parts = dir_parts + (entry.name,)
+                relative = '/'.join(parts)
+                full_path = prefix + os.sep.join(parts)
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        if prune_match is not None and prune_match(full_path + os.sep):
+                            continue
+                        if not self._may_contain(parts):
+                            continue
+                        stack.append((entry.path, parts))
+                    elif include_match(relative) and entry.is_file():
+                        found.append(DiscoveredFile(
+                            path=Path(full_path),
+                            relative=relative,
+                            stat=entry.stat(),
+                            excluded=exclude_match is not None and exclude_match(full_path) is not None
+                        ))
+                except OSError:
+                    continue
+
+        found.sort(key=lambda item: item.relative)
+        return found
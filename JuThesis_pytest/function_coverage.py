@@ -0,0 +1,250 @@
+import json
+import os
+import sys
+import threading
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+from .cache_store import atomic_write_bytes
+
+# Файл покрытия на уровне функций (пишет pytest плагин вместо базы coverage.py):
+# JSON с таблицей файлов и для каждого теста - входы в функции во время фазы call
+# Файлы внутри rootdir pytest хранятся относительно него, а сам rootdir - относительно
+# директории файла данных, поэтому файл не зависит от расположения проекта
+FUNCTION_COVERAGE_FORMAT = "juthesis-functions"
+FUNCTION_COVERAGE_VERSION = 2
+# Версия 1 хранила абсолютные пути и читается без преобразования
+_SUPPORTED_VERSIONS = (1, FUNCTION_COVERAGE_VERSION)
+_HEADER = f'{{"format":"{FUNCTION_COVERAGE_FORMAT}"'.encode("utf-8")
+
+# Вход в функцию: (файл, первая строка объекта кода, имя функции)
+# Для функций с декораторами первая строка объекта кода - строка первого декоратора
+FunctionEntry = Tuple[str, int, str]
+
+
+class FunctionCoverageData:
+    """ Покрытие на уровне функций: test_id -> множество входов в функции """
+
+    def __init__(self, tests: Optional[Dict[str, Set[FunctionEntry]]] = None, root: Optional[Path] = None):
+        # В памяти пути абсолютные (co_filename), root - rootdir pytest для записи относительных путей
+        self.tests: Dict[str, Set[FunctionEntry]] = tests if tests is not None else {}
+        self.root = root
+
+    @staticmethod
+    def is_function_coverage(path: Path) -> bool:
+        """ Файл в формате покрытия функций (а не база coverage.py) """
+        try:
+            with open(path, "rb") as f:
+                return f.read(len(_HEADER)) == _HEADER
+        except OSError:
+            return False
+
+    def to_dict(self, base: Optional[Path] = None) -> dict:
+        """ base - директория файла данных, относительно которой записывается root """
+        files: Dict[str, int] = {}
+        tests = {}
+        for test_id, entries in self.tests.items():
+            tests[test_id] = [
+                [files.setdefault(filename, len(files)), line, name]
+                for filename, line, name in sorted(entries)
+            ]
+
+        root = "."
+        names = list(files)
+        if self.root is not None:
+            root_prefix = str(self.root) + os.sep
+            names = [
+                filename[len(root_prefix):].replace(os.sep, "/") if filename.startswith(root_prefix) else filename
+                for filename in names
+            ]
+            root = Path(os.path.relpath(self.root, base) if base is not None else self.root).as_posix()
+        return {
+            "format": FUNCTION_COVERAGE_FORMAT,
+            "version": FUNCTION_COVERAGE_VERSION,
+            "root": root,
+            "files": names,
+            "tests": tests,
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict, base: Optional[Path] = None) -> "FunctionCoverageData":
+        if data.get("format") != FUNCTION_COVERAGE_FORMAT or data.get("version") not in _SUPPORTED_VERSIONS:
+            raise ValueError(f"Unsupported function coverage format: {data.get('format')} {data.get('version')}")
+        root = None
+        files = data["files"]
+        if data["version"] != 1:
+            root = Path(os.path.normpath(os.path.join(base if base is not None else "", data["root"])))
+            files = [os.path.join(root, name) for name in files]
+        return cls({
+            test_id: {(files[file_index], line, name) for file_index, line, name in entries}
+            for test_id, entries in data["tests"].items()
+        }, root)
+
+    @classmethod
+    def read(cls, path: Path) -> "FunctionCoverageData":
+        return cls.from_dict(json.loads(path.read_text(encoding="utf-8")), path.absolute().parent)
+
+    def write(self, path: Path) -> None:
+        # Атомарная запись, чтобы пайплайн не прочитал файл наполовину
+        data = self.to_dict(path.absolute().parent)
+        atomic_write_bytes(path, json.dumps(data, separators=(",", ":")).encode("utf-8"))
+
+    def update(self, other: "FunctionCoverageData") -> None:
+        """ Данные перезапущенных тестов заменяют старые """
+        self.tests.update(other.tests)
+        if self.root is None:
+            self.root = other.root
+
+    def remove_tests(self, test_ids: Iterable[str]) -> int:
+        removed = 0
+        for test_id in test_ids:
+            if self.tests.pop(test_id, None) is not None:
+                removed += 1
+        return removed
+
+
+def merge_function_coverage_files(target: Path, files: Iterable[Path], update_existing: bool = False) -> bool:
+    """
+    Объединение файлов покрытия функций (шардов или воркеров) в target, исходные файлы удаляются
+    update_existing - дополнить существующий target, а не перезаписать его
+    Возвращает False, если не было ни одного файла с данными
+    """
+    merged = FunctionCoverageData()
+    found = False
+    sources = list(files)
+    if update_existing:
+        sources.insert(0, target)
+
+    for source in sources:
+        try:
+            merged.update(FunctionCoverageData.read(source))
+            found = True
+        except FileNotFoundError:
+            continue
+        except (ValueError, KeyError, TypeError):
+            print(f"Warning: failed to read {source}")
+        if source != target:
+            source.unlink()
+
+    if found:
+        merged.write(target)
+    return found
+
+
+class FunctionEntryTracer:
+    """
+    Запись входов в функции во время теста
+    Python 3.12+: событие PY_START из sys.monitoring; после первого входа в объект кода
+    событие для него отключается (DISABLE) до начала следующего теста
+    Python 3.10/3.11: sys.setprofile, повторные входы отсекаются по множеству объектов кода теста
+
+    sys.monitoring.restart_events() действует на весь интерпретатор и снова включает события,
+    отключенные другими инструментами (например, coverage.py с COVERAGE_CORE=sysmon).
+    Поэтому DISABLE используется, только пока других инструментов нет; иначе события не
+    отключаются и повторные входы отсекаются по множеству объектов кода, как для sys.setprofile.
+    Точки, отключенные до появления другого инструмента, в следующих тестах не учитываются
+    """
+
+    def __init__(self, is_source: Callable[[str], bool]):
+        self.is_source = is_source
+        self._entries: Optional[Set[FunctionEntry]] = None
+        self._tool_id: Optional[int] = None
+        self._use_disable = False
+        self._seen: Set[object] = set()
+
+    @property
+    def uses_monitoring(self) -> bool:
+        return hasattr(sys, "monitoring")
+
+    def start(self) -> None:
+        """ Регистрация инструмента sys.monitoring (события включаются только на время теста) """
+        if not self.uses_monitoring:
+            return
+        monitoring = sys.monitoring
+        # PROFILER_ID может быть занят другим инструментом, тогда берем свободный
+        for tool_id in (monitoring.PROFILER_ID, 3, 4):
+            try:
+                monitoring.use_tool_id(tool_id, "juthesis-functions")
+            except ValueError:
+                continue
+            self._tool_id = tool_id
+            break
+        else:
+            raise RuntimeError("No free sys.monitoring tool id for function coverage")
+        monitoring.register_callback(self._tool_id, monitoring.events.PY_START, self._on_py_start)
+
+    def stop(self) -> None:
+        if self._tool_id is None:
+            return
+        monitoring = sys.monitoring
+        monitoring.set_events(self._tool_id, 0)
+        monitoring.register_callback(self._tool_id, monitoring.events.PY_START, None)
+        monitoring.free_tool_id(self._tool_id)
+        self._tool_id = None
+
+    def begin_test(self, entries: Set[FunctionEntry]) -> None:
+        self._entries = entries
+        self._seen = set()
+        if self._tool_id is not None:
+            self._use_disable = not self._other_tools_active()
+            if self._use_disable:
+                # Снова включаем события, отключенные в предыдущем тесте
+                sys.monitoring.restart_events()
+            sys.monitoring.set_events(self._tool_id, sys.monitoring.events.PY_START)
+        else:
+            threading.setprofile(self._on_profile)
+            sys.setprofile(self._on_profile)
+
+    def end_test(self) -> None:
+        if self._tool_id is not None:
+            sys.monitoring.set_events(self._tool_id, 0)
+        else:
+            sys.setprofile(None)
+            threading.setprofile(None)
+        self._seen = set()
+        self._entries = None
+
+    def _other_tools_active(self) -> bool:
+        # Идентификаторы инструментов sys.monitoring: 0-5
+        return any(
+            tool_id != self._tool_id and sys.monitoring.get_tool(tool_id) is not None
+            for tool_id in range(6)
+        )
+
+    def _record(self, code) -> None:
+        entries = self._entries
+        if entries is not None and self.is_source(code.co_filename):
+            entries.add((code.co_filename, code.co_firstlineno, code.co_name))
+
+    def _record_once(self, code) -> None:
+        if code in self._seen:
+            return
+        self._seen.add(code)
+        self._record(code)
+
+    def _on_py_start(self, code, instruction_offset):
+        if not self._use_disable:
+            self._record_once(code)
+            return None
+        self._record(code)
+        return sys.monitoring.DISABLE
+
+    def _on_profile(self, frame, event, arg):
+        if event == "call":
+            self._record_once(frame.f_code)
+
+
+def source_matcher(sources: List[Path]) -> Callable[[str], bool]:
+    """ Проверка, что файл объекта кода лежит в одной из директорий исходников (с кешем по имени файла) """
+    prefixes = tuple(str(source.resolve()) + os.sep for source in sources)
+    cache: Dict[str, bool] = {}
+
+    def is_source(filename: str) -> bool:
+        result = cache.get(filename)
+        if result is None:
+            result = cache[filename] = (
+                filename.endswith(".py") and os.path.realpath(filename).startswith(prefixes)
+            )
+        return result
+
+    return is_source
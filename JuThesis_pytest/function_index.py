@@ -0,0 +1,98 @@
+import hashlib
+import threading
+from collections.abc import Mapping
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Set
+
+from .scanner import FunctionInfo, FunctionLineIndex
+
+
+class FunctionIndex(Mapping):
+    """
+    Общий индекс функций проекта, строится или загружается один раз за запуск
+    и передается во все компоненты пайплайна
+    Ведет себя как mapping: путь -> список функций (формат FunctionScanner.build_index())
+    и дополнительно предоставляет поиск по идентификатору и по строке
+    """
+
+    def __init__(self, functions_by_path: Dict[Path, List[FunctionInfo]]):
+        self._by_path = functions_by_path
+        self._by_identifier: Optional[Dict[str, FunctionInfo]] = None
+        self._line_indexes: Dict[Path, FunctionLineIndex] = {}
+        # Ленивые структуры строятся из параллельных этапов пайплайна
+        self._lock = threading.Lock()
+        # Компоненты, переиспользовавшие индекс вместо его построения
+        self.consumers: List[str] = []
+
+    def __getitem__(self, file_path: Path) -> List[FunctionInfo]:
+        return self._by_path[file_path]
+
+    def __iter__(self) -> Iterator[Path]:
+        return iter(self._by_path)
+
+    def __len__(self) -> int:
+        return len(self._by_path)
+
+    @property
+    def total_functions(self) -> int:
+        """ Общее количество функций в индексе """
+        return sum(len(functions) for functions in self._by_path.values())
+
+    @property
+    def by_identifier(self) -> Dict[str, FunctionInfo]:
+        """ Mapping: идентификатор функции -> FunctionInfo (строится лениво) """
+        if self._by_identifier is None:
+            with self._lock:
+                if self._by_identifier is None:
+                    self._by_identifier = {
+                        func.identifier: func
+                        for functions in self._by_path.values()
+                        for func in functions
+                    }
+        return self._by_identifier
+
+    def get_function(self, identifier: str) -> Optional[FunctionInfo]:
+        """ Поиск функции по идентификатору file::line::name """
+        return self.by_identifier.get(identifier)
+
+    def identifiers(self) -> Set[str]:
+        """ Множество идентификаторов всех функций """
+        return set(self.by_identifier)
+
+    def line_index(self, file_path: Path) -> Optional[FunctionLineIndex]:
+        """ Таблица поиска функций по строкам для файла (строится один раз) """
+        line_index = self._line_indexes.get(file_path)
+        if line_index is None:
+            functions = self._by_path.get(file_path)
+            if not functions:
+                return None
+            with self._lock:
+                line_index = self._line_indexes.get(file_path)
+                if line_index is None:
+                    line_index = FunctionLineIndex(functions)
+                    self._line_indexes[file_path] = line_index
+        return line_index
+
+    def find_function_at_line(self, file_path: Path, line: int) -> Optional[FunctionInfo]:
+        """ Самая вложенная функция файла, содержащая строку """
+        line_index = self.line_index(file_path)
+        if line_index is None:
+            return None
+        return line_index.find(line)
+
+    def functions_digest(self, file_path: Path) -> Optional[str]:
+        """ Hash границ функций файла, None - если файла нет в индексе """
+        functions = self._by_path.get(file_path)
+        if not functions:
+            return None
+        data = "\n".join(
+            f"{func.identifier}:{func.start_line}:{func.end_line}"
+            for func in sorted(functions, key=lambda f: (f.start_line, f.end_line, f.name))
+        )
+        return hashlib.blake2b(data.encode(), digest_size=16).hexdigest()
+
+    def mark_reused(self, consumer: str) -> None:
+        """ Отметить, что компонент использовал общий индекс """
+        with self._lock:
+            if consumer not in self.consumers:
+                self.consumers.append(consumer)
@@ -1,20 +1,63 @@
+import bisect
 import re
 import subprocess
 from pathlib import Path
-from typing import Set, List
+from typing import Dict, Iterable, Mapping, Set, List, Optional
 
-from JuThesis_pytest.scanner import FunctionScanner
+from JuThesis_pytest.function_index import FunctionIndex
+from JuThesis_pytest.scanner import FunctionScanner, FunctionInfo
+
+# Заголовок ханка: @@ -old_start,old_count +new_start,new_count @@
+HUNK_PATTERN = re.compile(r'@@ -\d+(?:,(\d+))? \+(\d+)(?:,(\d+))? @@')
+
+# Escape-последовательности в путях, которые git заключает в кавычки
+_GIT_ESCAPES = {'a': 7, 'b': 8, 't': 9, 'n': 10, 'v': 11, 'f': 12, 'r': 13, '"': 34, '\\': 92}
+
+
+def unquote_git_path(path: str) -> str:
+    """
+    Путь из вывода git: пути со спецсимволами git заключает в кавычки и экранирует в стиле C
+    (\\t, \\", \\\\, байты в восьмеричном виде \\303\\244)
+    """
+    if len(path) < 2 or not (path.startswith('"') and path.endswith('"')):
+        return path
+
+    result = bytearray()
+    body = path[1:-1]
+    i = 0
+    while i < len(body):
+        char = body[i]
+        if char != '\\' or i + 1 >= len(body):
+            result += char.encode('utf-8')
+            i += 1
+            continue
+        escape = body[i + 1]
+        if escape in _GIT_ESCAPES:
+            result.append(_GIT_ESCAPES[escape])
+            i += 2
+        elif body[i + 1:i + 4].isdigit():
+            result.append(int(body[i + 1:i + 4], 8) & 0xFF)
+            i += 4
+        else:
+            result += char.encode('utf-8')
+            i += 1
+    return result.decode('utf-8', errors='replace')
 
 
 class GitAnalyzer:
-    def __init__(self, root: Path, function_scanner: FunctionScanner):
+    def __init__(
+            self,
+            root: Path,
+            function_scanner: FunctionScanner,
+            function_index: Optional[FunctionIndex] = None
+    ):
         self.root = root
         self.function_scanner = function_scanner
+        self.function_index = function_index
         self.git_root = self._get_git_root()
-        self._verify_git_repo()
 
     def _get_git_root(self) -> Path:
-        # Получение корня git-репозитория
+        # Получение корня git-репозитория (успешный ответ означает, что это git репозиторий)
         result = subprocess.run(
             ["git", "rev-parse", "--show-toplevel"],
             cwd=self.root,
@@ -23,6 +66,8 @@ class GitAnalyzer:
         )
         if result.returncode == 0:
             return Path(result.stdout.strip())
+        # Рабочего дерева нет (например, bare репозиторий) - проверяем, что это вообще git
+        self._verify_git_repo()
         return self.root
 
     def _verify_git_repo(self) -> None:
@@ -36,65 +81,141 @@ class GitAnalyzer:
         if result.returncode != 0:
             raise ValueError(f"{self.root} is not a git repository")
 
-    def get_modified_files(
+    def _resolve_in_scope(self, git_path: str) -> Optional[Path]:
+        # Путь из git diff (относительно git root) -> абсолютный путь внутри self.root
+        file_path = (self.git_root / git_path).resolve()
+        try:
+            file_path.relative_to(self.root.resolve())
+        except ValueError:
+            # Файл вне нашего скоупа анализа
+            return None
+        return file_path
+
+    @staticmethod
+    def _parse_diff_stream(lines: Iterable[str]) -> Dict[str, Set[int]]:
+        # Потоковый парсинг вывода git diff -U0 по всем файлам
+        # Возвращает mapping: путь относительно git root -> номера измененных строк
+        # Заголовки файлов '---'/'+++' принимаются только между ханками: строки ханка
+        # отсчитываются по количествам из заголовка '@@', поэтому добавленная строка
+        # с текстом '++ ...' не считается заголовком
+        changes: Dict[str, Set[int]] = {}
+        current: Optional[Set[int]] = None
+        old_left = new_left = 0
+
+        for line in lines:
+            if old_left > 0 or new_left > 0:
+                if line.startswith('-'):
+                    old_left -= 1
+                    continue
+                if line.startswith('+'):
+                    new_left -= 1
+                    continue
+                if line.startswith(' '):
+                    old_left -= 1
+                    new_left -= 1
+                    continue
+                if line.startswith('\\'):
+                    # \ No newline at end of file
+                    continue
+                # Вывод не соответствует заголовку ханка - считаем ханк завершенным
+                old_left = new_left = 0
+
+            if line.startswith('+++ '):
+                # После имени с пробелами git добавляет табуляцию
+                target = unquote_git_path(line[4:].rstrip('\n').rstrip('\t'))
+                if target == '/dev/null':
+                    # Файл удален, в новой версии строк нет
+                    current = None
+                else:
+                    path = target[2:] if target.startswith('b/') else target
+                    current = changes.setdefault(path, set())
+            elif line.startswith('@@'):
+                match = HUNK_PATTERN.match(line)
+                if match:
+                    old_left = int(match.group(1)) if match.group(1) else 1
+                    start = int(match.group(2))
+                    new_left = int(match.group(3)) if match.group(3) else 1
+                    if current is not None:
+                        current.update(range(start, start + new_left))
+
+        return changes
+
+    def get_modified_lines_map(
             self,
             base_ref: str = "HEAD",
-            target_ref: str | None = None
-    ) -> List[Path]:
-        # Формирование команды для получения измененных файлов
+            target_ref: str | None = None,
+            paths: Optional[Iterable[Path]] = None,
+            existing_only: bool = True
+    ) -> Dict[Path, Set[int]]:
+        """
+        Измененные строки во всех .py файлах одним вызовом git diff
+        paths - ограничить diff выбранными файлами
+        existing_only - оставить только файлы, существующие в рабочем дереве
+        (без фильтра результат зависит только от пары коммитов и его можно кешировать)
+        Возвращает mapping: абсолютный путь -> номера измененных строк
+        """
+        cmd = ["git", "-c", "core.quotePath=false", "diff", "-U0", "--no-color", "--no-ext-diff",
+               "--src-prefix=a/", "--dst-prefix=b/", base_ref]
         if target_ref:
-            cmd = ["git", "diff", "--name-only", base_ref, target_ref]
+            cmd.append(target_ref)
+        cmd.append("--")
+        if paths is None:
+            cmd.append("*.py")
         else:
-            cmd = ["git", "diff", "--name-only", base_ref]
+            cmd.extend(str(path) for path in paths)
 
-        try:
-            result = subprocess.run(
+        import tempfile
+
+        # stderr пишется во временный файл: при чтении stdout до конца через второй pipe
+        # git может заблокироваться на большом объеме предупреждений
+        with tempfile.TemporaryFile() as stderr_file:
+            process = subprocess.Popen(
                 cmd,
-                cwd=self.root,
-                capture_output=True,
+                cwd=self.git_root,
+                stdout=subprocess.PIPE,
+                stderr=stderr_file,
                 text=True,
-                check=True
+                encoding="utf-8",
+                errors="replace"
             )
-        except subprocess.CalledProcessError as e:
-            # Обработка ошибок выполнения git команды
-            raise RuntimeError(f"Git command failed: {e.stderr}") from e
+            with process:
+                changes = self._parse_diff_stream(process.stdout)
 
-        files = []
-        for line in result.stdout.strip().split("\n"):
-            if line and line.endswith(".py"):
-                # Git возвращает путь относительно git root
-                file_path = (self.git_root / line).resolve()
-
-                # Проверяем что файл внутри self.root (нашего скоупа анализа)
-                try:
-                    file_path.relative_to(self.root.resolve())
-                    if file_path.exists():
-                        files.append(file_path)
-                except ValueError:
-                    # Файл вне нашего скоупа анализа, пропускаем
-                    continue
+            if process.returncode != 0:
+                stderr_file.seek(0)
+                stderr = stderr_file.read().decode("utf-8", errors="replace")
+                raise RuntimeError(f"Git command failed: {stderr}")
 
-        return files
+        result = {}
+        for git_path, lines in changes.items():
+            file_path = self._resolve_in_scope(git_path)
+            if file_path is not None:
+                result[file_path] = lines
+        return self.filter_existing(result) if existing_only else result
 
-    def get_modified_lines(
-            self,
-            file_path: Path,
-            base_ref: str = "HEAD",
-            target_ref: str | None = None
-    ) -> Set[int]:
-        # Путь относительно git root для команды git diff
-        try:
-            relative_path = file_path.relative_to(self.git_root)
-        except ValueError:
-            # Файл вне git репозитория
-            return set()
+    @staticmethod
+    def filter_existing(modified_lines_map: Dict[Path, Set[int]]) -> Dict[Path, Set[int]]:
+        """ Файлы карты измененных строк, существующие в рабочем дереве """
+        return {
+            file_path: lines
+            for file_path, lines in modified_lines_map.items()
+            if file_path.exists()
+        }
 
-        # Формирование команды для получения diff с контекстом 0
-        if target_ref:
-            cmd = ["git", "diff", "-U0", base_ref, target_ref, "--", str(relative_path)]
-        else:
-            cmd = ["git", "diff", "-U0", base_ref, "--", str(relative_path)]
+    @staticmethod
+    def _functions_touching_lines(functions: List[FunctionInfo], modified_lines: Set[int]) -> Set[str]:
+        # Функции, диапазон строк которых пересекается с измененными строками
+        sorted_lines = sorted(modified_lines)
+        touched = set()
+        for func in functions:
+            pos = bisect.bisect_left(sorted_lines, func.start_line)
+            if pos < len(sorted_lines) and sorted_lines[pos] <= func.end_line:
+                touched.add(func.identifier)
+        return touched
 
+    def resolve_refs(self, *refs: str) -> List[str]:
+        """ Разрешение ссылок (HEAD~1, имена веток, теги) в SHA коммитов одним вызовом git """
+        cmd = ["git", "rev-parse"] + [f"{ref}^{{commit}}" for ref in refs]
         try:
             result = subprocess.run(
                 cmd,
@@ -103,56 +224,48 @@ class GitAnalyzer:
                 text=True,
                 check=True
             )
-        except subprocess.CalledProcessError:
-            return set()
-
-        return self._parse_diff_lines(result.stdout)
-
-    @staticmethod
-    def _parse_diff_lines(diff_output: str) -> Set[int]:
-        # Парсинг вывода git diff для извлечения номеров измененных строк
-        # Формат: @@ -old_start,old_count +new_start,new_count @@
-        modified_lines = set()
-        pattern = re.compile(r'@@ -\d+(?:,\d+)? \+(\d+)(?:,(\d+))? @@')
-
-        for match in pattern.finditer(diff_output):
-            start = int(match.group(1))
-            count = int(match.group(2)) if match.group(2) else 1
-
-            # Добавляем диапазон изменённых строк
-            modified_lines.update(range(start, start + count))
+        except subprocess.CalledProcessError as e:
+            raise RuntimeError(f"Git command failed: {e.stderr}") from e
 
-        return modified_lines
+        shas = result.stdout.split()
+        if len(shas) != len(refs):
+            raise RuntimeError(f"Failed to resolve git refs: {', '.join(refs)}")
+        return shas
 
     def get_modified_functions(
             self,
             base_ref: str = "HEAD",
-            target_ref: str | None = None
+            target_ref: str | None = None,
+            function_index: Mapping[Path, List[FunctionInfo]] | None = None
     ) -> Set[str]:
-        # Получение списка измененных файлов
-        modified_files = self.get_modified_files(base_ref, target_ref)
-        if not modified_files:
+        # Измененные строки во всех файлах за один запуск git diff
+        modified_lines_map = self.get_modified_lines_map(base_ref, target_ref)
+        return self.get_functions_for_lines(modified_lines_map, function_index)
+
+    def get_functions_for_lines(
+            self,
+            modified_lines_map: Dict[Path, Set[int]],
+            function_index: Mapping[Path, List[FunctionInfo]] | None = None
+    ) -> Set[str]:
+        """ Функции, затронутые измененными строками (результат get_modified_lines_map) """
+        if not modified_lines_map:
             return set()
 
-        # Построение индекса всех функций в проекте
-        function_index = self.function_scanner.build_index()
+        # Используем переданный или общий индекс функций, иначе строим его
+        if function_index is None:
+            function_index = self.function_index
+        if function_index is None:
+            function_index = self.function_scanner.build_index()
+        elif isinstance(function_index, FunctionIndex):
+            function_index.mark_reused('git')
         modified_functions = set()
 
-        for file_path in modified_files:
-            if file_path not in function_index:
+        for file_path, modified_lines in modified_lines_map.items():
+            functions = function_index.get(file_path)
+            if not functions or not modified_lines:
                 continue
 
-            # Получение измененных строк в файле
-            modified_lines = self.get_modified_lines(file_path, base_ref, target_ref)
-            if not modified_lines:
-                continue
-
-            functions = function_index[file_path]
-
             # Проверка пересечения строк функций с изменёнными строками
-            for func in functions:
-                func_lines = set(range(func.start_line, func.end_line + 1))
-                if func_lines & modified_lines:
-                    modified_functions.add(func.identifier)
+            modified_functions |= self._functions_touching_lines(functions, modified_lines)
 
         return modified_functions
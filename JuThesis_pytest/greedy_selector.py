@@ -0,0 +1,127 @@
+import heapq
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, List
+
+from JuThesis.protocols.models import ProtocolInput
+
+from .coverage_matrix import CoverageMatrix
+
+
+@dataclass
+class SelectionResult:
+    """ Результат выбора тестов """
+    selected_tests: List[str]
+    total_time: float
+    covered_functions: List[str]
+    uncovered_functions: List[str]
+    time_budget: float
+    solve_time: float
+    solver: str = "greedy"
+    version: str = "1.0.0"
+    metadata: Dict[str, Any] = field(default_factory=dict)
+
+    @property
+    def coverage_ratio(self) -> float:
+        """ Доля покрытых измененных функций """
+        total = len(self.covered_functions) + len(self.uncovered_functions)
+        return len(self.covered_functions) / total if total else 1.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "version": self.version,
+            "solver": self.solver,
+            "selected_tests": self.selected_tests,
+            "total_time": self.total_time,
+            "time_budget": self.time_budget,
+            "covered_functions": self.covered_functions,
+            "uncovered_functions": self.uncovered_functions,
+            "coverage_ratio": self.coverage_ratio,
+            "solve_time": self.solve_time,
+            "metadata": self.metadata,
+        }
+
+
+class GreedySelector:
+    """
+    Быстрый встроенный выбор тестов без внешнего решателя JuThesis
+    Жадное взвешенное покрытие множеств с ленивой кучей: на каждом шаге берется тест
+    с наибольшим приростом покрытия на секунду, который помещается в оставшийся бюджет
+    Приросты в куче пересчитываются только при извлечении (они могут только уменьшаться)
+    """
+
+    def __init__(self, protocol_input: ProtocolInput):
+        self.protocol_input = protocol_input
+
+    def select(self) -> SelectionResult:
+        started = time.perf_counter()
+        protocol_input = self.protocol_input
+        tests = protocol_input.available_tests
+        budget = protocol_input.time_budget
+
+        matrix = CoverageMatrix({test_id: info.covered_functions for test_id, info in tests.items()})
+        uncovered = matrix.mask(protocol_input.modified_functions)
+
+        # Тесты с неположительным временем (например, во входе, прочитанном с диска)
+        # пропускаются, как и при построении ProtocolInput
+        candidates = [test_id for test_id, info in tests.items() if 0 < info.time <= budget]
+
+        # Куча: (-прирост на секунду, время, test_id)
+        heap = []
+        for test_id in candidates:
+            gain = matrix.count(matrix.rows[test_id] & uncovered)
+            if gain:
+                heap.append((-gain / tests[test_id].time, tests[test_id].time, test_id))
+        heapq.heapify(heap)
+
+        selected: List[str] = []
+        remaining = budget
+        recomputed = 0
+
+        while heap and uncovered:
+            neg_ratio, duration, test_id = heapq.heappop(heap)
+            if duration > remaining:
+                # Бюджет только уменьшается, тест больше не поместится
+                continue
+
+            gain = matrix.count(matrix.rows[test_id] & uncovered)
+            if not gain:
+                continue
+
+            ratio = gain / duration
+            if heap and ratio < -heap[0][0]:
+                # Устаревший прирост: возвращаем с актуальным значением
+                heapq.heappush(heap, (-ratio, duration, test_id))
+                recomputed += 1
+                continue
+
+            selected.append(test_id)
+            remaining -= duration
+            uncovered &= ~matrix.rows[test_id]
+
+        greedy_mask = matrix.mask(protocol_input.modified_functions) & ~uncovered
+
+        # Лучший одиночный тест может покрыть больше жадного решения (гарантия 1 - 1/e)
+        best_single = max(
+            candidates,
+            key=lambda test_id: (matrix.count(matrix.rows[test_id]), -tests[test_id].time),
+            default=None
+        )
+        if best_single is not None and matrix.count(matrix.rows[best_single]) > matrix.count(greedy_mask):
+            selected = [best_single]
+            greedy_mask = matrix.rows[best_single]
+
+        covered = set(matrix.decode(greedy_mask))
+        return SelectionResult(
+            selected_tests=selected,
+            total_time=sum(tests[test_id].time for test_id in selected),
+            covered_functions=sorted(covered),
+            uncovered_functions=sorted(set(protocol_input.modified_functions) - covered),
+            time_budget=budget,
+            solve_time=time.perf_counter() - started,
+            metadata={
+                "candidates": len(tests),
+                "skipped_non_positive_time": sum(1 for info in tests.values() if info.time <= 0),
+                "heap_recomputations": recomputed
+            }
+        )
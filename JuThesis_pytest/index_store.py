@@ -0,0 +1,197 @@
+import hashlib
+import os
+import pickle
+from dataclasses import dataclass, field, replace
+from pathlib import Path
+from typing import Dict, List, Iterable, Mapping, Optional, Tuple
+
+from .cache_store import atomic_write_bytes
+from .scanner import FunctionScanner, FunctionInfo
+
+
+# Версия формата хранилища, при изменении старые данные отбрасываются
+STORE_FORMAT_VERSION = 1
+
+
+@dataclass
+class IndexEntry:
+    # Запись индекса для одного файла
+    digest: str
+    mtime_ns: int
+    size: int
+    functions: List[FunctionInfo]
+
+
+@dataclass
+class IndexUpdateStats:
+    """ Статистика инкрементального обновления индекса """
+    hits: int = 0
+    misses: int = 0
+    removed: int = 0
+    reparsed_files: List[Path] = field(default_factory=list)
+
+    @property
+    def total(self) -> int:
+        return self.hits + self.misses
+
+
+class FunctionIndexStore:
+    """
+    Пофайловое хранилище индекса функций
+    Ключ записи - путь к файлу, актуальность определяется по хешу содержимого,
+    поэтому заново парсятся только измененные и добавленные файлы
+    """
+
+    def __init__(self, store_path: Path, scanner: FunctionScanner):
+        self.store_path = store_path
+        self.scanner = scanner
+        self._entries: Dict[str, IndexEntry] = {}
+        self._loaded = False
+        self._dirty = False
+        self.last_stats = IndexUpdateStats()
+
+    @staticmethod
+    def compute_digest(data: bytes) -> str:
+        # Хеш содержимого файла
+        return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+    def load(self) -> None:
+        # Загрузка хранилища с диска
+        self._loaded = True
+        if not self.store_path.exists():
+            return
+
+        try:
+            with open(self.store_path, 'rb') as f:
+                payload = pickle.load(f)
+        except (pickle.PickleError, EOFError, AttributeError, OSError):
+            return
+
+        if not isinstance(payload, dict) or payload.get('version') != STORE_FORMAT_VERSION:
+            # Устаревший формат, начинаем с пустого хранилища
+            self._dirty = True
+            return
+
+        self._entries = payload.get('entries', {})
+
+    def save(self) -> None:
+        # Сохранение хранилища на диск, если были изменения
+        if not self._dirty:
+            return
+
+        try:
+            payload = pickle.dumps(
+                {'version': STORE_FORMAT_VERSION, 'entries': self._entries},
+                protocol=pickle.HIGHEST_PROTOCOL
+            )
+            atomic_write_bytes(self.store_path, payload)
+            self._dirty = False
+        except (pickle.PickleError, OSError):
+            pass  # Тихо игнорируем ошибки кеширования
+
+    def clear(self) -> None:
+        # Очистка хранилища
+        self._entries = {}
+        self._dirty = True
+
+    def _lookup(
+            self,
+            file_path: Path,
+            key: str,
+            stat: Optional[os.stat_result] = None
+    ) -> Tuple[Optional[List[FunctionInfo]], Optional[tuple]]:
+        # Поиск функций файла в хранилище
+        # Возвращает (функции, None) при попадании, (None, данные для парсинга) при промахе
+        # или (None, None), если файл удален или недоступен
+        # stat - уже полученный при обходе результат, чтобы не запрашивать его повторно
+        entry = self._entries.get(key)
+        try:
+            if stat is None:
+                stat = file_path.stat()
+            if entry is not None and entry.mtime_ns == stat.st_mtime_ns and entry.size == stat.st_size:
+                # Быстрый путь: метаданные файла не изменились
+                return entry.functions, None
+            data = file_path.read_bytes()
+        except OSError:
+            return None, None
+
+        digest = self.compute_digest(data)
+
+        if entry is not None and entry.digest == digest:
+            # Содержимое не изменилось (например, после checkout), обновляем только метаданные
+            entry.mtime_ns = stat.st_mtime_ns
+            entry.size = stat.st_size
+            self._dirty = True
+            return entry.functions, None
+
+        return None, (data, digest, stat)
+
+    def update(
+            self,
+            files: Iterable[Path],
+            file_stats: Optional[Mapping[Path, os.stat_result]] = None
+    ) -> Dict[Path, List[FunctionInfo]]:
+        """
+        Обновить хранилище по текущему списку файлов и вернуть индекс
+        Формат индекса совпадает с FunctionScanner.build_index()
+        file_stats - результаты stat файлов из FunctionScanner.discover_files()
+        """
+        if not self._loaded:
+            self.load()
+
+        stats = IndexUpdateStats()
+        results: Dict[str, Tuple[Path, Path, List[FunctionInfo]]] = {}
+        pending = []
+
+        for file_path in files:
+            resolved = file_path.resolve()
+            key = str(resolved)
+            if key in results:
+                continue
+
+            functions, miss = self._lookup(file_path, key, file_stats.get(file_path) if file_stats else None)
+            if functions is None and miss is None:
+                # Файла больше нет: его запись удаляется вместе с записями остальных пропавших файлов
+                continue
+            if miss is None:
+                stats.hits += 1
+                results[key] = (file_path, resolved, functions)
+            else:
+                stats.misses += 1
+                stats.reparsed_files.append(resolved)
+                results[key] = (file_path, resolved, [])
+                pending.append((key, file_path, miss))
+
+        # Парсим измененные файлы одной пачкой (возможно, параллельно)
+        extracted = self.scanner.extract_many([(file_path, data) for _, file_path, (data, _, _) in pending])
+        for (key, file_path, (_, digest, stat)), functions in zip(pending, extracted):
+            self._entries[key] = IndexEntry(
+                digest=digest,
+                mtime_ns=stat.st_mtime_ns,
+                size=stat.st_size,
+                functions=functions
+            )
+            results[key] = (file_path, results[key][1], functions)
+        if pending:
+            self._dirty = True
+
+        index: Dict[Path, List[FunctionInfo]] = {}
+        for key, (file_path, resolved, functions) in results.items():
+            # Путь в FunctionInfo должен совпадать с путем сканирования
+            if functions and functions[0].file != file_path:
+                functions = [replace(func, file=file_path) for func in functions]
+                self._entries[key].functions = functions
+                self._dirty = True
+
+            if functions:
+                index[resolved] = functions
+
+        # Удаляем записи файлов, которых больше нет
+        for key in list(self._entries):
+            if key not in results:
+                del self._entries[key]
+                stats.removed += 1
+                self._dirty = True
+
+        self.last_stats = stats
+        return index
@@ -0,0 +1,168 @@
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+
+from .cache_store import atomic_write_bytes
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+def _peak_rss_bytes() -> Optional[int]:
+    # Пиковый RSS процесса (ru_maxrss в KB на Linux и в байтах на macOS)
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def _children_cpu_time() -> float:
+    # CPU время завершившихся дочерних процессов (pytest, git)
+    times = os.times()
+    return times.children_user + times.children_system
+
+
+@dataclass
+class StageMetrics:
+    """ Метрики одного этапа пайплайна """
+    name: str
+    wall_time: float = 0.0
+    # CPU время потока этапа
+    cpu_time: float = 0.0
+    # CPU время дочерних процессов и прирост пикового RSS считаются на весь процесс,
+    # поэтому у параллельных этапов они могут пересекаться
+    children_cpu_time: float = 0.0
+    # Прирост пикового RSS за этап, None - если платформа не поддерживает
+    peak_rss_delta: Optional[int] = None
+    cache_hits: int = 0
+    cache_misses: int = 0
+    counts: Dict[str, int] = field(default_factory=dict)
+    success: bool = True
+
+    def hit(self, count: int = 1) -> None:
+        self.cache_hits += count
+
+    def miss(self, count: int = 1) -> None:
+        self.cache_misses += count
+
+    def count(self, name: str, value: int) -> None:
+        self.counts[name] = value
+
+
+class PipelineMetrics:
+    """
+    Сбор метрик этапов пайплайна: время (wall и CPU), прирост пикового RSS,
+    попадания в кеш и количество обработанных элементов
+    Результат пишется в JSON и, опционально, в textfile формата Prometheus
+    """
+
+    def __init__(self):
+        self.stages: Dict[str, StageMetrics] = {}
+        # Стек активных этапов свой у каждого потока (этапы могут выполняться параллельно)
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self.started_at = time.time()
+
+    @property
+    def _active(self) -> List[StageMetrics]:
+        if not hasattr(self._local, 'active'):
+            self._local.active = []
+        return self._local.active
+
+    @property
+    def current(self) -> Optional[StageMetrics]:
+        """ Текущий этап потока (самый вложенный) """
+        active = self._active
+        return active[-1] if active else None
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[StageMetrics]:
+        with self._lock:
+            metrics = self.stages.setdefault(name, StageMetrics(name))
+        self._active.append(metrics)
+
+        wall_start = time.perf_counter()
+        cpu_start = time.thread_time()
+        children_start = _children_cpu_time()
+        rss_start = _peak_rss_bytes()
+        try:
+            yield metrics
+        except BaseException:
+            metrics.success = False
+            raise
+        finally:
+            metrics.wall_time += time.perf_counter() - wall_start
+            metrics.cpu_time += time.thread_time() - cpu_start
+            metrics.children_cpu_time += _children_cpu_time() - children_start
+            rss_end = _peak_rss_bytes()
+            if rss_start is not None and rss_end is not None:
+                metrics.peak_rss_delta = (metrics.peak_rss_delta or 0) + rss_end - rss_start
+            self._active.pop()
+
+    def hit(self, count: int = 1) -> None:
+        """ Попадание в кеш в текущем этапе """
+        if self.current is not None:
+            self.current.hit(count)
+
+    def miss(self, count: int = 1) -> None:
+        """ Промах кеша в текущем этапе """
+        if self.current is not None:
+            self.current.miss(count)
+
+    def count(self, name: str, value: int) -> None:
+        """ Количество элементов, обработанных текущим этапом """
+        if self.current is not None:
+            self.current.count(name, value)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "started_at": self.started_at,
+            "peak_rss": _peak_rss_bytes(),
+            "total_wall_time": sum(stage.wall_time for stage in self.stages.values()),
+            "stages": [asdict(stage) for stage in self.stages.values()],
+        }
+
+    def write_json(self, path: Path) -> None:
+        atomic_write_bytes(path, json.dumps(self.to_dict(), indent=2).encode('utf-8'))
+
+    def to_prometheus(self) -> str:
+        """ Метрики в текстовом формате Prometheus (для node_exporter textfile collector) """
+        gauges = [
+            ("juthesis_stage_wall_seconds", "Stage wall clock time", lambda s: s.wall_time),
+            ("juthesis_stage_cpu_seconds", "Stage CPU time of the stage thread", lambda s: s.cpu_time),
+            ("juthesis_stage_children_cpu_seconds", "Stage CPU time of child processes",
+             lambda s: s.children_cpu_time),
+            ("juthesis_stage_peak_rss_delta_bytes", "Stage peak RSS growth", lambda s: s.peak_rss_delta),
+            ("juthesis_stage_cache_hits", "Stage cache hits", lambda s: s.cache_hits),
+            ("juthesis_stage_cache_misses", "Stage cache misses", lambda s: s.cache_misses),
+            ("juthesis_stage_success", "Stage finished without an exception", lambda s: int(s.success)),
+        ]
+
+        lines = []
+        for metric, description, getter in gauges:
+            lines.append(f"# HELP {metric} {description}")
+            lines.append(f"# TYPE {metric} gauge")
+            for stage in self.stages.values():
+                value = getter(stage)
+                if value is not None:
+                    lines.append(f'{metric}{{stage="{stage.name}"}} {value}')
+
+        lines.append("# HELP juthesis_stage_items Items processed by the stage")
+        lines.append("# TYPE juthesis_stage_items gauge")
+        for stage in self.stages.values():
+            for item, value in stage.counts.items():
+                lines.append(f'juthesis_stage_items{{stage="{stage.name}",item="{item}"}} {value}')
+
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path: Path) -> None:
+        # Атомарная запись, чтобы collector не прочитал файл наполовину
+        atomic_write_bytes(path, self.to_prometheus().encode('utf-8'))
@@ -1,28 +1,29 @@
 import hashlib
 import json
-import pickle
-from dataclasses import dataclass
+import threading
 from pathlib import Path
-from typing import Any, Optional
-
-from JuThesis.io.writers.json_writer import JsonWriter
-from JuThesis.protocols.models import ProtocolInput
+from typing import TYPE_CHECKING, Any, Callable, Optional
 
+from .cache_store import CacheStore
 from .config import PluginConfig
-from .coverage_analyzer import CoverageAnalyzer
-from .duration_collector import DurationCollector
+from .duration_collector import DurationCollector, existing_durations_file
+from .file_discovery import DiscoveredFile
+from .function_index import FunctionIndex
 from .git_analyzer import GitAnalyzer
-from .protocol_builder import ProtocolBuilder
-from .pytest_runner import PytestRunner
-from .scanner import FunctionScanner, FunctionInfo
+from .index_store import FunctionIndexStore
+from .metrics import PipelineMetrics
+from .scanner import FunctionScanner
+from .stage_scheduler import StageScheduler
 
+# Модули отдельных этапов (запуск pytest, анализ и обновление покрытия, история времени,
+# построение протокола, выбор тестов, запись результатов) импортируются внутри этапов,
+# чтобы полностью закешированный запуск стартовал быстро
+if TYPE_CHECKING:
+    from JuThesis.protocols.models import ProtocolInput
 
-@dataclass
-class CacheEntry:
-    # Запись в кеше с метаданными
-    data: Any
-    files_hash: str
-    config_hash: str
+    from .coverage_analyzer import CoverageAnalyzer
+    from .greedy_selector import SelectionResult
+    from .pytest_runner import PytestRunner
 
 
 class PipelineOrchestrator:
@@ -36,115 +37,171 @@ class PipelineOrchestrator:
         self._coverage_analyzer = None
         self._duration_collector = None
         self._pytest_runner = None
+        self._index_store = None
         
         # Кеш данных
         self._function_index = None
         self._modified_functions = None
         self._test_coverage = None
         self._test_durations = None
+        self._test_reduction = None
+        self._previous_coverage = None
+        self._coverage_snapshot = None
+        self._modified_lines_map = {}
+        # Файлы покрытия и времени выполнения подготовлены (этапы, читающие их, выполняются только после этого)
+        self._test_data_ready = False
+        
+        # SHA коммитов, в которые разрешаются base_ref и target_ref
+        self._base_sha = None
+        self._target_sha = None
         
         # Настройки кеширования
         self._cache_enabled = config.cache_enabled
         self._cache_dir = config.cache_dir
+        self._cache_store = CacheStore(
+            directory=self._cache_dir,
+            max_size_bytes=int(config.cache_max_size_mb * 1024 * 1024),
+            max_entries=config.cache_max_entries
+        )
+        # Метрики этапов (время, память, попадания в кеш, количество элементов)
+        self.metrics = PipelineMetrics()
+        
+        # Этапы могут обращаться к кешу из разных потоков
+        self._cache_lock = threading.Lock()
+        
+        # Hash файлов по паттернам считается один раз за запуск
+        self._files_hashes: dict[tuple, str] = {}
+        # Файлы по паттернам со stat: один обход на запуск для индекса, hash и обновления покрытия
+        self._discovered_files: dict[tuple, list[DiscoveredFile]] = {}
+        # Оба кеша заполняются из параллельных этапов (обход вызывается из расчета hash)
+        self._files_lock = threading.RLock()
         if self._cache_enabled:
             self._cache_dir.mkdir(parents=True, exist_ok=True)
 
+    def _discover_files(self, file_patterns: list[str]) -> list[DiscoveredFile]:
+        # Файлы по паттернам вместе с результатами stat (исключенные - с флагом excluded)
+        patterns_key = tuple(file_patterns)
+        with self._files_lock:
+            discovered = self._discovered_files.get(patterns_key)
+            if discovered is None:
+                discovered = self._function_scanner.discover_files(file_patterns)
+                self._discovered_files[patterns_key] = discovered
+        return discovered
+
     def _compute_files_hash(self, file_patterns: list[str]) -> str:
         # Вычисляем hash всех файлов по паттернам
-        files_data = []
-        
-        for pattern in file_patterns:
-            for file_path in self.config.sample_project_root.glob(pattern):
-                if file_path.is_file():
-                    # Добавляем путь и время модификации
-                    files_data.append({
-                        'path': str(file_path.relative_to(self.config.sample_project_root)),
-                        'mtime': file_path.stat().st_mtime
-                    })
-        
-        # Сортируем для стабильности
-        files_data.sort(key=lambda x: x['path'])
+        # Исключенные файлы тоже учитываются (например, test_*.py для паттернов тестов),
+        # пропускаются только исключенные целиком директории
+        # Путь и время модификации берутся из общего обхода, отсортированного по пути
+        files_data = [
+            {'path': discovered.relative, 'mtime': discovered.stat.st_mtime}
+            for discovered in self._discover_files(file_patterns)
+        ]
         
         serialized = json.dumps(files_data, sort_keys=True)
         return hashlib.sha256(serialized.encode()).hexdigest()[:16]
 
-    def _compute_config_hash(self) -> str:
+    def _compute_config_hash(self, include_refs: bool = False) -> str:
         # Вычисляем hash параметров конфигурации
         config_data = {
+            # Пути в кешированных данных абсолютные и ограничены корнем проекта
+            'sample_project_root': str(self.config.sample_project_root.resolve()),
             'source_patterns': self.config.source_patterns,
             'exclude_patterns': self.config.exclude_patterns,
-            'base_ref': self.config.base_ref,
-            'target_ref': self.config.target_ref,
         }
+        if include_refs:
+            # Символьные ссылки (HEAD~1) со временем указывают на другие коммиты,
+            # поэтому в hash попадают разрешенные SHA
+            config_data['base_sha'] = self._base_sha or self.config.base_ref
+            config_data['target_sha'] = self._target_sha or self.config.target_ref
         serialized = json.dumps(config_data, sort_keys=True)
         return hashlib.sha256(serialized.encode()).hexdigest()[:16]
 
-    def _get_cache_path(self, cache_key: str) -> Path:
-        # Получаем путь к файлу кеша
-        return self._cache_dir / f"{cache_key}.pkl"
+    @staticmethod
+    def _compute_data_file_hash(data_file: Path) -> str:
+        # Hash состояния файла данных (путь, размер, mtime); не memoизируется - файл
+        # может перезаписываться между обновлениями в watch-режиме
+        try:
+            stat = data_file.stat()
+            state = [str(data_file), stat.st_size, stat.st_mtime_ns]
+        except OSError:
+            state = [str(data_file), None, None]
+        return hashlib.sha256(json.dumps(state).encode()).hexdigest()[:16]
+
+    def _compute_fingerprint(
+            self,
+            file_patterns: list[str],
+            include_refs: bool = False,
+            data_file: Optional[Path] = None
+    ) -> dict[str, str]:
+        # Отпечаток входных данных записи кеша
+        # data_file - файл, из которого прочитаны данные записи (например, файл durations)
+        patterns_key = tuple(file_patterns)
+        with self._files_lock:
+            files_hash = self._files_hashes.get(patterns_key)
+            if files_hash is None:
+                files_hash = self._compute_files_hash(file_patterns)
+                self._files_hashes[patterns_key] = files_hash
+        fingerprint = {
+            'files_hash': files_hash,
+            'config_hash': self._compute_config_hash(include_refs),
+        }
+        if data_file is not None:
+            fingerprint['data_hash'] = self._compute_data_file_hash(data_file)
+        return fingerprint
+
+    def invalidate_files(self) -> None:
+        """ Сброс memo обхода файлов и их hash (watch-режим: файлы изменились с прошлого обхода) """
+        with self._files_lock:
+            self._files_hashes.clear()
+            self._discovered_files.clear()
 
-    def _is_cache_valid(self, cache_key: str, file_patterns: list[str]) -> bool:
-        # Проверяем актуальность кеша
+    def _is_cache_valid(
+            self,
+            cache_key: str,
+            file_patterns: list[str],
+            include_refs: bool = False,
+            data_file: Optional[Path] = None
+    ) -> bool:
+        # Проверяем актуальность кеша только по метаданным, без загрузки данных
         if not self._cache_enabled:
             return False
         
-        cache_path = self._get_cache_path(cache_key)
-        if not cache_path.exists():
-            return False
-        
-        try:
-            with open(cache_path, 'rb') as f:
-                entry: CacheEntry = pickle.load(f)
-            
-            # Проверяем hash файлов
-            current_files_hash = self._compute_files_hash(file_patterns)
-            if entry.files_hash != current_files_hash:
-                return False
-            
-            # Проверяем hash конфигурации
-            current_config_hash = self._compute_config_hash()
-            if entry.config_hash != current_config_hash:
-                return False
-            
-            return True
-            
-        except (pickle.PickleError, EOFError, AttributeError):
-            return False
+        fingerprint = self._compute_fingerprint(file_patterns, include_refs, data_file)
+        with self._cache_lock:
+            valid = self._cache_store.is_valid(cache_key, fingerprint)
+        if not valid:
+            self.metrics.miss()
+        return valid
 
     def _load_from_cache(self, cache_key: str) -> Optional[Any]:
         # Загружаем данные из кеша
         if not self._cache_enabled:
             return None
         
-        cache_path = self._get_cache_path(cache_key)
-        if not cache_path.exists():
-            return None
-        
-        try:
-            with open(cache_path, 'rb') as f:
-                entry: CacheEntry = pickle.load(f)
-            return entry.data
-        except (pickle.PickleError, EOFError, AttributeError):
-            return None
+        with self._cache_lock:
+            data = self._cache_store.get(cache_key)
+        if data is None:
+            self.metrics.miss()
+        else:
+            self.metrics.hit()
+        return data
 
-    def _save_to_cache(self, cache_key: str, data: Any, file_patterns: list[str]) -> None:
+    def _save_to_cache(
+            self,
+            cache_key: str,
+            data: Any,
+            file_patterns: list[str],
+            include_refs: bool = False,
+            data_file: Optional[Path] = None
+    ) -> None:
         # Сохраняем данные в кеш
         if not self._cache_enabled:
             return
         
-        cache_path = self._get_cache_path(cache_key)
-        
-        try:
-            entry = CacheEntry(
-                data=data,
-                files_hash=self._compute_files_hash(file_patterns),
-                config_hash=self._compute_config_hash()
-            )
-            
-            with open(cache_path, 'wb') as f:
-                pickle.dump(entry, f)
-        except (pickle.PickleError, OSError):
-            pass  # Тихо игнорируем ошибки кеширования
+        fingerprint = self._compute_fingerprint(file_patterns, include_refs, data_file)
+        with self._cache_lock:
+            self._cache_store.put(cache_key, data, fingerprint)
 
     def _initialize_components(self):
         # Инициализация всех компонентов пайплайна
@@ -153,58 +210,148 @@ class PipelineOrchestrator:
         self._function_scanner = FunctionScanner(
             root=self.config.sample_project_root,
             include_patterns=self.config.source_patterns,
-            exclude_patterns=self.config.exclude_patterns
+            exclude_patterns=self.config.exclude_patterns,
+            workers=self.config.scan_workers,
+            chunk_size=self.config.scan_chunk_size
         )
         
+        self._duration_collector = DurationCollector(
+            durations_file=self.config.durations_file_path
+        )
+
+    @property
+    def pytest_runner(self) -> 'PytestRunner':
+        # pytest запускается только при отсутствии или устаревании данных тестов,
+        # поэтому запускатель создается при первом обращении
+        if self._pytest_runner is None:
+            from .pytest_runner import PytestRunner
+
+            self._pytest_runner = PytestRunner(
+                project_root=self.config.sample_project_root,
+                source_patterns=self.config.source_patterns,
+                shards=self.config.coverage_shards,
+                coverage_file=str(self.config.coverage_data_file),
+                durations_file=str(self.config.durations_file),
+                collector=self.config.coverage_collector
+            )
+        return self._pytest_runner
+
+    def _initialize_analyzers(self):
+        # Инициализация анализаторов, использующих общий индекс функций
         self._git_analyzer = GitAnalyzer(
             root=self.config.sample_project_root,
-            function_scanner=self._function_scanner
+            function_scanner=self._function_scanner,
+            function_index=self._function_index
         )
+
+    @property
+    def coverage_analyzer(self) -> 'CoverageAnalyzer':
+        # Анализатор покрытия (вместе с чтением базы coverage) загружается в этапе покрытия,
+        # параллельно с git diff
+        if self._coverage_analyzer is None:
+            from .coverage_analyzer import CoverageAnalyzer
+
+            self._coverage_analyzer = CoverageAnalyzer(
+                coverage_file=self.config.coverage_file_path,
+                function_scanner=self._function_scanner,
+                function_index=self._function_index
+            )
+        return self._coverage_analyzer
+
+    def _report_index_reuse(self, consumer: str, stage: str) -> None:
+        # Сообщение о том, что этап использовал общий индекс, а не строил свой
+        if self._function_index is not None and consumer in self._function_index.consumers:
+            print(f"{stage}: reused shared function index")
+
+    def _build_function_index(self) -> FunctionIndex:
+        # Построение индекса функций с пофайловым кешированием
+        if not self._cache_enabled:
+            print("Building function index...")
+            return FunctionIndex(self._function_scanner.build_index())
         
-        self._coverage_analyzer = CoverageAnalyzer(
-            coverage_file=self.config.coverage_file_path,
-            function_scanner=self._function_scanner
+        print("Updating function index...")
+        self._index_store = FunctionIndexStore(
+            self._cache_dir / 'function_index_store.pkl',
+            self._function_scanner
         )
-        
-        self._duration_collector = DurationCollector(
-            durations_file=self.config.durations_file_path
+        # Тот же обход, что и для hash исходников: stat файлов повторно не запрашивается
+        discovered = [item for item in self._discover_files(self.config.source_patterns) if not item.excluded]
+        index = self._index_store.update(
+            [item.path for item in discovered],
+            {item.path: item.stat for item in discovered}
         )
-        
-        self._pytest_runner = PytestRunner(
-            project_root=self.config.sample_project_root,
-            source_patterns=self.config.source_patterns
+        self._index_store.save()
+        
+        stats = self._index_store.last_stats
+        self.metrics.hit(stats.hits)
+        self.metrics.miss(stats.misses)
+        print(
+            f"Function index: {stats.hits} files from cache, "
+            f"{stats.misses} files re-parsed, {stats.removed} removed"
         )
+        
+        return FunctionIndex(index)
 
-    def _build_function_index(self) -> dict[Path, list[FunctionInfo]]:
-        # Построение индекса функций с кешированием
-        cache_key = 'function_index'
+    def _detect_changes_between_commits(self) -> set[str]:
+        # Измененные функции между двумя коммитами с кешированием по паре SHA
+        self._base_sha, self._target_sha = self._git_analyzer.resolve_refs(
+            self.config.base_ref,
+            self.config.target_ref
+        )
+        print(
+            f"Comparing {self.config.base_ref} ({self._base_sha[:12]}) "
+            f"with {self.config.target_ref} ({self._target_sha[:12]})"
+        )
+        commit_pair = f"{self._base_sha}_{self._target_sha}"
         
-        # Проверяем кеш
-        if self._is_cache_valid(cache_key, self.config.source_patterns):
-            cached = self._load_from_cache(cache_key)
+        # Набор измененных функций зависит от пары коммитов и от индекса функций
+        functions_key = f'modified_functions_{commit_pair}'
+        if self._is_cache_valid(functions_key, self.config.source_patterns, include_refs=True):
+            cached = self._load_from_cache(functions_key)
             if cached is not None:
-                print("Loading function index from cache...")
+                print("Loading modified functions from cache...")
                 return cached
         
-        # Строим индекс
-        print("Building function index...")
-        index = self._function_scanner.build_index()
+        # Ханки diff зависят только от пары коммитов, поэтому кешируются без фильтра
+        # по рабочему дереву, существование файлов проверяется после загрузки
+        diff_key = f'git_diff_{commit_pair}'
+        modified_lines_map = None
+        if self._is_cache_valid(diff_key, [], include_refs=True):
+            modified_lines_map = self._load_from_cache(diff_key)
+            if modified_lines_map is not None:
+                print("Loading git diff from cache...")
+        
+        if modified_lines_map is None:
+            modified_lines_map = self._git_analyzer.get_modified_lines_map(
+                self._base_sha,
+                self._target_sha,
+                existing_only=False
+            )
+            self._save_to_cache(diff_key, modified_lines_map, [], include_refs=True)
         
-        # Сохраняем в кеш
-        self._save_to_cache(cache_key, index, self.config.source_patterns)
+        modified_lines_map = self._git_analyzer.filter_existing(modified_lines_map)
+        modified_functions = self._git_analyzer.get_functions_for_lines(modified_lines_map)
+        self._save_to_cache(functions_key, modified_functions, self.config.source_patterns, include_refs=True)
         
-        return index
+        return modified_functions
 
     def _detect_changes(self) -> set[str]:
         # Детектирование измененных функций через Git
         print("Detecting changes...")
         
         try:
-            modified_functions = self._git_analyzer.get_modified_functions(
-                base_ref=self.config.base_ref,
-                target_ref=self.config.target_ref
-            )
+            if self.config.target_ref:
+                modified_functions = self._detect_changes_between_commits()
+            else:
+                # Сравнение с рабочим деревом, результат нельзя привязать к паре коммитов
+                # Карта строк сохраняется для инкрементальных обновлений в watch-режиме
+                self._modified_lines_map = self._git_analyzer.get_modified_lines_map(
+                    base_ref=self.config.base_ref,
+                    target_ref=self.config.target_ref
+                )
+                modified_functions = self._git_analyzer.get_functions_for_lines(self._modified_lines_map)
             
+            self._report_index_reuse('git', "Change detection")
             print(f"Found {len(modified_functions)} modified functions")
             
             # Детальный вывод измененных функций для отладки
@@ -225,40 +372,155 @@ class PipelineOrchestrator:
             return True
         
         print("Coverage file not found, running pytest...")
-        return self._pytest_runner.run_with_coverage_and_durations()
+        # Известное время тестов используется для балансировки шардов
+        return self.pytest_runner.run_with_coverage_and_durations(self._duration_collector.load())
+
+    def _refresh_stale_coverage(self, previous) -> bool:
+        # Обновление .coverage, если исходники или тесты изменились после его записи
+        # Возвращает True, если база была обновлена
+        from .coverage_refresh import CoverageRefresher
+
+        refresher = CoverageRefresher(
+            coverage_file=self.config.coverage_file_path,
+            project_root=self.config.sample_project_root,
+            pytest_runner=self.pytest_runner
+        )
+        
+        test_files = [item.path for item in self._discover_files(self.config.test_patterns)]
+        source_files = [
+            item.path for item in self._discover_files(self.config.source_patterns) if not item.excluded
+        ]
+        stale_sources = refresher.find_stale_files(source_files)
+        stale_tests = refresher.find_stale_files(test_files)
+        if not stale_sources and not stale_tests:
+            return False
+        
+        print(
+            f"Coverage is stale: {len(stale_sources)} source files "
+            f"and {len(stale_tests)} test files changed since it was collected"
+        )
+        
+        if self.config.coverage_refresh == 'full':
+            return self.pytest_runner.run_with_coverage_and_durations(self._duration_collector.load())
+        
+        # Текущая карта test -> functions из предыдущего снимка или из устаревшей базы
+        test_coverage = previous.merge() if previous is not None else self.coverage_analyzer.analyze()
+        # Замеры предыдущих запусков (например, в watch-режиме) к этому обновлению не относятся
+        self.pytest_runner.take_measured_durations()
+        refreshed = refresher.refresh(
+            test_coverage,
+            stale_sources,
+            stale_tests,
+            self._duration_collector.load()
+        )
+        if refreshed and self.config.durations_history_enabled:
+            self._ingest_refreshed_durations()
+        return refreshed
+
+    def _ingest_refreshed_durations(self) -> None:
+        # Обновление дополняет файл durations, поэтому в историю добавляются только замеры
+        # перезапущенных тестов; объединенный файл отмечается как учтенный по своему hash,
+        # чтобы этап durations не добавил повторно старые замеры остальных тестов
+        measured = self.pytest_runner.take_measured_durations()
+        if not measured:
+            return
+        import sqlite3
+        
+        history = self._open_duration_history()
+        try:
+            history.ingest(
+                measured,
+                source=str(self.config.durations_file_path),
+                snapshot=self._duration_collector.load()
+            )
+            print(f"Ingested durations of {len(measured)} refreshed tests into history")
+        except sqlite3.Error as e:
+            print(f"Error: {e}")
+        finally:
+            history.close()
+
+    def _open_duration_history(self):
+        from .duration_history import DurationHistory
+        
+        return DurationHistory(
+            db_path=self.config.durations_history_path,
+            ewma_alpha=self.config.durations_ewma_alpha,
+            window=self.config.durations_window
+        )
 
     def _ensure_durations_exist(self) -> bool:
         # Проверка наличия durations файла, при необходимости запуск pytest
-        if self.config.durations_file_path.exists():
+        # До первой записи в новом формате используется файл старого формата
+        if existing_durations_file(self.config.durations_file_path).exists():
             return True
         
         print("Durations file not found, running pytest...")
-        return self._pytest_runner.run_with_coverage_and_durations()
+        return self.pytest_runner.run_with_coverage_and_durations()
 
-    def _collect_coverage(self) -> dict[str, set[str]]:
-        # Сбор информации о покрытии тестов с кешированием
-        cache_key = 'test_coverage'
+    def _prepare_test_data(self) -> bool:
+        # Подготовка файлов .coverage и durations до их чтения
+        # Запуск pytest (первичный или обновление устаревшего покрытия) переписывает оба файла,
+        # поэтому выполняется до этапов, читающих их параллельно
+        self._test_data_ready = False
         
         # Проверяем наличие файла coverage (важно делать это до проверки кеша)
         if not self._ensure_coverage_exists():
             print("Failed to generate coverage data")
+            return False
+        
+        # Предыдущий снимок; его актуальность для каждого файла проверяется
+        # по отпечаткам базы coverage и границам функций
+        self._previous_coverage = None
+        if self._is_cache_valid('coverage_snapshot', []):
+            self._previous_coverage = self._load_from_cache('coverage_snapshot')
+        
+        if self.config.coverage_refresh in ('incremental', 'full'):
+            try:
+                self._refresh_stale_coverage(self._previous_coverage)
+            except (FileNotFoundError, ValueError) as e:
+                print(f"Error: {e}")
+        
+        if not self._ensure_durations_exist():
+            print("Failed to generate durations data")
+            return False
+        
+        self._test_data_ready = True
+        return True
+
+    def _collect_coverage(self) -> dict[str, set[str]]:
+        # Сбор информации о покрытии тестов с инкрементальным кешированием по файлам
+        cache_key = 'coverage_snapshot'
+        
+        if not self.config.coverage_file_path.exists():
             return {}
         
-        # Проверяем кеш (паттерны для проверки изменений исходников)
-        if self._is_cache_valid(cache_key, self.config.source_patterns):
-            cached = self._load_from_cache(cache_key)
-            if cached is not None:
-                print("Loading coverage from cache...")
-                return cached
+        previous = self._previous_coverage
         
-        # Собираем данные
         print("Collecting coverage...")
         try:
-            test_coverage = self._coverage_analyzer.analyze()
+            test_coverage, snapshot = self.coverage_analyzer.analyze_incremental(previous)
+            self._report_index_reuse('coverage', "Coverage analysis")
+            
+            stats = self.coverage_analyzer.last_stats
+            self.metrics.count('files_reused', stats.reused)
+            self.metrics.count('files_analyzed', stats.analyzed)
+            print(
+                f"Coverage: {stats.reused} files reused, "
+                f"{stats.analyzed} files re-analysed, {stats.removed} removed"
+            )
             print(f"Found {len(test_coverage)} tests with coverage data")
             
-            # Сохраняем в кеш
-            self._save_to_cache(cache_key, test_coverage, self.config.source_patterns)
+            # Сохраняем снимок, только если он изменился
+            # (для покрытия функций и баз неизвестного формата снимка нет)
+            changed = snapshot is not None and (
+                previous is None
+                or stats.analyzed > 0
+                or stats.removed > 0
+                or previous.db_state != snapshot.db_state
+            )
+            if changed:
+                self._save_to_cache(cache_key, snapshot, [])
+            self._coverage_snapshot = snapshot
             
             return test_coverage
             
@@ -266,6 +528,29 @@ class PipelineOrchestrator:
             print(f"Error: {e}")
             return {}
 
+    def _collect_durations_from_history(self) -> dict[str, float]:
+        # Добавление текущего снимка в историю и получение скользящих оценок времени
+        print("Collecting test durations from history...")
+        import sqlite3
+
+        history = self._open_duration_history()
+        try:
+            if history.ingest(self._duration_collector.load(), source=str(self.config.durations_file_path)):
+                print("Ingested new durations snapshot into history")
+            
+            test_durations = history.get_estimates(self.config.durations_estimate)
+            print(
+                f"Found {len(test_durations)} test durations "
+                f"({self.config.durations_estimate} over {history.run_count()} runs)"
+            )
+            return test_durations
+            
+        except (sqlite3.Error, ValueError) as e:
+            print(f"Error: {e}")
+            return {}
+        finally:
+            history.close()
+
     def _collect_durations(self) -> dict[str, float]:
         # Сбор времени выполнения тестов с кешированием
         cache_key = 'test_durations'
@@ -275,9 +560,14 @@ class PipelineOrchestrator:
             print("Failed to generate durations data")
             return {}
         
-        # Проверяем кеш (проверяем изменения в тестовых файлах)
+        if self.config.durations_history_enabled:
+            return self._collect_durations_from_history()
+        
+        # Проверяем кеш: изменения в тестовых файлах и в самом файле durations
+        # (его перезаписывает pytest плагин, в том числе между обновлениями в watch-режиме)
         test_patterns = [p.replace('src/', 'tests/') for p in self.config.source_patterns]
-        if self._is_cache_valid(cache_key, test_patterns):
+        durations_file = existing_durations_file(self.config.durations_file_path)
+        if self._is_cache_valid(cache_key, test_patterns, data_file=durations_file):
             cached = self._load_from_cache(cache_key)
             if cached is not None:
                 print("Loading durations from cache...")
@@ -295,7 +585,7 @@ class PipelineOrchestrator:
                 print(f"Average duration: {stats['average_time']:.3f}s")
             
             # Сохраняем в кеш
-            self._save_to_cache(cache_key, test_durations, test_patterns)
+            self._save_to_cache(cache_key, test_durations, test_patterns, data_file=durations_file)
             
             return test_durations
             
@@ -303,7 +593,17 @@ class PipelineOrchestrator:
             print(f"Error: {e}")
             return {}
 
-    def _build_protocol_input(self) -> Optional[ProtocolInput]:
+    def _find_unindexed_modified_functions(self) -> list[str]:
+        # Измененные функции, отсутствующие в общем индексе функций
+        # (например, при рассинхронизации кеша индекса и git diff)
+        if self._function_index is None:
+            return []
+        return sorted(
+            func_id for func_id in self._modified_functions
+            if self._function_index.get_function(func_id) is None
+        )
+
+    def _build_protocol_input(self) -> Optional['ProtocolInput']:
         # Построение ProtocolInput из собранных данных
         print("Building protocol input...")
         
@@ -320,39 +620,45 @@ class PipelineOrchestrator:
             print("Warning: No test duration data available")
             return None
         
-        # Диагностика: какие функции покрывают тесты
-        print("\nDiagnostic: Coverage analysis")
-        all_covered_functions = set()
-        for test_id, covered_funcs in self._test_coverage.items():
-            all_covered_functions.update(covered_funcs)
-        
-        print(f"Total unique covered functions: {len(all_covered_functions)}")
+        from .protocol_builder import ProtocolBuilder
+        builder = ProtocolBuilder(
+            modified_functions=self._modified_functions,
+            test_coverage=self._test_coverage,
+            test_durations=self._test_durations,
+            time_budget=self.config.time_budget,
+            max_initial_coverage_size=self.config.max_initial_coverage_size,
+            reduce_tests=self.config.reduce_tests
+        )
         
-        # Проверяем пересечение между modified и covered
-        intersection = self._modified_functions & all_covered_functions
-        print(f"Modified functions covered by tests: {len(intersection)}")
+        # Диагностика по битовой матрице покрытия измененных функций (ее же использует build):
+        # объединение всего покрытия тестов не строится
+        print("\nDiagnostic: Coverage analysis")
+        matrix = builder.coverage_matrix
+        print(f"Tests covering modified functions: {len(matrix)} of {len(self._test_coverage)}")
+        print(f"Modified functions covered by tests: {matrix.covered_count()}")
         
-        if not intersection:
+        if not len(matrix):
             print("\nNo tests cover modified functions!")
             print("\nModified functions:")
             for func_id in sorted(self._modified_functions):
                 print(f"  {func_id}")
         
         try:
-            builder = ProtocolBuilder(
-                modified_functions=self._modified_functions,
-                test_coverage=self._test_coverage,
-                test_durations=self._test_durations,
-                time_budget=self.config.time_budget,
-                max_initial_coverage_size=self.config.max_initial_coverage_size
-            )
-            
             protocol_input = builder.build()
+            self._test_reduction = builder.reduction
+            
+            unindexed = self._find_unindexed_modified_functions()
+            if unindexed:
+                print(f"Warning: {len(unindexed)} modified functions are missing from the function index")
             
             # Вывод статистики
             print(f"\nProtocol input created:")
             print(f"  Modified functions: {len(protocol_input.modified_functions)}")
             print(f"  Available tests: {len(protocol_input.available_tests)}")
+            if self._test_reduction is not None:
+                print(f"  Reduced tests: {self._test_reduction.removed_count} "
+                      f"({sum(len(tests) for tests in self._test_reduction.equivalents.values())} equivalent, "
+                      f"{len(self._test_reduction.dominated_by)} dominated)")
             print(f"  Time budget: {protocol_input.time_budget}s")
             
             return protocol_input
@@ -361,7 +667,20 @@ class PipelineOrchestrator:
             print(f"Error building protocol: {e}")
             return None
 
-    def _save_protocol_input(self, protocol_input: ProtocolInput) -> bool:
+    def _write_protocol_input(self, protocol_input: 'ProtocolInput', json_path: Path) -> Path:
+        # Запись ProtocolInput в выбранном формате, возвращает фактический путь файла
+        output_path = self.config.protocol_output_path(json_path)
+        if self.config.output_format == 'compact':
+            # Словарь функций и ссылки по номерам, запись потоком (опционально gzip)
+            from .protocol_io import CompactProtocolWriter
+            CompactProtocolWriter.write(protocol_input, output_path)
+        else:
+            # Сохраняем через JsonWriter из JuThesis
+            from JuThesis.io.writers.json_writer import JsonWriter
+            JsonWriter.write(protocol_input, str(output_path))
+        return output_path
+
+    def _save_protocol_input(self, protocol_input: 'ProtocolInput') -> bool:
         # Сохранение ProtocolInput в JSON файл
         print("Saving protocol input...")
         
@@ -369,50 +688,246 @@ class PipelineOrchestrator:
             # Создаем директорию вывода если нужно
             self.config.output_path.mkdir(parents=True, exist_ok=True)
             
-            # Сохраняем через JsonWriter из JuThesis
-            JsonWriter.write(protocol_input, str(self.config.input_json_path))
+            input_path = self._write_protocol_input(protocol_input, self.config.input_json_path)
+            # Вход в другом формате от прошлого запуска не должен читаться вместо нового
+            for stale_path in self.config.protocol_output_variants(self.config.input_json_path):
+                if stale_path != input_path and stale_path.exists():
+                    stale_path.unlink()
+            
+            print(f"Protocol input saved to: {input_path}")
+            
+            # Отображение для разворачивания результата JuThesis на исходный набор тестов
+            reduction_path = self.config.reduction_json_path
+            if self._test_reduction is not None:
+                with open(reduction_path, 'w', encoding='utf-8') as f:
+                    json.dump(self._test_reduction.to_dict(), f, indent=2, sort_keys=True)
+                print(f"Test reduction mapping saved to: {reduction_path}")
+            elif reduction_path.exists():
+                # Отображение от прошлого запуска к новому входу не относится
+                reduction_path.unlink()
+            
+            if self.config.split_components:
+                self._save_components(protocol_input)
+            else:
+                # Манифест и компоненты прошлого запуска к новому входу не относятся
+                self._remove_components()
             
-            print(f"Protocol input saved to: {self.config.input_json_path}")
             return True
             
         except Exception as e:
             print(f"Error saving protocol input: {e}")
             return False
 
+    def _save_components(self, protocol_input: 'ProtocolInput') -> None:
+        # Сохранение независимых компонент ProtocolInput и манифеста для параллельного решения
+        from .protocol_builder import ProtocolBuilder
+        decomposition = ProtocolBuilder.decompose(protocol_input)
+        
+        # Части от прошлого запуска могли остаться в большем количестве или в другом формате
+        self._remove_components()
+        
+        file_names = []
+        for index, component in enumerate(decomposition.components):
+            component_path = self._write_protocol_input(
+                component.protocol_input,
+                self.config.component_json_path(index)
+            )
+            file_names.append(component_path.name)
+        
+        with open(self.config.manifest_json_path, 'w', encoding='utf-8') as f:
+            json.dump(decomposition.manifest(file_names), f, indent=2)
+        
+        print(f"Protocol input split into {len(decomposition)} independent components, "
+              f"manifest saved to: {self.config.manifest_json_path}")
+        if decomposition.uncoverable_functions:
+            print(f"  Modified functions not covered by any test: {len(decomposition.uncoverable_functions)}")
+
+    def _remove_components(self) -> None:
+        # Удаление манифеста и файлов компонент ProtocolInput (в любом формате вывода)
+        input_path = self.config.input_json_path
+        for stale_part in input_path.parent.glob(f"{input_path.stem}.part*.json*"):
+            stale_part.unlink()
+        self.config.manifest_json_path.unlink(missing_ok=True)
+
+    def select_tests(self, protocol_input: 'ProtocolInput') -> 'SelectionResult':
+        # Быстрый встроенный выбор тестов в пределах бюджета (без внешнего решателя)
+        print("Selecting tests with built-in greedy selector...")
+        from .greedy_selector import GreedySelector
+        result = GreedySelector(protocol_input).select()
+        
+        print(f"  Selected tests: {len(result.selected_tests)}")
+        print(f"  Total time: {result.total_time:.2f}s of {result.time_budget}s")
+        print(f"  Covered modified functions: {len(result.covered_functions)}"
+              f"/{len(result.covered_functions) + len(result.uncovered_functions)}")
+        print(f"  Solve time: {result.solve_time * 1000:.1f}ms")
+        
+        return result
+
+    def _save_selection(self, result: 'SelectionResult') -> bool:
+        # Сохранение результата встроенного выбора тестов
+        try:
+            self.config.output_path.mkdir(parents=True, exist_ok=True)
+            with open(self.config.selection_json_path, 'w', encoding='utf-8') as f:
+                json.dump(result.to_dict(), f, indent=2)
+            print(f"Test selection saved to: {self.config.selection_json_path}")
+            return True
+        except OSError as e:
+            print(f"Error saving test selection: {e}")
+            return False
+
+    def _run_stage(self, name: str, func: Callable[[], Any], count_name: Optional[str] = None) -> Any:
+        # Выполнение этапа сбора данных с записью метрик
+        with self.metrics.stage(name):
+            result = func()
+            if count_name is not None:
+                self.metrics.count(count_name, len(result))
+        return result
+
+    def _run_test_data_stage(self, name: str, func: Callable[[], Any], count_name: str) -> Any:
+        # Этапы, читающие покрытие и время выполнения, не выполняются без подготовленных файлов
+        if not self._test_data_ready:
+            print(f"Skipping {name} stage: test data is not available")
+            return {}
+        return self._run_stage(name, func, count_name)
+
     def collect(self) -> tuple[set[str], dict[str, set[str]], dict[str, float]]:
         # Выполнить полный цикл сбора данных
         self._initialize_components()
         
-        # Построение индекса функций с кешированием
-        self._function_index = self._build_function_index()
-        total_functions = sum(len(funcs) for funcs in self._function_index.values())
-        print(f"Indexed {total_functions} functions in {len(self._function_index)} files")
+        # Построение индекса функций с кешированием, индекс общий для всех этапов
+        with self.metrics.stage('index'):
+            self._function_index = self._build_function_index()
+            self.metrics.count('files', len(self._function_index))
+            self.metrics.count('functions', self._function_index.total_functions)
+        print(f"Indexed {self._function_index.total_functions} functions in {len(self._function_index)} files")
+        self._initialize_analyzers()
+        
+        # После построения индекса git diff не зависит от данных тестов, а чтение
+        # покрытия и времени выполнения - друг от друга; независимые этапы
+        # выполняются параллельно, если это разрешено настройками
+        scheduler = StageScheduler(max_workers=self.config.pipeline_workers)
+        scheduler.add('git_diff', lambda: self._run_stage('git_diff', self._detect_changes, 'modified_functions'))
+        scheduler.add('test_data', lambda: self._run_stage('test_data', self._prepare_test_data))
+        scheduler.add(
+            'coverage',
+            lambda: self._run_test_data_stage('coverage', self._collect_coverage, 'tests'),
+            depends_on=['test_data']
+        )
+        scheduler.add(
+            'durations',
+            lambda: self._run_test_data_stage('durations', self._collect_durations, 'tests'),
+            depends_on=['test_data']
+        )
+        results = scheduler.run()
         
-        # Выполнение этапов сбора данных с кешированием
-        self._modified_functions = self._detect_changes()
-        self._test_coverage = self._collect_coverage()
-        self._test_durations = self._collect_durations()
+        self._modified_functions = results['git_diff']
+        self._test_coverage = results['coverage']
+        self._test_durations = results['durations']
         
         return self._modified_functions, self._test_coverage, self._test_durations
 
-    def run_pipeline(self) -> bool:
-        # Полный пайплайн: сбор данных, построение протокола, сохранение
-        self.collect()
+    def save_metrics(self) -> None:
+        # Запись метрик этапов в JSON и, если настроено, в textfile Prometheus
+        if not self.config.metrics_enabled:
+            return
         
-        protocol_input = self._build_protocol_input()
+        try:
+            self.metrics.write_json(self.config.metrics_path)
+            print(f"Pipeline metrics saved to: {self.config.metrics_path}")
+            
+            prometheus_path = self.config.metrics_prometheus_path
+            if prometheus_path is not None:
+                self.metrics.write_prometheus(prometheus_path)
+        except OSError as e:
+            print(f"Error saving pipeline metrics: {e}")
+
+    def emit_protocol_input(self) -> bool:
+        # Построение и сохранение ProtocolInput (и выбора тестов) из собранных данных
+        with self.metrics.stage('protocol') as stage:
+            protocol_input = self._build_protocol_input()
+            if protocol_input is not None:
+                stage.count('modified_functions', len(protocol_input.modified_functions))
+                stage.count('available_tests', len(protocol_input.available_tests))
         if protocol_input is None:
             print("Failed to build protocol input")
             return False
         
-        success = self._save_protocol_input(protocol_input)
+        with self.metrics.stage('save'):
+            success = self._save_protocol_input(protocol_input)
+        
+        if success and self.config.greedy_selection:
+            with self.metrics.stage('selection') as stage:
+                result = self.select_tests(protocol_input)
+                stage.count('selected_tests', len(result.selected_tests))
+                success = self._save_selection(result)
+        
         return success
+
+    def run_pipeline(self) -> bool:
+        # Полный пайплайн: сбор данных, построение протокола, сохранение
+        try:
+            self.collect()
+            return self.emit_protocol_input()
+        finally:
+            self.save_metrics()
+
+    def source_files(self) -> list[Path]:
+        # Исходные файлы проекта по паттернам сканирования
+        return list(self._function_scanner.scan_files())
+
+    def update_sources(self, changed_files: list[Path]) -> None:
+        # Инкрементальное обновление после изменения исходников (watch-режим):
+        # функции, измененные строки и покрытие пересчитываются только для changed_files
+        # (пути сканирования измененных, добавленных и удаленных файлов)
+        index = dict(self._function_index)
+        for file_path in changed_files:
+            resolved = file_path.resolve()
+            functions = self._function_scanner.extract_functions(file_path) if file_path.exists() else []
+            if functions:
+                index[resolved] = functions
+            else:
+                index.pop(resolved, None)
+        
+        self._function_index = FunctionIndex(index)
+        self._git_analyzer.function_index = self._function_index
+        if self._coverage_analyzer is not None:
+            self._coverage_analyzer.function_index = self._function_index
+        
+        # git diff только по измененным файлам; git запускается в корне репозитория,
+        # поэтому пути передаются абсолютными, а не относительно текущей директории
+        lines_map = self._git_analyzer.get_modified_lines_map(
+            self.config.base_ref,
+            self.config.target_ref,
+            paths=[file_path.resolve() for file_path in changed_files]
+        )
+        for file_path in changed_files:
+            resolved = file_path.resolve()
+            if resolved in lines_map:
+                self._modified_lines_map[resolved] = lines_map[resolved]
+            else:
+                self._modified_lines_map.pop(resolved, None)
+        self._modified_functions = self._git_analyzer.get_functions_for_lines(self._modified_lines_map)
+        
+        # Границы функций изменились только у измененных файлов, остальные берутся из снимка
+        self.update_coverage()
+
+    def update_coverage(self) -> None:
+        # Повторный инкрементальный анализ покрытия относительно последнего снимка
+        self._previous_coverage = self._coverage_snapshot
+        self._test_coverage = self._collect_coverage()
+
+    def update_durations(self) -> None:
+        # Перечитывание времени выполнения тестов
+        self._test_durations = self._collect_durations()
     
     def clear_cache(self) -> int:
         # Очистка всех файлов кеша
         if not self._cache_enabled or not self._cache_dir.exists():
             return 0
         
-        count = 0
+        count = self._cache_store.clear()
+        
+        # Пофайловый индекс функций и файлы старого формата кеша
         for cache_file in self._cache_dir.glob('*.pkl'):
             cache_file.unlink()
             count += 1
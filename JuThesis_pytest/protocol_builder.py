@@ -1,7 +1,13 @@
-from typing import Dict, Set, List
+from typing import TYPE_CHECKING, Dict, Set, List, Optional
 
 from JuThesis.protocols.models import ProtocolInput, TestInfo
 
+from .coverage_matrix import CoverageMatrix
+from .test_reduction import TestReduction, reduce_tests
+
+if TYPE_CHECKING:
+    from .protocol_components import ProtocolDecomposition
+
 
 class ProtocolBuilder:
     def __init__(
@@ -10,7 +16,8 @@ class ProtocolBuilder:
             test_coverage: Dict[str, Set[str]],
             test_durations: Dict[str, float],
             time_budget: float,
-            max_initial_coverage_size: int = 2
+            max_initial_coverage_size: int = 2,
+            reduce_tests: bool = False
     ):
         self.modified_functions = list(modified_functions) if isinstance(modified_functions,
                                                                          set) else modified_functions
@@ -18,6 +25,20 @@ class ProtocolBuilder:
         self.test_durations = test_durations
         self.time_budget = time_budget
         self.max_initial_coverage_size = max_initial_coverage_size
+        self.reduce_tests = reduce_tests
+        self._coverage_matrix: Optional[CoverageMatrix] = None
+        # Отображение для разворачивания результата после сокращения тестов
+        self.reduction: Optional[TestReduction] = None
+
+    @property
+    def coverage_matrix(self) -> CoverageMatrix:
+        """
+        Битовая матрица покрытия измененных функций (строится лениво)
+        Содержит только тесты, покрывающие измененные функции, и только эти функции
+        """
+        if self._coverage_matrix is None:
+            self._coverage_matrix = CoverageMatrix(self.test_coverage, self.modified_functions)
+        return self._coverage_matrix
 
     def build(self) -> ProtocolInput:
         """ Построение ProtocolInput """
@@ -32,18 +53,13 @@ class ProtocolBuilder:
             raise ValueError(f"Time budget must be positive, got {self.time_budget}")
 
         # Оставляем только те тесты, которые покрывают modified_functions
-        modified_set = set(self.modified_functions)
+        matrix = self.coverage_matrix
         available_tests = {}
-        skipped_tests = 0
+        relevant_tests = 0
         missing_duration_tests = 0
 
-        for test_id, covered_funcs in self.test_coverage.items():
-            # Пересечение с modified_functions
-            relevant_coverage = covered_funcs & modified_set
-
-            if not relevant_coverage:
-                skipped_tests += 1
-                continue
+        for test_id, relevant_coverage in matrix.coverage.items():
+            relevant_tests += 1
 
             # Проверка наличия времени выполнения
             duration = self.test_durations.get(test_id)
@@ -60,6 +76,8 @@ class ProtocolBuilder:
                 covered_functions=sorted(relevant_coverage)
             )
 
+        skipped_tests = len(self.test_coverage) - relevant_tests
+
         # Проверка результата
         if not available_tests:
             raise ValueError(
@@ -68,6 +86,12 @@ class ProtocolBuilder:
                 f"{missing_duration_tests} tests without duration data"
             )
 
+        if self.reduce_tests:
+            # Схлопывание равноценных и удаление доминируемых тестов
+            # Маски покрытия строятся только здесь, лишние маски (тесты без времени) не мешают
+            self.reduction = reduce_tests(available_tests, matrix.rows)
+            available_tests = self.reduction.kept
+
         return ProtocolInput(
             version="1.0.0",
             modified_functions=sorted(self.modified_functions),
@@ -76,28 +100,37 @@ class ProtocolBuilder:
             max_initial_coverage_size=self.max_initial_coverage_size
         )
 
+    @staticmethod
+    def decompose(protocol_input: ProtocolInput) -> 'ProtocolDecomposition':
+        """
+        Разбиение ProtocolInput на независимые компоненты (тесты и функции разных
+        компонент не пересекаются) для параллельного запуска решателя
+        """
+        from .protocol_components import decompose_protocol_input
+        return decompose_protocol_input(protocol_input)
+
     def get_statistics(self) -> Dict[str, any]:
         # Статистика для отладки
-        modified_set = set(self.modified_functions)
-        
+        matrix = self.coverage_matrix
+
         # Подсчет тестов с релевантным покрытием
         relevant_tests = 0
         total_duration = 0.0
         
-        for test_id, covered_funcs in self.test_coverage.items():
-            relevant_coverage = covered_funcs & modified_set
-            if relevant_coverage:
-                relevant_tests += 1
-                duration = self.test_durations.get(test_id, 0.0)
-                if duration > 0:
-                    total_duration += duration
+        for test_id in matrix.coverage:
+            relevant_tests += 1
+            duration = self.test_durations.get(test_id, 0.0)
+            if duration > 0:
+                total_duration += duration
         
         return {
             "modified_functions_count": len(self.modified_functions),
             "total_tests": len(self.test_coverage),
             "relevant_tests": relevant_tests,
+            "covered_modified_functions": matrix.covered_count(),
             "tests_with_duration": len(self.test_durations),
             "total_duration": total_duration,
             "time_budget": self.time_budget,
-            "budget_utilization": (total_duration / self.time_budget * 100) if self.time_budget > 0 else 0
+            "budget_utilization": (total_duration / self.time_budget * 100) if self.time_budget > 0 else 0,
+            "reduced_tests": self.reduction.removed_count if self.reduction else 0
         }
@@ -0,0 +1,153 @@
+from dataclasses import dataclass, field
+from typing import Any, Dict, List
+
+from JuThesis.protocols.models import ProtocolInput
+
+
+@dataclass
+class ProtocolComponent:
+    """ Независимая часть задачи выбора тестов """
+    protocol_input: ProtocolInput
+    # Суммарное время всех тестов компоненты (больше этого бюджет не нужен)
+    total_time: float
+
+
+@dataclass
+class ProtocolDecomposition:
+    """
+    Разбиение ProtocolInput на компоненты связности двудольного графа
+    тест - измененная функция, бюджет распределен между компонентами
+    """
+    components: List[ProtocolComponent]
+    # Измененные функции, которые не покрывает ни один тест
+    uncoverable_functions: List[str] = field(default_factory=list)
+    time_budget: float = 0.0
+
+    def __len__(self) -> int:
+        return len(self.components)
+
+    def manifest(self, file_names: List[str]) -> Dict[str, Any]:
+        """ Описание частей для запуска решателя по компонентам """
+        return {
+            "version": "1.0.0",
+            "time_budget": self.time_budget,
+            "uncoverable_functions": self.uncoverable_functions,
+            "components": [
+                {
+                    "file": file_name,
+                    "modified_functions": len(component.protocol_input.modified_functions),
+                    "available_tests": len(component.protocol_input.available_tests),
+                    "time_budget": component.protocol_input.time_budget,
+                    "total_time": component.total_time,
+                }
+                for file_name, component in zip(file_names, self.components)
+            ],
+        }
+
+
+def _find_components(protocol_input: ProtocolInput) -> List[List[str]]:
+    # Union-find по функциям: функции одного теста объединяются в одну компоненту
+    parent: Dict[str, str] = {}
+
+    def find(func_id: str) -> str:
+        root = func_id
+        while parent[root] != root:
+            root = parent[root]
+        while parent[func_id] != root:
+            parent[func_id], func_id = root, parent[func_id]
+        return root
+
+    for info in protocol_input.available_tests.values():
+        functions = info.covered_functions
+        for func_id in functions:
+            parent.setdefault(func_id, func_id)
+        first = find(functions[0])
+        for func_id in functions[1:]:
+            root = find(func_id)
+            if root != first:
+                parent[root] = first
+
+    components: Dict[str, List[str]] = {}
+    for func_id in parent:
+        components.setdefault(find(func_id), []).append(func_id)
+    return list(components.values())
+
+
+def _split_budget(time_budget: float, weights: List[int], caps: List[float]) -> List[float]:
+    """
+    Распределение бюджета пропорционально весам компонент
+    Компонента не получает больше суммарного времени своих тестов, излишек
+    перераспределяется между остальными
+    """
+    budgets = [0.0] * len(weights)
+    active = set(range(len(weights)))
+    remaining = time_budget
+
+    while active and remaining > 0:
+        total_weight = sum(weights[i] for i in active)
+        capped = [i for i in active if remaining * weights[i] / total_weight >= caps[i]]
+        if not capped:
+            for i in active:
+                budgets[i] = remaining * weights[i] / total_weight
+            break
+        for i in capped:
+            budgets[i] = caps[i]
+            remaining -= caps[i]
+            active.discard(i)
+
+    return budgets
+
+
+def decompose_protocol_input(protocol_input: ProtocolInput) -> ProtocolDecomposition:
+    """
+    Разбиение задачи на независимые компоненты
+    Бюджет делится пропорционально числу измененных функций компоненты
+    """
+    groups = _find_components(protocol_input)
+
+    function_group: Dict[str, int] = {}
+    for index, functions in enumerate(groups):
+        for func_id in functions:
+            function_group[func_id] = index
+
+    tests_by_group: List[Dict] = [{} for _ in groups]
+    for test_id, info in protocol_input.available_tests.items():
+        tests_by_group[function_group[info.covered_functions[0]]][test_id] = info
+
+    modified_by_group: List[List[str]] = [[] for _ in groups]
+    uncoverable = []
+    for func_id in protocol_input.modified_functions:
+        index = function_group.get(func_id)
+        if index is None:
+            uncoverable.append(func_id)
+        else:
+            modified_by_group[index].append(func_id)
+
+    total_times = [sum(info.time for info in tests.values()) for tests in tests_by_group]
+    budgets = _split_budget(
+        protocol_input.time_budget,
+        [len(functions) for functions in modified_by_group],
+        total_times
+    )
+
+    components = [
+        ProtocolComponent(
+            protocol_input=ProtocolInput(
+                version=protocol_input.version,
+                modified_functions=sorted(modified_by_group[index]),
+                available_tests=tests_by_group[index],
+                time_budget=budgets[index],
+                max_initial_coverage_size=protocol_input.max_initial_coverage_size
+            ),
+            total_time=total_times[index]
+        )
+        for index in range(len(groups))
+    ]
+    # Крупные компоненты первыми, чтобы их решатели стартовали раньше
+    components.sort(key=lambda component: -len(component.protocol_input.available_tests))
+
+    return ProtocolDecomposition(
+        components=components,
+        uncoverable_functions=sorted(uncoverable),
+        time_budget=protocol_input.time_budget
+    )
@@ -0,0 +1,114 @@
+import gzip
+import json
+from pathlib import Path
+from typing import IO, Dict, Iterator, List, Tuple
+
+from JuThesis.protocols.models import ProtocolInput, TestInfo
+
+COMPACT_FORMAT = "juthesis-compact"
+COMPACT_FORMAT_VERSION = 1
+
+
+def _open_text(path: Path, mode: str) -> IO[str]:
+    # Файлы с расширением .gz читаются и пишутся через gzip
+    if path.suffix == '.gz':
+        return gzip.open(path, mode + 't', encoding='utf-8', compresslevel=6)
+    return open(path, mode, encoding='utf-8')
+
+
+class CompactProtocolWriter:
+    """
+    Компактная потоковая запись ProtocolInput (JSON Lines)
+    Идентификаторы функций записываются один раз в словарь, тесты ссылаются на них
+    по номеру; каждый тест - отдельная строка, поэтому запись идет по мере обхода
+    Формат:
+      1. заголовок (формат, версия, бюджет, количество функций и тестов)
+      2. словарь функций - список идентификаторов
+      3. номера измененных функций
+      4. по строке на тест: [test_id, time, [номера функций]]
+    """
+
+    @staticmethod
+    def write(protocol_input: ProtocolInput, path: Path) -> None:
+        functions = sorted(
+            set(protocol_input.modified_functions)
+            | {func_id for info in protocol_input.available_tests.values() for func_id in info.covered_functions}
+        )
+        function_ids = {func_id: index for index, func_id in enumerate(functions)}
+
+        header = {
+            "format": COMPACT_FORMAT,
+            "format_version": COMPACT_FORMAT_VERSION,
+            "version": protocol_input.version,
+            "time_budget": protocol_input.time_budget,
+            "max_initial_coverage_size": protocol_input.max_initial_coverage_size,
+            "function_count": len(functions),
+            "test_count": len(protocol_input.available_tests),
+        }
+
+        encode = json.JSONEncoder(ensure_ascii=False, separators=(',', ':')).encode
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with _open_text(path, 'w') as f:
+            f.write(encode(header) + "\n")
+            f.write(encode(functions) + "\n")
+            f.write(encode([function_ids[func_id] for func_id in protocol_input.modified_functions]) + "\n")
+            for test_id, info in protocol_input.available_tests.items():
+                f.write(encode([
+                    test_id,
+                    info.time,
+                    [function_ids[func_id] for func_id in info.covered_functions]
+                ]) + "\n")
+
+
+class CompactProtocolReader:
+    """ Чтение файла CompactProtocolWriter обратно в ProtocolInput """
+
+    @staticmethod
+    def _read_preamble(f: IO[str]) -> Tuple[Dict, List[str], List[str]]:
+        header = json.loads(f.readline() or 'null')
+        if not isinstance(header, dict) or header.get("format") != COMPACT_FORMAT:
+            raise ValueError("Not a compact protocol input file")
+        if header.get("format_version") != COMPACT_FORMAT_VERSION:
+            raise ValueError(f"Unsupported compact protocol format version: {header.get('format_version')}")
+
+        functions = json.loads(f.readline())
+        modified_functions = [functions[index] for index in json.loads(f.readline())]
+        return header, functions, modified_functions
+
+    @staticmethod
+    def _parse_tests(f: IO[str], functions: List[str]) -> Iterator[Tuple[str, TestInfo]]:
+        for line in f:
+            if not line.strip():
+                continue
+            test_id, duration, function_refs = json.loads(line)
+            yield test_id, TestInfo(
+                time=duration,
+                covered_functions=[functions[index] for index in function_refs]
+            )
+
+    @staticmethod
+    def iter_tests(path: Path) -> Iterator[Tuple[str, TestInfo]]:
+        """ Потоковое чтение тестов без загрузки всего файла """
+        with _open_text(path, 'r') as f:
+            _, functions, _ = CompactProtocolReader._read_preamble(f)
+            yield from CompactProtocolReader._parse_tests(f, functions)
+
+    @staticmethod
+    def read(path: Path) -> ProtocolInput:
+        with _open_text(path, 'r') as f:
+            header, functions, modified_functions = CompactProtocolReader._read_preamble(f)
+            available_tests = dict(CompactProtocolReader._parse_tests(f, functions))
+
+        if len(available_tests) != header["test_count"]:
+            raise ValueError(
+                f"Truncated compact protocol input: expected {header['test_count']} tests, "
+                f"got {len(available_tests)}"
+            )
+
+        return ProtocolInput(
+            version=header["version"],
+            modified_functions=modified_functions,
+            available_tests=available_tests,
+            time_budget=header["time_budget"],
+            max_initial_coverage_size=header["max_initial_coverage_size"]
+        )
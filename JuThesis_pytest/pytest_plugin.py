@@ -0,0 +1,196 @@
+import os
+import uuid
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional
+
+import pytest
+
+from .duration_collector import merge_duration_files, write_duration_records
+from .function_coverage import (
+    FunctionCoverageData,
+    FunctionEntryTracer,
+    merge_function_coverage_files,
+    source_matcher
+)
+
+# Плагин подключается через entry point pytest11 ко всем сессиям pytest, поэтому время
+# тестов записывается только по явному запросу: опцией --juthesis-durations, переменной
+# окружения (ее задает PytestRunner) или ini-настройкой juthesis_durations_file
+DURATIONS_FILE_ENV = "JUTHESIS_DURATIONS_FILE"
+
+# Покрытие на уровне функций включается опцией --juthesis-functions или переменной окружения
+FUNCTIONS_FILE_ENV = "JUTHESIS_FUNCTIONS_FILE"
+
+# Номер фазы теста в записи (setup, call, teardown)
+_PHASES = {"setup": 0, "call": 1, "teardown": 2}
+
+
+def pytest_addoption(parser):
+    group = parser.getgroup("juthesis", "JuThesis test durations and function coverage")
+    group.addoption(
+        "--juthesis-durations",
+        dest="juthesis_durations",
+        default=None,
+        metavar="PATH",
+        help=f"record setup/call/teardown durations of tests into PATH (or set ${DURATIONS_FILE_ENV})"
+    )
+    group.addoption(
+        "--no-juthesis-durations",
+        dest="juthesis_durations_disabled",
+        action="store_true",
+        default=False,
+        help="do not record test durations even if a durations file is configured"
+    )
+    group.addoption(
+        "--juthesis-functions",
+        dest="juthesis_functions",
+        default=None,
+        metavar="PATH",
+        help="record functions entered by each test into PATH (function-level coverage)"
+    )
+    group.addoption(
+        "--juthesis-functions-source",
+        dest="juthesis_functions_sources",
+        action="append",
+        default=[],
+        metavar="DIR",
+        help="directory with measured sources (repeatable, default: rootdir)"
+    )
+    parser.addini("juthesis_durations_file", help="record durations of tests into this file", default=None)
+
+
+def _durations_path(config) -> Optional[Path]:
+    # Приоритет: опция командной строки, переменная окружения, ini; без них запись выключена
+    # Относительный путь считается от директории запуска pytest
+    path = (
+            config.getoption("juthesis_durations")
+            or os.environ.get(DURATIONS_FILE_ENV)
+            or config.getini("juthesis_durations_file")
+    )
+    if not path:
+        return None
+    return Path(config.invocation_params.dir, path)
+
+
+def _register(config, name: str, path: Path, part_key: str, recorder: Callable[[Path], object], merge) -> None:
+    # Регистрация записи в файл: в одном процессе - напрямую, под pytest-xdist
+    # воркеры пишут свои части файла, основной процесс их объединяет
+    workerinput = getattr(config, "workerinput", None)
+    if workerinput is not None:
+        part = workerinput.get(part_key)
+        if part is None:
+            # В основном процессе запись отключена
+            return
+        plugin = recorder(Path(part))
+    elif getattr(config.option, "dist", "no") != "no":
+        plugin = PartFilesMerger(path, part_key, merge)
+    else:
+        plugin = recorder(path)
+    config.pluginmanager.register(plugin, name)
+
+
+def pytest_configure(config):
+    if config.option.collectonly:
+        # Тесты не запускаются - не перезаписываем файлы пустыми данными
+        return
+
+    durations_path = _durations_path(config)
+    if durations_path is not None and not config.getoption("juthesis_durations_disabled"):
+        _register(
+            config,
+            "juthesis_durations_recorder",
+            durations_path,
+            "juthesis_durations_part",
+            DurationRecorder,
+            merge_duration_files
+        )
+
+    functions_file = config.getoption("juthesis_functions") or os.environ.get(FUNCTIONS_FILE_ENV)
+    if functions_file:
+        base = config.invocation_params.dir
+        sources = [Path(base, source) for source in config.getoption("juthesis_functions_sources")]
+        is_source = source_matcher(sources or [config.rootpath])
+        _register(
+            config,
+            "juthesis_functions_recorder",
+            Path(base, functions_file),
+            "juthesis_functions_part",
+            lambda path: FunctionCoverageRecorder(path, is_source, config.rootpath),
+            merge_function_coverage_files
+        )
+
+
+class DurationRecorder:
+    """
+    Запись времени фаз setup, call и teardown каждого теста
+    На тест приходится одна запись фиксированной длины, файл пишется один раз в конце сессии
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.records: Dict[str, List[float]] = {}
+
+    def pytest_runtest_logreport(self, report):
+        phase = _PHASES.get(report.when)
+        if phase is None:
+            return
+        record = self.records.get(report.nodeid)
+        if record is None:
+            record = self.records[report.nodeid] = [0.0, 0.0, 0.0]
+        record[phase] = report.duration
+
+    def pytest_sessionfinish(self, session):
+        write_duration_records(self.path, self.records)
+
+
+class FunctionCoverageRecorder:
+    """
+    Покрытие на уровне функций: входы в функции исходников во время фазы call каждого теста
+    (как контекст "run" у coverage.py), без трассировки строк
+    """
+
+    def __init__(self, path: Path, is_source: Callable[[str], bool], root: Path):
+        self.path = path
+        # Пути файлов записываются относительно rootdir, как node id тестов
+        self.data = FunctionCoverageData(root=root)
+        self.tracer = FunctionEntryTracer(is_source)
+        self.tracer.start()
+
+    @pytest.hookimpl(wrapper=True)
+    def pytest_runtest_call(self, item):
+        self.tracer.begin_test(self.data.tests.setdefault(item.nodeid, set()))
+        try:
+            return (yield)
+        finally:
+            self.tracer.end_test()
+
+    def pytest_sessionfinish(self, session):
+        self.tracer.stop()
+        self.data.write(self.path)
+
+
+class PartFilesMerger:
+    """
+    Основной процесс pytest-xdist: каждый воркер пишет свою часть файла
+    (имя части содержит метку запуска и id воркера), после завершения воркеров
+    части объединяются в итоговый файл
+    """
+
+    def __init__(self, path: Path, part_key: str, merge: Callable[[Path, Iterable[Path]], object]):
+        self.path = path
+        self.part_key = part_key
+        self.merge = merge
+        self.run_label = uuid.uuid4().hex[:12]
+
+    def _part_path(self, worker_id: str) -> Path:
+        return self.path.with_name(f"{self.path.name}.{self.run_label}.{worker_id}")
+
+    @pytest.hookimpl(optionalhook=True)
+    def pytest_configure_node(self, node):
+        node.workerinput[self.part_key] = str(self._part_path(node.gateway.id))
+
+    def pytest_sessionfinish(self, session):
+        # Воркеры записывают свои части до сообщения о завершении, к этому моменту все части готовы
+        parts = self.path.parent.glob(f"{self.path.name}.{self.run_label}.*")
+        self.merge(self.path, parts)
+
@@ -1,12 +1,52 @@
+import heapq
+import json
+import os
 import subprocess
+import sys
 from pathlib import Path
 
+from .duration_collector import DurationCollector, merge_duration_files
+from .function_coverage import merge_function_coverage_files
+
+# Skript sbora node id testov v otdel'nom processe
+_COLLECT_SCRIPT = """
+import json, sys
+import pytest
+
+class Collector:
+    ids = []
+    def pytest_collection_finish(self, session):
+        self.ids = [item.nodeid for item in session.items]
+
+collector = Collector()
+code = pytest.main(["--collect-only", "-qq", "-p", "no:cacheprovider"], plugins=[collector])
+print()
+print(json.dumps(collector.ids))
+sys.exit(int(code))
+"""
+
 
 class PytestRunner:
 
-    def __init__(self, project_root: Path, source_patterns: list[str]):
+    def __init__(
+            self,
+            project_root: Path,
+            source_patterns: list[str],
+            shards: int = 1,
+            coverage_file: str = ".coverage",
+            durations_file: str = ".test_durations.tsv",
+            collector: str = "coverage"
+    ):
         self.project_root = project_root
         self.source_patterns = source_patterns
+        # Kolichestvo parallel'nyh processov pytest (1 - bez shardirovaniya)
+        self.shards = shards
+        self.coverage_file = coverage_file
+        self.durations_file = durations_file
+        # Sbor pokrytiya: "coverage" - coverage.py po strokam, "functions" - vhody v funktsii (nash plagin)
+        self.collector = collector
+        # Vremya testov, izmerennoe v poslednem zapuske po shardam (do ob'edineniya s obshchim fajlom)
+        self.measured_durations: dict[str, float] = {}
 
     def _extract_base_dirs(self) -> list[str]:
         # Izvlekaem bazovye direktorii iz patternov
@@ -28,18 +68,16 @@ class PytestRunner:
         
         return list(base_dirs)
 
-    def run_with_coverage_and_durations(self) -> bool:
-        # Zapusk pytest s coverage i sborom vremeni vypolneniya
-        
-        # Izvlekaem bazovye direktorii dlya coverage
-        base_dirs = self._extract_base_dirs()
-        if not base_dirs:
-            print("Warning: No base directories found in source patterns")
-            return False
-        
+    def _build_coverage_command(self, base_dirs: list[str]) -> list[str]:
         # Formiruem komandu dlya pytest
         cmd = ["pytest"]
         
+        if self.collector == "functions":
+            # Fajl dannyh zadaetsya cherez JUTHESIS_FUNCTIONS_FILE (svoy u kazhdogo sharda)
+            for base_dir in base_dirs:
+                cmd.append(f"--juthesis-functions-source={base_dir}")
+            return cmd
+        
         # Dobavlyaem coverage dlya kazhdoy bazovoy direktorii
         for base_dir in base_dirs:
             cmd.append(f"--cov={base_dir}")
@@ -48,13 +86,222 @@ class PytestRunner:
             "--cov-context=test",
             "--cov-report=",  # Otklyuchaem generatsiyu otcheta
         ])
+        return cmd
+
+    def collect_test_ids(self) -> list[str]:
+        # Sbor node id vseh testov bez ih zapuska
+        # Vyvod --collect-only zavisit ot addopts proekta (-v/-q), poetomu node id
+        # sobirayutsya nebol'shim plaginom i pechatayutsya kak JSON v poslednej stroke
+        result = subprocess.run(
+            [sys.executable, "-c", _COLLECT_SCRIPT],
+            cwd=self.project_root,
+            capture_output=True,
+            text=True
+        )
+        lines = result.stdout.strip().splitlines()
+        if result.returncode not in (0, 5) or not lines:
+            print(f"Test collection failed with code {result.returncode}")
+            print(f"stderr: {result.stderr}")
+            return []
+        
+        try:
+            return json.loads(lines[-1])
+        except ValueError:
+            print("Failed to parse collected test ids")
+            return []
+
+    @staticmethod
+    def split_into_shards(
+            test_ids: list[str],
+            durations: dict[str, float],
+            shards: int
+    ) -> list[list[str]]:
+        # Raspredelenie testov po shardam algoritmom LPT:
+        # testy v poryadke ubyvaniya vremeni, kazhdyy - v naimenee zagruzhennyy shard
+        known = [durations[test_id] for test_id in test_ids if durations.get(test_id, 0) > 0]
+        # Dlya testov bez izvestnogo vremeni berem srednee
+        default_time = sum(known) / len(known) if known else 1.0
+        
+        weighted = sorted(
+            test_ids,
+            key=lambda test_id: (-(durations.get(test_id) or default_time), test_id)
+        )
+        
+        bins = [(0.0, index) for index in range(max(1, shards))]
+        heapq.heapify(bins)
+        result: list[list[str]] = [[] for _ in bins]
+        
+        for test_id in weighted:
+            load, index = heapq.heappop(bins)
+            result[index].append(test_id)
+            heapq.heappush(bins, (load + (durations.get(test_id) or default_time), index))
+        
+        return [shard for shard in result if shard]
+
+    def _merge_durations(self, shard_files: list[Path], update_existing: bool = False) -> None:
+        # Ob'edinenie fajlov vremeni vypolneniya shardov v odin
+        # update_existing - dopolnit' sushchestvuyushchiy fajl, a ne perezapisat' ego
+        self.measured_durations = {}
+        for shard_file in shard_files:
+            self.measured_durations.update(DurationCollector(shard_file).load())
+        merge_duration_files(self.project_root / self.durations_file, shard_files, update_existing)
+
+    def take_measured_durations(self) -> dict[str, float]:
+        # Vremya testov poslednego zapuska po shardam (tol'ko perezapushchennye testy), s ochistkoy
+        measured, self.measured_durations = self.measured_durations, {}
+        return measured
+
+    def combine_coverage(self, shard_files: list[Path], append: bool = False, data_file: Path | None = None) -> bool:
+        # Ob'edinenie coverage fajlov shardov v edinyy .coverage
+        # append - dobavit' dannye k sushchestvuyushchemu .coverage
+        # data_file - ob'edinit' v drugoy fajl vmesto .coverage (naprimer, vo vremennuyu kopiyu)
+        target = data_file if data_file is not None else self.project_root / self.coverage_file
+        existing = [str(shard_file) for shard_file in shard_files if shard_file.exists()]
+        if not existing:
+            print("No coverage data produced by shards")
+            return False
+        
+        if self.collector == "functions":
+            return merge_function_coverage_files(
+                target,
+                [Path(shard_file) for shard_file in existing],
+                update_existing=append
+            )
+        
+        data_file_arg = self.coverage_file if data_file is None else data_file.resolve()
+        cmd = [sys.executable, "-m", "coverage", "combine", f"--data-file={data_file_arg}"]
+        if append:
+            cmd.append("--append")
+        
+        result = subprocess.run(
+            cmd + existing,
+            cwd=self.project_root,
+            capture_output=True,
+            text=True
+        )
+        if result.returncode != 0:
+            print(f"Coverage combine failed: {result.stderr}")
+            return False
+        return True
+
+    def run_tests_with_coverage(
+            self,
+            test_ids: list[str],
+            durations: dict[str, float] | None = None,
+            label: str = "shard",
+            update_durations: bool = False
+    ) -> list[Path] | None:
+        # Zapusk ukazannyh testov s coverage (po shardam, esli ih bol'she odnogo)
+        # Vozvrashchaet coverage fajly shardov (ob'edinyaet ih vyzyvayushchiy) ili None pri oshibke
+        # update_durations - dopolnit' obshchiy fajl durations, a ne perezapisat' ego
+        base_dirs = self._extract_base_dirs()
+        if not base_dirs:
+            print("Warning: No base directories found in source patterns")
+            return None
+        
+        shards = self.split_into_shards(test_ids, durations or {}, self.shards)
+        print(f"Running {len(test_ids)} tests in {len(shards)} shards")
+        
+        processes = []
+        coverage_files = []
+        durations_files = []
+        for index, shard in enumerate(shards):
+            # Spisok testov peredaem cherez fajl argumentov, chtoby ne upiratsya v limit komandnoy stroki
+            args_file = self.project_root / f".juthesis_{label}{index}.args"
+            args_file.write_text("\n".join(shard), encoding="utf-8")
+            
+            # Absolyutnye puti: podprocessy zapuskayutsya v direktorii proekta
+            coverage_file = (self.project_root / f"{self.coverage_file}.{label}{index}").resolve()
+            durations_file = (self.project_root / f".test_durations.{label}{index}.tsv").resolve()
+            coverage_files.append(coverage_file)
+            durations_files.append(durations_file)
+            
+            # JUTHESIS_DURATIONS_FILE vklyuchaet zapis' vremeni testov nashim plaginom
+            env = dict(os.environ)
+            env["COVERAGE_FILE"] = str(coverage_file)
+            if self.collector == "functions":
+                env["JUTHESIS_FUNCTIONS_FILE"] = str(coverage_file)
+            env["JUTHESIS_DURATIONS_FILE"] = durations_file.name
+            
+            cmd = self._build_coverage_command(base_dirs) + ["-p", "no:cacheprovider", f"@{args_file.name}"]
+            processes.append((args_file, subprocess.Popen(
+                cmd,
+                cwd=self.project_root,
+                env=env,
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.PIPE,
+                text=True
+            )))
+        
+        success = True
+        for args_file, process in processes:
+            _, stderr = process.communicate()
+            args_file.unlink()
+            # Kod 0 = vse testy proshli, kod 1 = est' upavshie testy
+            if process.returncode not in (0, 1):
+                print(f"Pytest shard failed with code {process.returncode}")
+                print(f"stderr: {stderr}")
+                success = False
+        
+        self._merge_durations(durations_files, update_existing=update_durations)
+        if not success:
+            self.remove_files(coverage_files)
+            return None
+        return coverage_files
+
+    @staticmethod
+    def remove_files(files: list[Path]) -> None:
+        # Udalenie vremennyh fajlov shardov
+        for file in files:
+            if file.exists():
+                file.unlink()
+
+    def run_sharded(self, durations: dict[str, float] | None = None) -> bool:
+        # Parallel'nyy zapusk pytest po shardam s posleduyushchim ob'edineniem rezul'tatov
+        test_ids = self.collect_test_ids()
+        if not test_ids:
+            print("Warning: No tests collected")
+            return False
+        
+        coverage_files = self.run_tests_with_coverage(test_ids, durations)
+        if coverage_files is None:
+            return False
+        
+        success = self.combine_coverage(coverage_files)
+        self.remove_files(coverage_files)
+        
+        if success:
+            print("Pytest completed successfully")
+        return success
+
+    def run_with_coverage_and_durations(self, durations: dict[str, float] | None = None) -> bool:
+        # Zapusk pytest s coverage i sborom vremeni vypolneniya
+        # durations - izvestnoe vremya testov dlya balansirovki shardov
+        if self.shards > 1:
+            return self.run_sharded(durations)
+        
+        # Izvlekaem bazovye direktorii dlya coverage
+        base_dirs = self._extract_base_dirs()
+        if not base_dirs:
+            print("Warning: No base directories found in source patterns")
+            return False
+        
+        cmd = self._build_coverage_command(base_dirs)
 
         print(f"Running: {' '.join(cmd)}")
 
+        # Fajly dannyh nashego plagina (puti otnositel'no direktorii proekta);
+        # bez JUTHESIS_DURATIONS_FILE plagin ne zapisyvaet vremya testov
+        env = dict(os.environ)
+        env["JUTHESIS_DURATIONS_FILE"] = self.durations_file
+        if self.collector == "functions":
+            env["JUTHESIS_FUNCTIONS_FILE"] = self.coverage_file
+
         # Zapusk pytest v direktorii proekta
         result = subprocess.run(
             cmd,
             cwd=self.project_root,
+            env=env,
             capture_output=True,
             text=True
         )
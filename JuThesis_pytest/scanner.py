@@ -1,8 +1,13 @@
-import ast
-import fnmatch
+import bisect
+import os
 from dataclasses import dataclass
 from pathlib import Path
-from typing import Iterator, List, Dict, Optional
+from typing import Iterable, Iterator, List, Dict, Optional, Sequence, Tuple
+
+from .file_discovery import DiscoveredFile, FileDiscovery
+
+# Минимальное число файлов, начиная с которого имеет смысл поднимать пул процессов
+PARALLEL_MIN_FILES = 64
 
 
 @dataclass
@@ -25,25 +30,56 @@ class FunctionInfo:
         return f"{self.file}::{self.line}::{self.name}"
 
 
+def _extract_job(item: Tuple[Path, Optional[bytes]]) -> List[FunctionInfo]:
+    # Задача для пула процессов: функция уровня модуля, чтобы ее можно было сериализовать
+    file_path, source = item
+    return FunctionScanner.extract_functions(file_path, source)
+
+
 class FunctionScanner:
-    def __init__(self, root: Path, include_patterns: List[str], exclude_patterns: List[str]):
+    def __init__(
+            self,
+            root: Path,
+            include_patterns: List[str],
+            exclude_patterns: List[str],
+            workers: int = 1,
+            chunk_size: int = 0
+    ):
         self.root = root
         self.include_patterns = include_patterns
         self.exclude_patterns = exclude_patterns
+        # Число процессов для парсинга (0 - по числу ядер, 1 - последовательно)
+        self.workers = workers if workers > 0 else (os.cpu_count() or 1)
+        # Размер пачки файлов на одну задачу пула (0 - подбирается автоматически)
+        self.chunk_size = chunk_size
+
+    def discover_files(self, include_patterns: Optional[List[str]] = None) -> List[DiscoveredFile]:
+        """
+        Файлы по паттернам вместе с результатами stat за один обход
+        Исключенные файлы остаются в результате с флагом excluded (нужны для хеша файлов)
+        include_patterns - другие паттерны включения (например, тестов) вместо паттернов исходников
+        """
+        if include_patterns is None:
+            include_patterns = self.include_patterns
+        return FileDiscovery(self.root, include_patterns, self.exclude_patterns).discover()
 
     def scan_files(self) -> Iterator[Path]:
         # Сканирование файлов по паттернам
-        for pattern in self.include_patterns:
-            for path in self.root.glob(pattern):
-                if any(fnmatch.fnmatch(str(path), ex) for ex in self.exclude_patterns):
-                    continue
-                yield path
+        for discovered in self.discover_files():
+            if not discovered.excluded:
+                yield discovered.path
 
     @staticmethod
-    def extract_functions(file_path: Path) -> List[FunctionInfo]:
+    def extract_functions(file_path: Path, source: Optional[bytes] = None) -> List[FunctionInfo]:
         # Извлечение функций и методов из Python файла с помощью AST
+        # source - уже прочитанное содержимое файла, чтобы не читать его повторно
         try:
-            text = file_path.read_text(encoding="utf-8-sig", errors="ignore")
+            if source is None:
+                text = file_path.read_text(encoding="utf-8-sig", errors="ignore")
+            else:
+                text = source.decode("utf-8-sig", errors="ignore")
+            # ast нужен только при разборе измененных файлов, при старте из кеша не загружается
+            import ast
             tree = ast.parse(text, filename=str(file_path))
         except SyntaxError:
             return []
@@ -63,19 +99,112 @@ class FunctionScanner:
 
         return functions
 
+    def _get_chunk_size(self, total: int) -> int:
+        # Размер пачки: по несколько пачек на процесс для балансировки нагрузки
+        if self.chunk_size > 0:
+            return self.chunk_size
+        return max(1, total // (self.workers * 4))
+
+    def extract_many(
+            self,
+            items: Sequence[Tuple[Path, Optional[bytes]]]
+    ) -> List[List[FunctionInfo]]:
+        """
+        Извлечь функции из набора файлов
+        items - пары (путь, содержимое или None), порядок результатов совпадает с порядком items
+        """
+        if self.workers <= 1 or len(items) < PARALLEL_MIN_FILES:
+            return [_extract_job(item) for item in items]
+
+        from concurrent.futures import ProcessPoolExecutor
+
+        workers = min(self.workers, len(items))
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            return list(executor.map(_extract_job, items, chunksize=self._get_chunk_size(len(items))))
+
     def build_index(self) -> Dict[Path, List[FunctionInfo]]:
         # Построение индекса всех функций в проекте
+        files = list(self.scan_files())
+        results = self.extract_many([(file_path, None) for file_path in files])
+
         index = {}
-        for file_path in self.scan_files():
-            functions = self.extract_functions(file_path)
+        for file_path, functions in zip(files, results):
             if functions:
                 index[file_path.resolve()] = functions
         return index
 
     @staticmethod
     def find_function_at_line(functions: List[FunctionInfo], line: int) -> Optional[FunctionInfo]:
-        # Поиск функции по номеру строки
+        # Поиск самой вложенной функции по номеру строки линейным перебором
+        # Для массовых запросов следует использовать FunctionLineIndex
+        found = None
         for func in functions:
             if func.start_line <= line <= func.end_line:
-                return func
-        return None
+                if found is None or (func.start_line, -func.end_line) > (found.start_line, -found.end_line):
+                    found = func
+        return found
+
+
+class FunctionLineIndex:
+    """
+    Таблица соответствия строк файла функциям
+    Диапазоны функций разбиваются на непересекающиеся отрезки, каждому из которых
+    сопоставлена самая вложенная функция, поиск выполняется бинарным поиском за O(log n)
+    """
+
+    def __init__(self, functions: List[FunctionInfo]):
+        # Начала отрезков и их владельцы (None - строки вне функций)
+        self._bounds: List[int] = []
+        self._owners: List[Optional[FunctionInfo]] = []
+        self._build(functions)
+
+    def _emit(self, line: int, owner: Optional[FunctionInfo]) -> None:
+        # Добавление границы отрезка, совпадающая граница перезаписывается
+        if self._bounds and self._bounds[-1] == line:
+            self._owners[-1] = owner
+        else:
+            self._bounds.append(line)
+            self._owners.append(owner)
+
+    def _build(self, functions: List[FunctionInfo]) -> None:
+        # Обход функций в порядке начала, внешние раньше вложенных
+        ordered = sorted(functions, key=lambda f: (f.start_line, -f.end_line))
+        stack: List[FunctionInfo] = []
+
+        for func in ordered:
+            # Закрываем функции, которые закончились до начала текущей
+            while stack and stack[-1].end_line < func.start_line:
+                closed = stack.pop()
+                self._emit(closed.end_line + 1, stack[-1] if stack else None)
+            stack.append(func)
+            self._emit(func.start_line, func)
+
+        while stack:
+            closed = stack.pop()
+            self._emit(closed.end_line + 1, stack[-1] if stack else None)
+
+    def find(self, line: int) -> Optional[FunctionInfo]:
+        """ Самая вложенная функция, содержащая строку """
+        pos = bisect.bisect_right(self._bounds, line) - 1
+        if pos < 0:
+            return None
+        return self._owners[pos]
+
+    def find_many(self, lines: Iterable[int]) -> Dict[int, FunctionInfo]:
+        """
+        Пакетный поиск функций для набора строк
+        Строки сортируются и сопоставляются с отрезками за один проход
+        Строки вне функций в результат не попадают
+        """
+        result = {}
+        bounds = self._bounds
+        owners = self._owners
+        pos = -1
+
+        for line in sorted(lines):
+            while pos + 1 < len(bounds) and bounds[pos + 1] <= line:
+                pos += 1
+            if pos >= 0 and owners[pos] is not None:
+                result[line] = owners[pos]
+
+        return result
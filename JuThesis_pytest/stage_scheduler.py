@@ -0,0 +1,80 @@
+import queue
+import threading
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Sequence
+
+
+@dataclass
+class Stage:
+    """ Этап пайплайна и этапы, результаты которых ему нужны """
+    name: str
+    func: Callable[[], Any]
+    depends_on: List[str] = field(default_factory=list)
+
+
+class StageScheduler:
+    """
+    Планировщик этапов пайплайна по графу зависимостей
+    Этапы, все зависимости которых выполнены, запускаются параллельно в потоках
+    (основная работа этапов - подпроцессы git/pytest, SQLite и ввод-вывод, которые
+    отпускают GIL); при max_workers = 1 этапы выполняются последовательно
+    в порядке добавления
+    """
+
+    def __init__(self, max_workers: int = 4):
+        self.max_workers = max_workers
+        self.stages: Dict[str, Stage] = {}
+
+    def add(self, name: str, func: Callable[[], Any], depends_on: Sequence[str] = ()) -> None:
+        for dependency in depends_on:
+            if dependency not in self.stages:
+                raise ValueError(f"Stage '{name}' depends on unknown stage '{dependency}'")
+        self.stages[name] = Stage(name, func, list(depends_on))
+
+    def run(self) -> Dict[str, Any]:
+        """
+        Выполнение всех этапов, возвращает mapping: имя этапа -> результат
+        Исключение этапа пробрасывается после завершения уже запущенных этапов,
+        зависящие от него этапы не запускаются
+        """
+        if self.max_workers <= 1:
+            # Зависимости всегда добавляются раньше, поэтому порядок добавления топологический
+            return {name: stage.func() for name, stage in self.stages.items()}
+
+        # Потоки создаются напрямую: пул из concurrent.futures загружает logging,
+        # что заметно при коротком полностью закешированном запуске
+        results: Dict[str, Any] = {}
+        pending = dict(self.stages)
+        finished: queue.SimpleQueue = queue.SimpleQueue()
+        running = 0
+        error = None
+
+        def execute(stage: Stage) -> None:
+            try:
+                finished.put((stage.name, stage.func(), None))
+            except BaseException as e:
+                finished.put((stage.name, None, e))
+
+        while pending or running:
+            if error is None:
+                ready = [
+                    name for name, stage in pending.items()
+                    if all(dependency in results for dependency in stage.depends_on)
+                ]
+                for name in ready[:self.max_workers - running]:
+                    threading.Thread(target=execute, args=(pending.pop(name),), name=f'stage-{name}').start()
+                    running += 1
+
+            if not running:
+                break
+
+            name, result, stage_error = finished.get()
+            running -= 1
+            if stage_error is None:
+                results[name] = result
+            elif error is None:
+                error = stage_error
+
+        if error is not None:
+            raise error
+        return results
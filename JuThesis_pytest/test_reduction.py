@@ -0,0 +1,102 @@
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional
+
+from JuThesis.protocols.models import TestInfo
+
+from .coverage_matrix import CoverageMatrix
+
+
+@dataclass
+class TestReduction:
+    """
+    Результат сокращения набора тестов-кандидатов
+    kept - оставшиеся тесты, equivalents - представитель -> тесты с тем же покрытием,
+    dominated_by - удаленный тест -> оставшийся тест, который его доминирует
+    """
+    kept: Dict[str, TestInfo]
+    equivalents: Dict[str, List[str]] = field(default_factory=dict)
+    dominated_by: Dict[str, str] = field(default_factory=dict)
+
+    @property
+    def removed_count(self) -> int:
+        """ Количество удаленных тестов """
+        return sum(len(tests) for tests in self.equivalents.values()) + len(self.dominated_by)
+
+    def expand(self, selected_tests: Iterable[str]) -> Dict[str, List[str]]:
+        """
+        Развернуть выбранные тесты сокращенной задачи обратно:
+        выбранный тест -> равноценные ему тесты исходного набора (то же покрытие, не быстрее)
+        """
+        return {test_id: list(self.equivalents.get(test_id, [])) for test_id in selected_tests}
+
+    def to_dict(self) -> Dict[str, Dict]:
+        return {
+            "equivalents": self.equivalents,
+            "dominated_by": self.dominated_by,
+        }
+
+
+def reduce_tests(
+        available_tests: Dict[str, TestInfo],
+        coverage_masks: Optional[Dict[str, int]] = None
+) -> TestReduction:
+    """
+    Сокращение тестов-кандидатов без потери оптимального решения:
+    1. тесты с одинаковым релевантным покрытием схлопываются в самый быстрый из них
+    2. удаляются доминируемые тесты - покрытие строго вложено в покрытие другого теста,
+       а время выполнения не меньше
+    coverage_masks - битовые маски релевантного покрытия тестов (из CoverageMatrix)
+    """
+    if coverage_masks is None:
+        coverage_masks = CoverageMatrix(
+            {test_id: info.covered_functions for test_id, info in available_tests.items()}
+        ).rows
+
+    # Классы эквивалентности по маске покрытых функций
+    classes: Dict[int, List[str]] = {}
+    for test_id in available_tests:
+        classes.setdefault(coverage_masks[test_id], []).append(test_id)
+
+    equivalents: Dict[str, List[str]] = {}
+    representatives = []
+    for mask, test_ids in classes.items():
+        test_ids.sort(key=lambda test_id: (available_tests[test_id].time, test_id))
+        representative = test_ids[0]
+        if len(test_ids) > 1:
+            equivalents[representative] = test_ids[1:]
+        representatives.append((mask.bit_count(), mask, representative))
+
+    # Сначала большее покрытие, затем меньшее время: доминирующий тест всегда
+    # обрабатывается раньше доминируемого, поэтому сравниваем только с оставленными
+    representatives.sort(key=lambda item: (-item[0], available_tests[item[2]].time, item[2]))
+
+    kept: Dict[str, TestInfo] = {}
+    dominated_by: Dict[str, str] = {}
+    # Функция -> оставленные тесты, которые ее покрывают
+    postings: Dict[str, List[tuple]] = {}
+
+    for size, mask, test_id in representatives:
+        info = available_tests[test_id]
+
+        # Кандидаты в доминирующие - тесты, покрывающие самую редкую функцию из покрытия
+        rarest = min(info.covered_functions, key=lambda func_id: len(postings.get(func_id, ())))
+        dominator = next(
+            (
+                other_id for other_size, other_mask, other_id, other_time in postings.get(rarest, ())
+                if other_time <= info.time and other_size > size and not mask & ~other_mask
+            ),
+            None
+        )
+
+        if dominator is not None:
+            dominated_by[test_id] = dominator
+            # Равноценные доминируемому тесту тоже доминируются
+            for equivalent_id in equivalents.pop(test_id, []):
+                dominated_by[equivalent_id] = dominator
+            continue
+
+        kept[test_id] = info
+        for func_id in info.covered_functions:
+            postings.setdefault(func_id, []).append((size, mask, test_id, info.time))
+
+    return TestReduction(kept=kept, equivalents=equivalents, dominated_by=dominated_by)
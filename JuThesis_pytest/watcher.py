@@ -0,0 +1,108 @@
+import time
+from dataclasses import replace
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from .orchestrator import PipelineOrchestrator
+
+# Состояние файла: (mtime_ns, size), None - файла нет
+FileState = Optional[Tuple[int, int]]
+
+
+def _file_state(path: Path) -> FileState:
+    try:
+        stat = path.stat()
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+class PipelineWatcher:
+    """
+    Watch-режим: индекс функций, покрытие и время выполнения тестов остаются в памяти,
+    исходники опрашиваются по mtime/size, после сохранения файла пересчитываются только
+    его функции, измененные строки и покрытие, затем перезаписывается ProtocolInput
+    Измененные функции считаются относительно рабочего дерева (base_ref vs working tree)
+    """
+
+    def __init__(
+            self,
+            orchestrator: PipelineOrchestrator,
+            interval: float = 0.05,
+            rescan_interval: float = 2.0
+    ):
+        self.orchestrator = orchestrator
+        config = orchestrator.config
+        # Период опроса известных файлов
+        self.interval = interval
+        # Период полного обхода паттернов (поиск новых файлов)
+        self.rescan_interval = rescan_interval
+        self._data_files = [config.coverage_file_path, config.durations_file_path]
+        self._sources: Dict[Path, FileState] = {}
+        self._data_states: List[FileState] = []
+
+    def _scan_sources(self) -> Dict[Path, FileState]:
+        return {path: _file_state(path) for path in self.orchestrator.source_files()}
+
+    def _poll_sources(self) -> Dict[Path, FileState]:
+        # Быстрый опрос только известных файлов
+        return {path: _file_state(path) for path in self._sources}
+
+    def _update(self, changed_sources: List[Path], data_states: List[FileState]) -> None:
+        started = time.perf_counter()
+        coverage_changed = data_states[0] != self._data_states[0]
+        durations_changed = data_states[1] != self._data_states[1]
+        # Memo обхода файлов и их hash в отпечатках кеша относятся к прошлому состоянию
+        self.orchestrator.invalidate_files()
+
+        if changed_sources:
+            # Включает обновление покрытия по новым границам функций
+            self.orchestrator.update_sources(changed_sources)
+        elif coverage_changed:
+            self.orchestrator.update_coverage()
+        if durations_changed:
+            self.orchestrator.update_durations()
+
+        self.orchestrator.emit_protocol_input()
+        self.orchestrator.save_metrics()
+        elapsed = (time.perf_counter() - started) * 1000
+        print(f"[watch] {len(changed_sources)} source files changed, protocol input updated in {elapsed:.0f}ms")
+
+    def run(self, max_updates: Optional[int] = None) -> None:
+        """ Первичный полный прогон и цикл отслеживания изменений (до Ctrl+C) """
+        # Изменения появляются в рабочем дереве, а не в коммитах
+        # (конфигурация копируется, чтобы не менять объект вызывающего кода)
+        config = replace(self.orchestrator.config, target_ref='')
+        self.orchestrator.config = config
+
+        self.orchestrator.run_pipeline()
+        self._sources = self._scan_sources()
+        self._data_states = [_file_state(path) for path in self._data_files]
+        last_rescan = time.monotonic()
+        updates = 0
+
+        print(f"[watch] Watching {len(self._sources)} source files in {config.sample_project_root} (Ctrl+C to stop)")
+        try:
+            while max_updates is None or updates < max_updates:
+                time.sleep(self.interval)
+
+                if time.monotonic() - last_rescan >= self.rescan_interval:
+                    current = self._scan_sources()
+                    last_rescan = time.monotonic()
+                else:
+                    current = self._poll_sources()
+
+                changed = [
+                    path for path in set(current) | set(self._sources)
+                    if current.get(path) != self._sources.get(path)
+                ]
+                data_states = [_file_state(path) for path in self._data_files]
+                if not changed and data_states == self._data_states:
+                    continue
+
+                self._update(sorted(changed), data_states)
+                self._sources = {path: state for path, state in current.items() if state is not None}
+                self._data_states = data_states
+                updates += 1
+        except KeyboardInterrupt:
+            print("\n[watch] Stopped")
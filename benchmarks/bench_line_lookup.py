@@ -0,0 +1,87 @@
+"""
+Бенчмарк поиска функции по номеру строки:
+линейный перебор FunctionScanner.find_function_at_line против FunctionLineIndex
+
+Запуск: python benchmarks/bench_line_lookup.py [число функций ...]
+"""
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from JuThesis_pytest.scanner import FunctionScanner, FunctionInfo, FunctionLineIndex
+
+
+def make_functions(count: int, body: int = 8) -> list[FunctionInfo]:
+    # Синтетический модуль: функции верхнего уровня и классы с методами
+    functions = []
+    file_path = Path("synthetic.py")
+    line = 1
+    for i in range(count):
+        if i % 4 == 0:
+            # Вложенная функция внутри внешней
+            outer_start = line
+            inner_start = line + 2
+            inner_end = inner_start + body
+            outer_end = inner_end + 2
+            functions.append(FunctionInfo(file_path, outer_start, f"outer_{i}", outer_start, outer_end))
+            functions.append(FunctionInfo(file_path, inner_start, f"inner_{i}", inner_start, inner_end))
+            line = outer_end + 2
+        else:
+            functions.append(FunctionInfo(file_path, line, f"func_{i}", line, line + body))
+            line += body + 2
+    return functions
+
+
+def bench(count: int, repeats: int = 3) -> dict:
+    functions = make_functions(count)
+    max_line = max(f.end_line for f in functions) + 1
+    lines = random.Random(count).sample(range(1, max_line), min(max_line - 1, 20000))
+
+    # Проверка эквивалентности результатов
+    line_index = FunctionLineIndex(functions)
+    batch = line_index.find_many(lines)
+    for line in lines:
+        expected = FunctionScanner.find_function_at_line(functions, line)
+        assert line_index.find(line) is expected
+        assert batch.get(line) is expected
+
+    def timed(fn) -> float:
+        best = float("inf")
+        for _ in range(repeats):
+            start = time.perf_counter()
+            fn()
+            best = min(best, time.perf_counter() - start)
+        return best
+
+    linear = timed(lambda: [FunctionScanner.find_function_at_line(functions, line) for line in lines])
+    build = timed(lambda: FunctionLineIndex(functions))
+    single = timed(lambda: [line_index.find(line) for line in lines])
+    many = timed(lambda: line_index.find_many(lines))
+
+    return {
+        "functions": len(functions),
+        "lines": len(lines),
+        "linear_s": linear,
+        "index_build_s": build,
+        "index_find_s": single,
+        "index_find_many_s": many,
+    }
+
+
+def main():
+    sizes = [int(arg) for arg in sys.argv[1:]] or [10, 100, 1000, 5000]
+    print(f"{'functions':>10} {'lines':>8} {'linear':>10} {'build':>10} {'find':>10} {'find_many':>10} {'speedup':>8}")
+    for size in sizes:
+        r = bench(size)
+        speedup = r["linear_s"] / (r["index_build_s"] + r["index_find_many_s"])
+        print(
+            f"{r['functions']:>10} {r['lines']:>8} {r['linear_s']:>10.4f} {r['index_build_s']:>10.4f} "
+            f"{r['index_find_s']:>10.4f} {r['index_find_many_s']:>10.4f} {speedup:>7.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
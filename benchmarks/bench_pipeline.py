@@ -0,0 +1,201 @@
+"""
+Бенчмарк этапов пайплайна на синтетических проектах нескольких размеров:
+поиск файлов, индексация функций, git diff, анализ покрытия, загрузка времени
+выполнения тестов, построение ProtocolInput, жадный выбор тестов и запись ProtocolInput
+
+Запись ProtocolInput измеряется на худшем по размеру входе: все покрытые функции
+считаются измененными, поэтому в него попадают все тесты. Для него же сохраняются
+размеры файлов: обычный JSON (с отступами, как у JsonWriter), компактный JSON Lines
+и он же в gzip
+
+Результаты сохраняются в JSON; при сравнении с сохраненным baseline этапы,
+ставшие медленнее порога, отмечаются как регрессии (код выхода 1)
+
+Запуск:
+  python benchmarks/bench_pipeline.py [--sizes small medium] [--output results.json]
+  python benchmarks/bench_pipeline.py --save-baseline benchmarks/baselines/pipeline.json
+  python benchmarks/bench_pipeline.py --compare benchmarks/baselines/pipeline.json [--threshold 0.25]
+"""
+import argparse
+import dataclasses
+import json
+import platform
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from synthetic import SyntheticProject, generate
+
+# Размеры: модули, функций в модуле, коммиты, тесты
+SIZES = {
+    "small": dict(modules=20, functions=20, commits=5, tests=500),
+    "medium": dict(modules=200, functions=25, commits=10, tests=5000),
+    "large": dict(modules=1000, functions=30, commits=20, tests=20000),
+}
+
+
+def timed(fn: Callable[[], object], repeats: int) -> float:
+    # Лучшее время из нескольких повторов
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def bench_project(project: SyntheticProject, repeats: int) -> Dict[str, float]:
+    from JuThesis_pytest.coverage_analyzer import CoverageAnalyzer
+    from JuThesis_pytest.duration_collector import DurationCollector
+    from JuThesis_pytest.function_index import FunctionIndex
+    from JuThesis_pytest.git_analyzer import GitAnalyzer
+    from JuThesis_pytest.greedy_selector import GreedySelector
+    from JuThesis_pytest.protocol_builder import ProtocolBuilder
+    from JuThesis_pytest.protocol_io import CompactProtocolWriter
+    from JuThesis_pytest.scanner import FunctionScanner
+
+    results = {}
+    serial_scanner = FunctionScanner(project.root, ["src/**/*.py"], [], workers=1)
+    parallel_scanner = FunctionScanner(project.root, ["src/**/*.py"], [], workers=0)
+
+    results["file_discovery"] = timed(serial_scanner.discover_files, repeats)
+    results["index_serial"] = timed(serial_scanner.build_index, repeats)
+    results["index_parallel"] = timed(parallel_scanner.build_index, repeats)
+    function_index = FunctionIndex(serial_scanner.build_index())
+
+    git_analyzer = GitAnalyzer(project.root, serial_scanner, function_index)
+    base_ref = f"HEAD~{project.commits}"
+    results["git_diff"] = timed(lambda: git_analyzer.get_modified_functions(base_ref, "HEAD"), repeats)
+    modified_functions = git_analyzer.get_modified_functions(base_ref, "HEAD")
+
+    coverage_analyzer = CoverageAnalyzer(project.coverage_file, serial_scanner, function_index)
+    results["coverage_analyze"] = timed(coverage_analyzer.analyze, repeats)
+    test_coverage, snapshot = coverage_analyzer.analyze_incremental()
+    results["coverage_incremental"] = timed(lambda: coverage_analyzer.analyze_incremental(snapshot), repeats)
+
+    # Новый DurationCollector на каждый повтор, чтобы не попадать в его кеш разобранного файла
+    results["durations_load"] = timed(lambda: DurationCollector(project.durations_file).load(), repeats)
+    durations = DurationCollector(project.durations_file).load()
+    budget = sum(durations.values()) / 4
+
+    def build(reduce_tests: bool):
+        return ProtocolBuilder(modified_functions, test_coverage, durations, budget, reduce_tests=reduce_tests).build()
+
+    results["protocol_build"] = timed(lambda: build(False), repeats)
+    results["protocol_build_reduced"] = timed(lambda: build(True), repeats)
+    protocol_input = build(False)
+
+    results["greedy_select"] = timed(lambda: GreedySelector(protocol_input).select(), repeats)
+
+    all_functions = set().union(*test_coverage.values())
+    full_input = ProtocolBuilder(all_functions, test_coverage, durations, budget).build()
+    output_path = project.root / "juthesis_input.jsonl"
+    results["compact_write"] = timed(lambda: CompactProtocolWriter.write(full_input, output_path), repeats)
+    json_path = project.root / "juthesis_input.json"
+    results["json_write"] = timed(lambda: write_json(full_input, json_path), repeats)
+
+    return results
+
+
+def write_json(protocol_input, path: Path) -> None:
+    # Обычный JSON с отступами - точка сравнения для компактного формата
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(dataclasses.asdict(protocol_input), f, indent=2)
+
+
+def output_sizes(root: Path) -> Dict[str, int]:
+    """ Размеры файлов ProtocolInput, записанных bench_project, в байтах """
+    from JuThesis_pytest.protocol_io import CompactProtocolReader, CompactProtocolWriter
+
+    compressed_path = root / "juthesis_input.jsonl.gz"
+    CompactProtocolWriter.write(CompactProtocolReader.read(root / "juthesis_input.jsonl"), compressed_path)
+    return {
+        "json": (root / "juthesis_input.json").stat().st_size,
+        "compact": (root / "juthesis_input.jsonl").stat().st_size,
+        "compact_gzip": compressed_path.stat().st_size,
+    }
+
+
+def run(sizes: List[str], repeats: int) -> Dict:
+    report = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "created": time.time(),
+        "sizes": {},
+    }
+    for size in sizes:
+        with tempfile.TemporaryDirectory(prefix=f"juthesis_bench_{size}_") as tmp:
+            started = time.perf_counter()
+            project = generate(Path(tmp), **SIZES[size])
+            print(f"[{size}] generated in {time.perf_counter() - started:.1f}s")
+            results = bench_project(project, repeats)
+            sizes = output_sizes(project.root)
+        report["sizes"][size] = {"params": SIZES[size], "stages": results, "output_bytes": sizes}
+        for stage, seconds in results.items():
+            print(f"[{size}] {stage:<24} {seconds * 1000:>10.1f} ms")
+        for name, size_bytes in sizes.items():
+            print(f"[{size}] output {name:<17} {size_bytes / 1024 / 1024:>10.1f} MB")
+    return report
+
+
+def compare(report: Dict, baseline: Dict, threshold: float, min_seconds: float = 0.005) -> List[str]:
+    """
+    Этапы, ставшие медленнее baseline более чем на threshold (доля)
+    Очень короткие этапы (меньше min_seconds) не сравниваются - шум измерений
+    """
+    regressions = []
+    print(f"\n{'size':<8} {'stage':<24} {'baseline':>10} {'current':>10} {'change':>8}")
+    for size, current in report["sizes"].items():
+        base = baseline.get("sizes", {}).get(size)
+        if base is None:
+            continue
+        for stage, seconds in current["stages"].items():
+            base_seconds = base["stages"].get(stage)
+            if base_seconds is None:
+                continue
+            change = (seconds - base_seconds) / base_seconds if base_seconds else 0.0
+            regressed = change > threshold and max(seconds, base_seconds) >= min_seconds
+            marker = "  REGRESSION" if regressed else ""
+            print(
+                f"{size:<8} {stage:<24} {base_seconds * 1000:>8.1f}ms {seconds * 1000:>8.1f}ms "
+                f"{change * 100:>+7.1f}%{marker}"
+            )
+            if regressed:
+                regressions.append(f"{size}/{stage}")
+    return regressions
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Pipeline stage benchmarks on synthetic projects")
+    parser.add_argument("--sizes", nargs="+", choices=sorted(SIZES), default=["small", "medium"])
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--output", type=Path, help="write results JSON")
+    parser.add_argument("--save-baseline", type=Path, help="write results as a new baseline")
+    parser.add_argument("--compare", type=Path, help="baseline JSON to compare against")
+    parser.add_argument("--threshold", type=float, default=0.25, help="allowed slowdown (fraction)")
+    args = parser.parse_args(argv)
+
+    report = run(args.sizes, args.repeats)
+
+    for path in (args.output, args.save_baseline):
+        if path is not None:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_text(json.dumps(report, indent=2))
+            print(f"Results saved to {path}")
+
+    if args.compare is not None:
+        regressions = compare(report, json.loads(args.compare.read_text()), args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} regressions: {', '.join(regressions)}")
+            return 1
+        print("\nNo regressions")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,128 @@
+"""
+Бенчмарк построения ProtocolInput: пересечение строковых множеств по каждому тесту
+(исходная реализация ProtocolBuilder и диагностики оркестратора) против битовой матрицы
+покрытия измененных функций
+
+Измеряются build() + get_statistics() + диагностика (покрытые измененные функции);
+код выхода 1, если матрица медленнее исходной реализации
+
+Запуск: python benchmarks/bench_protocol_build.py [--tests 50000] [--functions 20000] [--per-test 60]
+"""
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Set
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from JuThesis.protocols.models import ProtocolInput, TestInfo
+
+from JuThesis_pytest.protocol_builder import ProtocolBuilder
+
+
+def make_coverage(tests: int, functions: int, per_test: int, seed: int = 0) -> Dict[str, Set[str]]:
+    # Синтетическое покрытие: идентификаторы функций в формате file::line::name
+    rng = random.Random(seed)
+    function_ids = [f"src/pkg{i % 97}/module_{i // 50}.py::{i % 50 * 12 + 1}::func_{i}" for i in range(functions)]
+    return {
+        f"tests/test_{i // 100}.py::test_case_{i}": set(rng.sample(function_ids, per_test))
+        for i in range(tests)
+    }
+
+
+def baseline_build(
+        modified_functions: List[str],
+        test_coverage: Dict[str, Set[str]],
+        test_durations: Dict[str, float],
+        time_budget: float
+) -> ProtocolInput:
+    # Исходная реализация: build() и get_statistics() на пересечениях множеств строк,
+    # диагностика - объединение всего покрытия
+    modified_set = set(modified_functions)
+    available_tests = {}
+    for test_id, covered_funcs in test_coverage.items():
+        relevant_coverage = covered_funcs & modified_set
+        if not relevant_coverage:
+            continue
+        duration = test_durations.get(test_id)
+        if duration is None or duration <= 0:
+            continue
+        available_tests[test_id] = TestInfo(time=duration, covered_functions=sorted(relevant_coverage))
+
+    relevant_tests = 0
+    for test_id, covered_funcs in test_coverage.items():
+        if covered_funcs & modified_set:
+            relevant_tests += 1
+
+    all_covered_functions = set().union(*test_coverage.values())
+    len(modified_set & all_covered_functions)
+
+    return ProtocolInput(
+        version="1.0.0",
+        modified_functions=sorted(modified_functions),
+        available_tests=available_tests,
+        time_budget=time_budget,
+        max_initial_coverage_size=2
+    )
+
+
+def matrix_build(
+        modified_functions: List[str],
+        test_coverage: Dict[str, Set[str]],
+        test_durations: Dict[str, float],
+        time_budget: float
+) -> ProtocolInput:
+    # Текущая реализация: та же последовательность вызовов, что у оркестратора
+    builder = ProtocolBuilder(modified_functions, test_coverage, test_durations, time_budget)
+    builder.coverage_matrix.covered_count()
+    protocol_input = builder.build()
+    builder.get_statistics()
+    return protocol_input
+
+
+def timed(fn, repeats: int) -> float:
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="ProtocolInput building: string sets vs coverage bit matrix")
+    parser.add_argument("--tests", type=int, default=50000)
+    parser.add_argument("--functions", type=int, default=20000)
+    parser.add_argument("--per-test", type=int, default=60)
+    parser.add_argument("--modified", type=int, nargs="+", default=[10, 200, 2000])
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args(argv)
+
+    test_coverage = make_coverage(args.tests, args.functions, args.per_test)
+    test_durations = {test_id: 0.01 + i % 100 / 100 for i, test_id in enumerate(test_coverage)}
+    all_functions = sorted(set().union(*test_coverage.values()))
+
+    slower = False
+    print(f"{'modified':>9} {'relevant':>9} {'baseline':>10} {'matrix':>10} {'speedup':>8}")
+    for modified_count in args.modified:
+        modified = random.Random(modified_count).sample(all_functions, modified_count)
+        args_tuple = (modified, test_coverage, test_durations, 100.0)
+
+        # Проверка эквивалентности результатов
+        expected = baseline_build(*args_tuple)
+        assert matrix_build(*args_tuple) == expected
+
+        baseline = timed(lambda: baseline_build(*args_tuple), args.repeats)
+        matrix = timed(lambda: matrix_build(*args_tuple), args.repeats)
+        slower = slower or matrix > baseline
+        print(
+            f"{modified_count:>9} {len(expected.available_tests):>9} {baseline * 1000:>8.1f}ms "
+            f"{matrix * 1000:>8.1f}ms {baseline / matrix:>7.1f}x"
+        )
+    return 1 if slower else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,129 @@
+"""
+Бенчмарк времени запуска run_pipeline.py
+
+1. Импорт оркестратора под python -X importtime: самые тяжелые модули по
+   суммарному времени и проверка, что модули отдельных этапов (PyYAML,
+   coverage.py, анализ покрытия, запуск pytest, построение протокола,
+   JsonWriter, пулы потоков и процессов, жадный выбор, история времени
+   и т.д.) не загружаются при старте
+2. Полностью закешированный запуск run_pipeline.py в директории проекта
+   (с config.yaml): медиана нескольких повторов после прогревочного запуска
+   сравнивается с целевым временем
+
+Код выхода 1, если медиана больше цели или при старте загружен тяжелый модуль
+
+Запуск:
+  python benchmarks/bench_startup.py [--project DIR] [--runs 10] [--target-ms 200] [--top 15]
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+
+# Модули, которые должны загружаться только в этапах, которым они нужны
+DEFERRED_MODULES = [
+    "coverage",
+    "yaml",
+    "JuThesis.protocols.models",
+    "JuThesis.io.writers.json_writer",
+    "concurrent.futures",
+    "JuThesis_pytest.coverage_analyzer",
+    "JuThesis_pytest.coverage_refresh",
+    "JuThesis_pytest.duration_history",
+    "JuThesis_pytest.greedy_selector",
+    "JuThesis_pytest.protocol_builder",
+    "JuThesis_pytest.protocol_io",
+    "JuThesis_pytest.pytest_runner",
+    "JuThesis_pytest.watcher",
+]
+
+
+def _env() -> Dict[str, str]:
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [str(REPO_ROOT), env.get("PYTHONPATH")]))
+    return env
+
+
+def import_times(module: str) -> List[Tuple[str, int, int]]:
+    """ (модуль, собственное время, суммарное время) в микросекундах по выводу -X importtime """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        cwd=REPO_ROOT,
+        env=_env(),
+        check=True
+    )
+    times = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        times.append((name.strip(), int(self_us), int(cumulative_us)))
+    return times
+
+
+def _timed_run(command: List[str], cwd: Path) -> float:
+    started = time.perf_counter()
+    subprocess.run(command, cwd=cwd, env=_env(), stdout=subprocess.DEVNULL, check=True)
+    return time.perf_counter() - started
+
+
+def warm_run_times(project: Path, runs: int) -> List[float]:
+    """ Время запусков run_pipeline.py после прогревочного запуска (все этапы из кеша) """
+    command = [sys.executable, str(REPO_ROOT / "run_pipeline.py")]
+    _timed_run(command, project)
+    return [_timed_run(command, project) for _ in range(runs)]
+
+
+def interpreter_time(runs: int) -> float:
+    """ Медиана запуска пустого интерпретатора - нижняя граница для run_pipeline.py """
+    return statistics.median(_timed_run([sys.executable, "-c", "pass"], REPO_ROOT) for _ in range(runs))
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="run_pipeline.py startup benchmark")
+    parser.add_argument("--project", type=Path, default=REPO_ROOT, help="directory with config.yaml")
+    parser.add_argument("--module", default="JuThesis_pytest.orchestrator", help="module to import-profile")
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--target-ms", type=float, default=200.0)
+    parser.add_argument("--top", type=int, default=15)
+    args = parser.parse_args(argv)
+
+    times = import_times(args.module)
+    loaded = {name for name, _, _ in times}
+    total_us = max((cumulative for name, _, cumulative in times if name == args.module), default=0)
+
+    print(f"Import of {args.module}: {total_us / 1000:.1f} ms, {len(times)} modules")
+    print(f"{'module':<48} {'self':>9} {'cumulative':>11}")
+    for name, self_us, cumulative_us in sorted(times, key=lambda t: t[2], reverse=True)[:args.top]:
+        print(f"{name:<48} {self_us / 1000:>7.1f}ms {cumulative_us / 1000:>9.1f}ms")
+
+    eager = [
+        module for module in DEFERRED_MODULES
+        if any(name == module or name.startswith(module + ".") for name in loaded)
+    ]
+    if eager:
+        print(f"\nImported at startup but should be deferred: {', '.join(eager)}")
+
+    durations = warm_run_times(args.project, args.runs)
+    median_ms = statistics.median(durations) * 1000
+    print(
+        f"\nWarm run_pipeline.py in {args.project}: median {median_ms:.1f} ms, "
+        f"min {min(durations) * 1000:.1f} ms ({args.runs} runs)"
+    )
+    print(f"Bare interpreter startup: {interpreter_time(args.runs) * 1000:.1f} ms")
+
+    over_target = median_ms > args.target_ms
+    print(f"Target {args.target_ms:.0f} ms: {'FAILED' if over_target else 'OK'}")
+    return 1 if eager or over_target else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,186 @@
+"""
+Генератор синтетического проекта для бенчмарков пайплайна:
+git репозиторий с N модулями по M функций и K коммитами, база coverage.py
+с T контекстами тестов и соответствующий файл времени выполнения тестов (формат pytest плагина)
+
+Запуск: python benchmarks/synthetic.py <директория> [--modules N] [--functions M] [--commits K] [--tests T]
+"""
+import argparse
+import random
+import subprocess
+import sys
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+# Строк в теле каждой синтетической функции
+FUNCTION_BODY = 4
+
+
+@dataclass
+class SyntheticProject:
+    root: Path
+    modules: int
+    functions: int
+    commits: int
+    tests: int
+
+    @property
+    def source_dir(self) -> Path:
+        return self.root / "src"
+
+    @property
+    def coverage_file(self) -> Path:
+        return self.root / ".coverage"
+
+    @property
+    def durations_file(self) -> Path:
+        return self.root / ".test_durations.tsv"
+
+
+def _module_source(module: int, functions: int, revision: Dict[int, int]) -> str:
+    # Модуль из функций верхнего уровня и методов класса, revision - номер правки функции
+    lines = [f'"""Synthetic module {module}"""', ""]
+    for index in range(functions):
+        value = revision.get(index, 0)
+        if index % 5 == 4:
+            lines.append(f"class Holder{index}:")
+            lines.append(f"    def method_{index}(self, x):")
+            lines.extend(f"        x = x + {value + step}" for step in range(FUNCTION_BODY - 1))
+            lines.append("        return x")
+        else:
+            lines.append(f"def func_{module}_{index}(x):")
+            lines.extend(f"    x = x + {value + step}" for step in range(FUNCTION_BODY - 1))
+            lines.append("    return x")
+        lines.append("")
+        lines.append("")
+    return "\n".join(lines)
+
+
+def _function_lines(functions: int) -> List[Tuple[int, int]]:
+    # Диапазоны строк функций модуля (совпадают с _module_source)
+    ranges = []
+    line = 3
+    for index in range(functions):
+        if index % 5 == 4:
+            start = line + 1
+            ranges.append((start, start + FUNCTION_BODY))
+            line += FUNCTION_BODY + 4
+        else:
+            ranges.append((line, line + FUNCTION_BODY))
+            line += FUNCTION_BODY + 3
+    return ranges
+
+
+def _git(root: Path, *args: str) -> None:
+    subprocess.run(
+        ["git", "-c", "user.name=bench", "-c", "user.email=bench@example.com", *args],
+        cwd=root,
+        check=True,
+        capture_output=True
+    )
+
+
+def generate_repo(project: SyntheticProject, seed: int = 0) -> None:
+    """ Git репозиторий: начальный коммит и K коммитов, меняющих случайные функции """
+    rng = random.Random(seed)
+    project.source_dir.mkdir(parents=True, exist_ok=True)
+    (project.source_dir / "__init__.py").write_text("")
+
+    revisions: List[Dict[int, int]] = [{} for _ in range(project.modules)]
+    for module in range(project.modules):
+        (project.source_dir / f"module_{module}.py").write_text(
+            _module_source(module, project.functions, revisions[module])
+        )
+
+    _git(project.root, "init", "-q")
+    _git(project.root, "add", "-A")
+    _git(project.root, "commit", "-q", "-m", "initial")
+
+    for commit in range(project.commits):
+        # Каждый коммит меняет несколько функций в нескольких модулях
+        for module in rng.sample(range(project.modules), min(project.modules, 3)):
+            for index in rng.sample(range(project.functions), min(project.functions, 2)):
+                revisions[module][index] = revisions[module].get(index, 0) + 1
+            (project.source_dir / f"module_{module}.py").write_text(
+                _module_source(module, project.functions, revisions[module])
+            )
+        _git(project.root, "commit", "-q", "-am", f"change {commit}")
+
+
+def generate_coverage(project: SyntheticProject, seed: int = 0, functions_per_test: int = 20) -> None:
+    """
+    База coverage.py с T контекстами тестов (через CoverageData, схема совпадает с реальной)
+    и файл времени выполнения тестов
+    """
+    from coverage import CoverageData
+
+    from JuThesis_pytest.duration_collector import write_duration_records
+
+    rng = random.Random(seed)
+    ranges = _function_lines(project.functions)
+    module_paths = [
+        str((project.source_dir / f"module_{module}.py").resolve())
+        for module in range(project.modules)
+    ]
+
+    project.coverage_file.unlink(missing_ok=True)
+    data = CoverageData(basename=str(project.coverage_file))
+    durations = {}
+
+    for test in range(project.tests):
+        # Тест покрывает функции в нескольких соседних модулях (как тесты одного пакета)
+        home = rng.randrange(project.modules)
+        test_id = f"tests/test_module_{home}.py::test_{test}"
+        lines: Dict[str, List[int]] = {}
+        for _ in range(functions_per_test):
+            module = (home + rng.randrange(3)) % project.modules
+            start, end = ranges[rng.randrange(project.functions)]
+            lines.setdefault(module_paths[module], []).extend(range(start, end + 1))
+
+        data.set_context(f"{test_id}|run")
+        data.add_lines(lines)
+        # Время фазы call, setup и teardown нулевые
+        durations[test_id] = (0.0, round(rng.lognormvariate(-3, 1), 6), 0.0)
+
+    data.write()
+    write_duration_records(project.durations_file, durations)
+
+
+def generate(
+        root: Path,
+        modules: int,
+        functions: int,
+        commits: int,
+        tests: int,
+        seed: int = 0
+) -> SyntheticProject:
+    """ Полный синтетический проект в пустой директории root """
+    root.mkdir(parents=True, exist_ok=True)
+    project = SyntheticProject(root=root, modules=modules, functions=functions, commits=commits, tests=tests)
+    generate_repo(project, seed)
+    generate_coverage(project, seed)
+    return project
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a synthetic project for pipeline benchmarks")
+    parser.add_argument("root", type=Path)
+    parser.add_argument("--modules", type=int, default=100)
+    parser.add_argument("--functions", type=int, default=20)
+    parser.add_argument("--commits", type=int, default=10)
+    parser.add_argument("--tests", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    project = generate(args.root, args.modules, args.functions, args.commits, args.tests, args.seed)
+    print(
+        f"Generated {project.modules} modules x {project.functions} functions, "
+        f"{project.commits} commits, {project.tests} tests in {project.root}"
+    )
+
+
+if __name__ == "__main__":
+    main()
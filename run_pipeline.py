@@ -13,6 +13,8 @@ def main():
     args = sys.argv[1:]
     clear_cache = '--clear-cache' in args
     no_cache = '--no-cache' in args
+    greedy = '--greedy' in args
+    watch = '--watch' in args
 
     # Загрузка конфигурации
     config_path = Path.cwd() / "config.yaml"
@@ -31,6 +33,10 @@ def main():
         print("Cache disabled")
         print()
 
+    # Встроенный выбор тестов без внешнего решателя
+    if greedy:
+        config.greedy_selection = True
+
     # Создание оркестратора
     orchestrator = PipelineOrchestrator(config)
 
@@ -44,6 +50,16 @@ def main():
             print("Cache is already empty")
         print()
 
+    # Watch-режим: данные остаются в памяти, ProtocolInput обновляется при изменениях
+    if watch:
+        from JuThesis_pytest.watcher import PipelineWatcher
+        PipelineWatcher(
+            orchestrator,
+            interval=config.watch_interval,
+            rescan_interval=config.watch_rescan_interval
+        ).run()
+        exit(0)
+
     # Запуск пайплайна
     success = orchestrator.run_pipeline()
 
@@ -1,29 +1,12 @@
-import json
 import sys
+from importlib.metadata import entry_points
 from pathlib import Path
 
-import pytest
-
 sys.path.insert(0, str(Path(__file__).parent))
 
-# Хранение времени выполнения тестов
-_durations = {}
-
-
-@pytest.hookimpl(tryfirst=True)
-def pytest_runtest_makereport(item, call):
-    # Сбор времени выполнения теста
-    if call.when == "call":
-        test_id = item.nodeid
-        _durations[test_id] = call.duration
-
-
-def pytest_sessionfinish(session, exitstatus):
-    # Сохранение времени выполнения после завершения тестов
-    output_dir = Path.cwd()
-    
-    durations_file = output_dir / ".test_durations.json"
-    durations_file.write_text(
-        json.dumps(_durations, indent=2),
-        encoding="utf-8"
-    )
+# Время выполнения тестов записывает плагин JuThesis_pytest.pytest_plugin
+# Установленный пакет подключает его через entry point pytest11 (и его можно отключить
+# через -p no:juthesis_durations), иначе плагин подключается отсюда из корня репозитория
+if not entry_points(group="pytest11", name="juthesis_durations"):
+    sys.path.append(str(Path(__file__).parent.parent))
+    pytest_plugins = ["JuThesis_pytest.pytest_plugin"]
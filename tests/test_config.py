@@ -0,0 +1,25 @@
+import os
+
+from JuThesis_pytest import config as config_module
+from JuThesis_pytest.config import ConfigLoader
+
+
+def test_parsed_config_reused_until_file_changes(tmp_path, monkeypatch):
+    config_path = tmp_path / "config.yaml"
+    ConfigLoader.create_default_config(config_path)
+    assert ConfigLoader.load(config_path).time_budget == 300.0
+
+    def fail_yaml_load(stream):
+        raise AssertionError("config.yaml parsed again")
+
+    monkeypatch.setattr(config_module, "_yaml_load", fail_yaml_load)
+    assert ConfigLoader.load(config_path).time_budget == 300.0
+
+    monkeypatch.undo()
+    config_path.write_text(
+        config_path.read_text(encoding="utf-8").replace("time_budget: 300.0", "time_budget: 60.0"),
+        encoding="utf-8"
+    )
+    stat = config_path.stat()
+    os.utime(config_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+    assert ConfigLoader.load(config_path).time_budget == 60.0
@@ -0,0 +1,26 @@
+from JuThesis_pytest.coverage_matrix import CoverageMatrix
+
+
+def test_matrix_restricted_to_functions():
+    coverage = {
+        "t::a": {"f1", "f2", "f3"},
+        "t::b": {"f3"},
+        "t::c": ["f2", "f4"],
+    }
+    matrix = CoverageMatrix(coverage, ["f2", "f4", "f9"])
+
+    assert len(matrix) == 2
+    assert matrix.functions == ["f2", "f4"]
+    assert matrix.coverage == {"t::a": {"f2"}, "t::c": {"f2", "f4"}}
+    assert matrix.decode(matrix.rows["t::c"]) == ["f2", "f4"]
+    assert matrix.covered_count() == 2
+    assert matrix.mask(["f4", "f9"]) == 0b10
+
+
+def test_full_matrix():
+    matrix = CoverageMatrix({"t::a": ["f2", "f1"], "t::b": ["f3"]})
+    assert matrix.functions == ["f1", "f2", "f3"]
+    assert {test_id: matrix.decode(row) for test_id, row in matrix.rows.items()} == {
+        "t::a": ["f1", "f2"],
+        "t::b": ["f3"],
+    }
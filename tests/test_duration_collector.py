@@ -0,0 +1,33 @@
+import json
+
+import pytest
+
+from JuThesis_pytest.duration_collector import (
+    DurationCollector,
+    merge_duration_files,
+    parse_duration_records,
+    write_duration_records,
+)
+
+
+def test_loader_sums_phases(tmp_path):
+    path = tmp_path / ".test_durations.tsv"
+    write_duration_records(path, {"tests/test_a.py::test_f": (0.5, 1.0, 0.25)})
+    assert DurationCollector(path).load() == {"tests/test_a.py::test_f": pytest.approx(1.75)}
+
+
+def test_legacy_json_fallback(tmp_path):
+    legacy = tmp_path / ".test_durations.json"
+    legacy.write_text(json.dumps({"tests/test_a.py::test_f": 2.0}), encoding="utf-8")
+    path = tmp_path / ".test_durations.tsv"
+
+    assert DurationCollector(path).get_test_time("tests/test_a.py::test_f") == 2.0
+
+    shard = tmp_path / "shard.tsv"
+    write_duration_records(shard, {"tests/test_b.py::test_g": (0.0, 1.0, 0.0)})
+    assert merge_duration_files(path, [shard], update_existing=True) == 2
+    assert set(parse_duration_records(path.read_text(encoding="utf-8"))) == {
+        "tests/test_a.py::test_f",
+        "tests/test_b.py::test_g",
+    }
+    assert legacy.exists() and not shard.exists()
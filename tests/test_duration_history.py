@@ -0,0 +1,65 @@
+import pytest
+
+from JuThesis_pytest.duration_history import DurationHistory
+
+
+@pytest.fixture
+def history(tmp_path):
+    history = DurationHistory(tmp_path / "history.sqlite", ewma_alpha=0.5, window=3)
+    yield history
+    history.close()
+
+
+def test_ingest_skips_duplicate_snapshot(history):
+    assert history.ingest({"t::a": 1.0, "t::b": 2.0}, source="run1")
+    assert not history.ingest({"t::b": 2.0, "t::a": 1.0}, source="run1")
+    assert history.run_count() == 1
+    assert history.get_statistics()["t::a"].sample_count == 1
+
+
+def test_ingest_skips_empty_snapshot(history):
+    assert not history.ingest({})
+    assert history.run_count() == 0
+
+
+def test_ewma_and_percentiles(history):
+    for duration in (1.0, 3.0, 2.0, 10.0):
+        assert history.ingest({"t::a": duration, "t::b": 1.0 + duration / 100})
+
+    stats = history.get_statistics()["t::a"]
+    assert stats.sample_count == 4
+    assert stats.last == 10.0
+    # EWMA: 1 -> 2 -> 2 -> 6
+    assert stats.ewma == pytest.approx(6.0)
+    # Окно - последние 3 замера: 3, 2, 10
+    assert stats.p50 == pytest.approx(3.0)
+    assert stats.p95 == pytest.approx(3.0 + (10.0 - 3.0) * 0.9)
+    assert history.get_estimates("ewma")["t::a"] == pytest.approx(6.0)
+
+
+def test_stats_only_change_for_tests_in_run(history):
+    history.ingest({"t::a": 1.0, "t::b": 2.0})
+    history.ingest({"t::a": 3.0})
+    stats = history.get_statistics()
+    assert stats["t::a"].sample_count == 2
+    assert stats["t::b"].sample_count == 1
+    assert stats["t::b"].p95 == pytest.approx(2.0)
+
+
+def test_unknown_estimate(history):
+    with pytest.raises(ValueError):
+        history.get_estimates("mean")
+
+
+def test_partial_ingest_marks_full_snapshot(history):
+    full = {"t::a": 1.0, "t::b": 2.0}
+    history.ingest(full)
+
+    # Перезапущен только t::a, объединенный файл содержит старый замер t::b
+    merged = {"t::a": 1.5, "t::b": 2.0}
+    assert history.ingest({"t::a": 1.5}, snapshot=merged)
+    assert not history.ingest(merged)
+
+    stats = history.get_statistics()
+    assert stats["t::a"].sample_count == 2
+    assert stats["t::b"].sample_count == 1
@@ -0,0 +1,17 @@
+from JuThesis_pytest.file_discovery import FileDiscovery
+
+
+def test_matches_glob_and_skips_symlinked_dirs(tmp_path):
+    (tmp_path / "src" / "pkg").mkdir(parents=True)
+    (tmp_path / "src" / "pkg" / "a.py").write_text("")
+    (tmp_path / "src" / "pkg" / "__pycache__").mkdir()
+    (tmp_path / "src" / "pkg" / "__pycache__" / "a.py").write_text("")
+    (tmp_path / "src" / "link").symlink_to(tmp_path / "src" / "pkg", target_is_directory=True)
+
+    discovery = FileDiscovery(tmp_path, ["src/**/*.py"], ["**/__pycache__/**"])
+    expected = sorted(
+        path.relative_to(tmp_path).as_posix()
+        for path in tmp_path.glob("src/**/*.py")
+        if "__pycache__" not in path.parts
+    )
+    assert [item.relative for item in discovery.discover()] == expected == ["src/pkg/a.py"]
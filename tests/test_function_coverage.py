@@ -0,0 +1,24 @@
+import json
+
+from JuThesis_pytest.function_coverage import FunctionCoverageData
+
+
+def test_paths_relative_to_root(tmp_path):
+    root = tmp_path / "project"
+    source = str(root / "src" / "a.py")
+    outside = str(tmp_path / "lib" / "b.py")
+    data = FunctionCoverageData({"tests/test_a.py::test_f": {(source, 3, "f"), (outside, 1, "g")}}, root)
+
+    path = root / "reports" / ".juthesis_functions.json"
+    path.parent.mkdir(parents=True)
+    data.write(path)
+
+    stored = json.loads(path.read_text(encoding="utf-8"))
+    assert stored["root"] == ".."
+    assert sorted(stored["files"]) == sorted(["src/a.py", outside])
+
+    moved = tmp_path / "moved"
+    root.rename(moved)
+    loaded = FunctionCoverageData.read(moved / "reports" / ".juthesis_functions.json")
+    assert loaded.tests == {"tests/test_a.py::test_f": {(str(moved / "src" / "a.py"), 3, "f"), (outside, 1, "g")}}
+    assert loaded.root == moved
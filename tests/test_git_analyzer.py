@@ -0,0 +1,145 @@
+import subprocess
+from pathlib import Path
+
+import pytest
+
+from JuThesis_pytest.git_analyzer import GitAnalyzer, unquote_git_path
+from JuThesis_pytest.scanner import FunctionScanner
+
+
+def parse(diff: str):
+    return GitAnalyzer._parse_diff_stream(diff.splitlines(keepends=True))
+
+
+def test_parse_added_and_changed_lines():
+    diff = (
+        "diff --git a/src/a.py b/src/a.py\n"
+        "--- a/src/a.py\n"
+        "+++ b/src/a.py\n"
+        "@@ -3 +3 @@ def f():\n"
+        "-    return 1\n"
+        "+    return 2\n"
+        "@@ -10,0 +11,2 @@ def g():\n"
+        "+    x = 1\n"
+        "+    y = 2\n"
+    )
+    assert parse(diff) == {"src/a.py": {3, 11, 12}}
+
+
+def test_parse_pure_deletion_has_no_new_lines():
+    # +N,0 - строки только удалены, в новой версии файла измененных строк нет
+    diff = (
+        "--- a/src/a.py\n"
+        "+++ b/src/a.py\n"
+        "@@ -5,2 +4,0 @@ def f():\n"
+        "-    x = 1\n"
+        "-    y = 2\n"
+    )
+    assert parse(diff) == {"src/a.py": set()}
+
+
+def test_parse_deleted_file_is_skipped():
+    diff = (
+        "--- a/src/old.py\n"
+        "+++ /dev/null\n"
+        "@@ -1,2 +0,0 @@\n"
+        "-def f():\n"
+        "--- not a header\n"
+        "--- a/src/b.py\n"
+        "+++ b/src/b.py\n"
+        "@@ -1 +1 @@\n"
+        "-x = 1\n"
+        "+x = 2\n"
+    )
+    assert parse(diff) == {"src/b.py": {1}}
+
+
+def test_parse_rename_uses_new_path():
+    diff = (
+        "diff --git a/src/old.py b/src/new.py\n"
+        "similarity index 90%\n"
+        "rename from src/old.py\n"
+        "rename to src/new.py\n"
+        "--- a/src/old.py\n"
+        "+++ b/src/new.py\n"
+        "@@ -2 +2 @@\n"
+        "-    return 1\n"
+        "+    return 2\n"
+    )
+    assert parse(diff) == {"src/new.py": {2}}
+
+
+def test_parse_quoted_paths():
+    diff = (
+        '--- "a/src/a\\"b.py"\n'
+        '+++ "b/src/a\\"b.py"\n'
+        "@@ -1 +1 @@\n"
+        "-x = 1\n"
+        "+x = 2\n"
+        '--- "a/src/\\303\\244 b.py"\t\n'
+        '+++ "b/src/\\303\\244 b.py"\t\n'
+        "@@ -2,2 +2,2 @@\n"
+        "-a = 1\n"
+        "-b = 2\n"
+        "+a = 3\n"
+        "+b = 4\n"
+    )
+    assert parse(diff) == {'src/a"b.py': {1}, "src/ä b.py": {2, 3}}
+
+
+def test_parse_added_lines_that_look_like_headers():
+    # Добавленные строки '++ x' и '-- y' выглядят как заголовки '+++ '/'--- ', но лежат внутри ханка
+    diff = (
+        "--- a/src/a.py\n"
+        "+++ b/src/a.py\n"
+        "@@ -1 +1,2 @@\n"
+        "--- y\n"
+        "+++ x\n"
+        "+++ b/src/fake.py\n"
+        "\\ No newline at end of file\n"
+        "@@ -10,0 +12 @@\n"
+        "+z = 1\n"
+        "--- a/src/b.py\n"
+        "+++ b/src/b.py\n"
+        "@@ -4 +4 @@\n"
+        "-q = 1\n"
+        "+q = 2\n"
+    )
+    assert parse(diff) == {"src/a.py": {1, 2, 12}, "src/b.py": {4}}
+
+
+@pytest.mark.parametrize("quoted, expected", [
+    ("src/a.py", "src/a.py"),
+    ('"src/tab\\there.py"', "src/tab\there.py"),
+    ('"src/back\\\\slash.py"', "src/back\\slash.py"),
+    ('"src/\\320\\264.py"', "src/д.py"),
+])
+def test_unquote_git_path(quoted, expected):
+    assert unquote_git_path(quoted) == expected
+
+
+def _git(root: Path, *args: str) -> None:
+    subprocess.run(
+        ["git", "-c", "user.name=test", "-c", "user.email=test@example.com", *args],
+        cwd=root,
+        check=True,
+        capture_output=True
+    )
+
+
+def test_modified_lines_map_follows_rename(tmp_path):
+    src = tmp_path / "src"
+    src.mkdir()
+    (src / "old.py").write_text("def f():\n    return 1\n\n\ndef g():\n    return 2\n")
+    _git(tmp_path, "init", "-q")
+    _git(tmp_path, "add", "-A")
+    _git(tmp_path, "commit", "-q", "-m", "initial")
+
+    _git(tmp_path, "mv", "src/old.py", "src/new.py")
+    (src / "new.py").write_text("def f():\n    return 1\n\n\ndef g():\n    return 3\n")
+    _git(tmp_path, "commit", "-q", "-am", "rename")
+
+    analyzer = GitAnalyzer(tmp_path, FunctionScanner(tmp_path, ["src/**/*.py"], []))
+    lines_map = analyzer.get_modified_lines_map("HEAD~1", "HEAD")
+    assert lines_map == {(src / "new.py").resolve(): {6}}
+    assert analyzer.get_modified_functions("HEAD~1", "HEAD") == {f"{src / 'new.py'}::5::g"}
@@ -0,0 +1,60 @@
+from JuThesis.protocols import models
+
+from JuThesis_pytest.greedy_selector import GreedySelector
+
+
+def select(tests, budget, modified=("f1", "f2", "f3", "f4")):
+    protocol_input = models.ProtocolInput(
+        version="1.0.0",
+        modified_functions=list(modified),
+        available_tests={
+            test_id: models.TestInfo(time=time, covered_functions=list(functions))
+            for test_id, (time, functions) in tests.items()
+        },
+        time_budget=budget
+    )
+    return GreedySelector(protocol_input).select()
+
+
+TESTS = {
+    "a": (3.0, ["f1", "f2", "f3"]),
+    "b": (0.5, ["f1"]),
+    "c": (1.0, ["f4"]),
+}
+
+
+def test_selects_by_gain_per_second():
+    # b (2 функции/с), затем c (1), затем a с пересчитанным приростом 2/3
+    result = select(TESTS, budget=4.5)
+    assert result.selected_tests == ["b", "c", "a"]
+    assert result.total_time == 4.5
+    assert result.uncovered_functions == []
+    assert result.coverage_ratio == 1.0
+
+
+def test_respects_budget():
+    result = select(TESTS, budget=1.5)
+    assert result.selected_tests == ["b", "c"]
+    assert result.covered_functions == ["f1", "f4"]
+    assert result.uncovered_functions == ["f2", "f3"]
+
+
+def test_best_single_test_beats_greedy():
+    # Жадный выбор берет y и не может добавить x; один x покрывает больше
+    result = select({"x": (2.0, ["f1", "f2", "f3"]), "y": (0.1, ["f4"])}, budget=2.0)
+    assert result.selected_tests == ["x"]
+    assert result.uncovered_functions == ["f4"]
+
+
+def test_nothing_fits_budget():
+    result = select(TESTS, budget=0.1)
+    assert result.selected_tests == []
+    assert result.total_time == 0
+    assert result.uncovered_functions == ["f1", "f2", "f3", "f4"]
+
+
+def test_skips_non_positive_time():
+    # Вход, прочитанный с диска, может содержать тесты с нулевым временем
+    result = select({"zero": (0.0, ["f1", "f2"]), "negative": (-1.0, ["f3"]), **TESTS}, budget=4.5)
+    assert result.selected_tests == ["b", "c", "a"]
+    assert result.metadata["skipped_non_positive_time"] == 2
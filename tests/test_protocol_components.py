@@ -0,0 +1,45 @@
+from JuThesis.protocols import models
+
+from JuThesis_pytest.protocol_components import _split_budget, decompose_protocol_input
+
+
+def test_split_budget_proportional():
+    assert _split_budget(10.0, [1, 3], [100.0, 100.0]) == [2.5, 7.5]
+
+
+def test_split_budget_redistributes_capped_surplus():
+    # Первая компонента не может потратить больше 2 секунд, остаток уходит второй
+    assert _split_budget(10.0, [1, 1], [2.0, 100.0]) == [2.0, 8.0]
+
+
+def test_split_budget_all_capped():
+    assert _split_budget(10.0, [1, 1], [2.0, 3.0]) == [2.0, 3.0]
+
+
+def test_decompose_into_connected_components():
+    protocol_input = models.ProtocolInput(
+        version="1.0.0",
+        modified_functions=["f1", "f2", "f3", "f4", "f5"],
+        available_tests={
+            "t1": models.TestInfo(time=1.0, covered_functions=["f1", "f2"]),
+            "t2": models.TestInfo(time=1.0, covered_functions=["f2", "f3"]),
+            "t3": models.TestInfo(time=10.0, covered_functions=["f4"]),
+        },
+        time_budget=8.0
+    )
+    decomposition = decompose_protocol_input(protocol_input)
+
+    assert len(decomposition) == 2
+    # f5 не покрывает ни один тест
+    assert decomposition.uncoverable_functions == ["f5"]
+
+    first, second = (component.protocol_input for component in decomposition.components)
+    assert set(first.available_tests) == {"t1", "t2"}
+    assert first.modified_functions == ["f1", "f2", "f3"]
+    assert set(second.available_tests) == {"t3"}
+    assert second.modified_functions == ["f4"]
+
+    # Доли 6 и 2, но первой компоненте хватает суммарного времени ее тестов (2 с)
+    assert first.time_budget == 2.0
+    assert second.time_budget == 6.0
+    assert [component.total_time for component in decomposition.components] == [2.0, 10.0]
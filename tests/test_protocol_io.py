@@ -0,0 +1,45 @@
+import pytest
+from JuThesis.protocols import models
+
+from JuThesis_pytest.protocol_io import CompactProtocolReader, CompactProtocolWriter
+
+
+@pytest.fixture
+def protocol_input():
+    return models.ProtocolInput(
+        version="1.0.0",
+        modified_functions=["src/b.py::1::g", "src/a.py::3::f"],
+        available_tests={
+            "tests/test_a.py::test_f": models.TestInfo(time=0.25, covered_functions=["src/a.py::3::f"]),
+            "tests/test_b.py::test_g[ю]": models.TestInfo(
+                time=1.5,
+                covered_functions=["src/b.py::1::g", "src/a.py::3::f"]
+            ),
+        },
+        time_budget=10.0,
+        max_initial_coverage_size=3
+    )
+
+
+@pytest.mark.parametrize("name", ["input.jsonl", "input.jsonl.gz"])
+def test_round_trip(tmp_path, protocol_input, name):
+    path = tmp_path / name
+    CompactProtocolWriter.write(protocol_input, path)
+    assert CompactProtocolReader.read(path) == protocol_input
+    assert dict(CompactProtocolReader.iter_tests(path)) == protocol_input.available_tests
+
+
+def test_truncated_file_is_rejected(tmp_path, protocol_input):
+    path = tmp_path / "input.jsonl"
+    CompactProtocolWriter.write(protocol_input, path)
+    lines = path.read_text(encoding="utf-8").splitlines(keepends=True)
+    path.write_text("".join(lines[:-1]), encoding="utf-8")
+    with pytest.raises(ValueError, match="Truncated"):
+        CompactProtocolReader.read(path)
+
+
+def test_other_file_is_rejected(tmp_path):
+    path = tmp_path / "input.jsonl"
+    path.write_text('{"version": "1.0.0"}\n', encoding="utf-8")
+    with pytest.raises(ValueError, match="Not a compact"):
+        CompactProtocolReader.read(path)
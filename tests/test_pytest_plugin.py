@@ -0,0 +1,31 @@
+from JuThesis_pytest.duration_collector import DurationCollector
+from JuThesis_pytest.pytest_plugin import DURATIONS_FILE_ENV
+
+pytest_plugins = ["pytester"]
+
+
+def _make_tests(pytester):
+    pytester.makepyfile(test_sample="def test_one():\n    pass\n")
+
+
+def test_durations_not_recorded_without_opt_in(pytester, monkeypatch):
+    monkeypatch.delenv(DURATIONS_FILE_ENV, raising=False)
+    _make_tests(pytester)
+
+    pytester.runpytest("-p", "JuThesis_pytest.pytest_plugin").assert_outcomes(passed=1)
+
+    assert not list(pytester.path.glob(".test_durations*"))
+
+
+def test_durations_recorded_when_file_is_set(pytester, monkeypatch):
+    _make_tests(pytester)
+
+    monkeypatch.setenv(DURATIONS_FILE_ENV, "env.tsv")
+    pytester.runpytest("-p", "JuThesis_pytest.pytest_plugin").assert_outcomes(passed=1)
+    assert set(DurationCollector(pytester.path / "env.tsv").load()) == {"test_sample.py::test_one"}
+
+    monkeypatch.delenv(DURATIONS_FILE_ENV)
+    pytester.runpytest(
+        "-p", "JuThesis_pytest.pytest_plugin", "--juthesis-durations", "option.tsv"
+    ).assert_outcomes(passed=1)
+    assert (pytester.path / "option.tsv").exists()
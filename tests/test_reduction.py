@@ -0,0 +1,39 @@
+from JuThesis.protocols import models
+
+from JuThesis_pytest.test_reduction import reduce_tests
+
+
+def info(time: float, *functions: str) -> models.TestInfo:
+    return models.TestInfo(time=time, covered_functions=list(functions))
+
+
+def test_equivalent_tests_collapse_into_fastest():
+    reduction = reduce_tests({
+        "slow": info(2.0, "f1", "f2"),
+        "fast": info(1.0, "f2", "f1"),
+        "other": info(1.0, "f3"),
+    })
+    assert set(reduction.kept) == {"fast", "other"}
+    assert reduction.equivalents == {"fast": ["slow"]}
+    assert reduction.expand(["fast", "other"]) == {"fast": ["slow"], "other": []}
+
+
+def test_dominated_test_is_removed():
+    # covered_by_big покрывает подмножество функций big и не быстрее его
+    reduction = reduce_tests({
+        "big": info(1.0, "f1", "f2"),
+        "covered_by_big": info(3.0, "f1"),
+        "also_dominated": info(3.0, "f1"),
+    })
+    assert set(reduction.kept) == {"big"}
+    assert reduction.dominated_by == {"covered_by_big": "big", "also_dominated": "big"}
+    assert reduction.removed_count == 2
+
+
+def test_faster_subset_is_kept():
+    reduction = reduce_tests({
+        "big": info(1.0, "f1", "f2"),
+        "small_fast": info(0.5, "f1"),
+    })
+    assert set(reduction.kept) == {"big", "small_fast"}
+    assert reduction.removed_count == 0